@@ -0,0 +1,211 @@
+"""asyncio facade over database.py.
+
+Every public database function has a coroutine twin with the same signature:
+
+    import async_database as adb
+    patient, appointments = await adb.fan_out(adb.get_patient_by_id(5),
+                                              adb.get_patient_appointments(5))
+    appointment_id = await adb.schedule_appointment(5, 2, "2025-03-01", "09:00", "09:30")
+
+Calls run on a bounded pool of worker threads. The connection pool hands each
+thread back the connection it used last, so with no more workers than pooled
+connections every worker keeps one warm connection of its own. When the
+awaiting task is cancelled, a call that has not started is dropped and a
+running one is interrupted on its connection (its transaction rolls back).
+"""
+import asyncio
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+
+class _Call:
+    """One database call; knows which worker thread runs it so it can be interrupted"""
+
+    __slots__ = ('func', 'args', 'kwargs', 'thread_id', 'cancelled', 'lock')
+
+    def __init__(self, func, args, kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.thread_id = None
+        self.cancelled = False
+        self.lock = threading.Lock()
+
+    def run(self):
+        with self.lock:
+            if self.cancelled:
+                raise asyncio.CancelledError()
+            self.thread_id = threading.get_ident()
+        try:
+            return self.func(*self.args, **self.kwargs)
+        finally:
+            with self.lock:
+                self.thread_id = None
+
+    def cancel(self):
+        # Holding the lock keeps the worker from moving on to another call meanwhile
+        with self.lock:
+            self.cancelled = True
+            if self.thread_id is not None:
+                database.interrupt_thread(self.thread_id)
+
+class AsyncDatabase:
+    """Runs database functions for coroutines on a bounded worker pool
+
+    max_workers threads execute calls; at most max_pending calls per event
+    loop may be queued or running at once, further callers wait (backpressure
+    instead of an unbounded queue). Keep max_workers at or below the
+    connection pool's max_idle so every worker keeps its own connection.
+    """
+
+    def __init__(self, max_workers=4, max_pending=64):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        if max_pending < max_workers:
+            raise ValueError("max_pending must be at least max_workers")
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="async-db")
+        self._slots = weakref.WeakKeyDictionary()  # event loop -> asyncio.Semaphore
+
+    async def run(self, func, *args, **kwargs):
+        """Await func(*args, **kwargs) executed on a worker thread"""
+        loop = asyncio.get_running_loop()
+        slots = self._slots.get(loop)
+        if slots is None:
+            slots = self._slots[loop] = asyncio.Semaphore(self.max_pending)
+        async with slots:
+            call = _Call(func, args, kwargs)
+            future = self._executor.submit(call.run)
+            try:
+                return await asyncio.wrap_future(future)
+            except asyncio.CancelledError:
+                call.cancel()
+                raise
+
+    def shutdown(self, wait=True):
+        """Stop the workers; pending calls are cancelled"""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+_default = None
+_default_lock = threading.Lock()
+
+def configure(max_workers=4, max_pending=64):
+    """Replace the shared executor used by the module-level coroutines"""
+    global _default
+    with _default_lock:
+        previous, _default = _default, AsyncDatabase(max_workers, max_pending)
+    if previous is not None:
+        previous.shutdown(wait=False)
+    return _default
+
+def get_executor():
+    """The shared AsyncDatabase, created on first use"""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = AsyncDatabase()
+        return _default
+
+def shutdown(wait=True):
+    """Stop the shared executor (a later call starts a new one)"""
+    global _default
+    with _default_lock:
+        previous, _default = _default, None
+    if previous is not None:
+        previous.shutdown(wait)
+
+async def run(func, *args, **kwargs):
+    """Await any blocking callable on the shared executor"""
+    return await get_executor().run(func, *args, **kwargs)
+
+# Fan-out
+async def fan_out(*awaitables):
+    """Await several calls concurrently and return their results in order
+
+    Unlike a bare asyncio.gather, the first failure cancels (and so
+    interrupts) the calls still running before it is raised.
+    """
+    tasks = [asyncio.ensure_future(awaitable) for awaitable in awaitables]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+# Mirrored API
+def _mirror(name):
+    async def call(*args, **kwargs):
+        # Looked up per call so configure_pool/instrumentation changes apply
+        return await get_executor().run(getattr(database, name), *args, **kwargs)
+    call.__name__ = call.__qualname__ = name
+    call.__doc__ = getattr(database, name).__doc__
+    return call
+
+initialize_database = _mirror('initialize_database')
+warm_up = _mirror('warm_up')
+
+insert_patient = _mirror('insert_patient')
+get_patients = _mirror('get_patients')
+update_patient = _mirror('update_patient')
+delete_patient = _mirror('delete_patient')
+get_patient_by_id = _mirror('get_patient_by_id')
+get_patient_appointments = _mirror('get_patient_appointments')
+search_patient_names = _mirror('search_patient_names')
+
+insert_doctor = _mirror('insert_doctor')
+get_doctors = _mirror('get_doctors')
+update_doctor = _mirror('update_doctor')
+delete_doctor = _mirror('delete_doctor')
+get_doctor_by_id = _mirror('get_doctor_by_id')
+search_doctor_names = _mirror('search_doctor_names')
+get_specializations = _mirror('get_specializations')
+
+schedule_appointment = _mirror('schedule_appointment')
+is_time_slot_available = _mirror('is_time_slot_available')
+get_available_time_slots = _mirror('get_available_time_slots')
+get_available_time_slots_batch = _mirror('get_available_time_slots_batch')
+get_day_schedules = _mirror('get_day_schedules')
+find_earliest_slots = _mirror('find_earliest_slots')
+get_appointments = _mirror('get_appointments')
+get_appointment_by_id = _mirror('get_appointment_by_id')
+delete_appointment = _mirror('delete_appointment')
+
+preview_appointment_series = _mirror('preview_appointment_series')
+schedule_appointment_series = _mirror('schedule_appointment_series')
+get_appointment_series = _mirror('get_appointment_series')
+cancel_appointment_series = _mirror('cancel_appointment_series')
+
+get_recent_activity = _mirror('get_recent_activity')
+get_activity_log = _mirror('get_activity_log')
+get_record_counts = _mirror('get_record_counts')
+get_data_version = _mirror('get_data_version')
+get_appointment_counts_by_day = _mirror('get_appointment_counts_by_day')
+get_appointment_counts_by_doctor = _mirror('get_appointment_counts_by_doctor')
+
+API = ('initialize_database', 'warm_up',
+       'insert_patient', 'get_patients', 'update_patient', 'delete_patient', 'get_patient_by_id',
+       'get_patient_appointments', 'search_patient_names',
+       'insert_doctor', 'get_doctors', 'update_doctor', 'delete_doctor', 'get_doctor_by_id',
+       'search_doctor_names', 'get_specializations',
+       'schedule_appointment', 'is_time_slot_available', 'get_available_time_slots',
+       'get_available_time_slots_batch', 'get_day_schedules', 'find_earliest_slots',
+       'get_appointments', 'get_appointment_by_id', 'delete_appointment',
+       'preview_appointment_series', 'schedule_appointment_series', 'get_appointment_series',
+       'cancel_appointment_series',
+       'get_recent_activity', 'get_activity_log', 'get_record_counts', 'get_data_version',
+       'get_appointment_counts_by_day', 'get_appointment_counts_by_doctor')
+
+# Composite calls
+async def get_patient_with_appointments(patient_id):
+    """(patient, appointments) read in parallel; patient is None if it does not exist"""
+    return tuple(await fan_out(get_patient_by_id(patient_id), get_patient_appointments(patient_id)))
+
+async def get_doctor_with_slots(doctor_id, date, duration_minutes=30):
+    """(doctor, free slots on date) read in parallel"""
+    return tuple(await fan_out(get_doctor_by_id(doctor_id),
+                               get_available_time_slots(doctor_id, date, duration_minutes)))
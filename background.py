@@ -0,0 +1,119 @@
+"""Run database calls off the Tk thread and hand results back to it.
+
+Tkinter is not thread-safe, so workers never touch widgets. Finished tasks are
+queued and picked up by a root.after() poll on the main loop, which then calls
+on_success/on_error there.
+"""
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+class Task:
+    """Handle for a submitted call"""
+
+    __slots__ = ('func', 'args', 'kwargs', 'on_success', 'on_error', 'key', 'owner', 'cancelled')
+
+    def __init__(self, func, args, kwargs, on_success, on_error, key, owner):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.on_success = on_success
+        self.on_error = on_error
+        self.key = key
+        self.owner = owner
+        self.cancelled = False
+
+    def cancel(self):
+        """Skip the call if it has not started and drop its result otherwise"""
+        self.cancelled = True
+
+class TaskRunner:
+    """Small worker pool whose callbacks run on the Tk main loop
+
+    A task can be tied to an owner widget: cancel(widget) drops every pending
+    task owned by that widget or its children, and results for destroyed
+    owners are discarded. Submitting with a key supersedes the previous task
+    with the same key, so only the latest request of a kind is delivered.
+    """
+
+    def __init__(self, root, max_workers=2, poll_interval=20):
+        self.root = root
+        self.poll_interval = poll_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db-worker")
+        self._done = queue.SimpleQueue()
+        self._pending = set()
+        self._by_key = {}
+        self._lock = threading.Lock()
+        self._polling = False
+
+    def submit(self, func, *args, on_success=None, on_error=None, key=None, owner=None, **kwargs):
+        """Run func(*args, **kwargs) on a worker thread"""
+        task = Task(func, args, kwargs, on_success, on_error, key, owner)
+        with self._lock:
+            if key is not None:
+                previous = self._by_key.get(key)
+                if previous is not None:
+                    previous.cancel()
+                self._by_key[key] = task
+            self._pending.add(task)
+        self._executor.submit(self._run, task)
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_interval, self._poll)
+        return task
+
+    def cancel(self, owner):
+        """Cancel pending tasks owned by this widget or any widget inside it"""
+        path = str(owner)
+        with self._lock:
+            for task in self._pending:
+                if task.owner is not None:
+                    owner_path = str(task.owner)
+                    if owner_path == path or owner_path.startswith(path + "."):
+                        task.cancel()
+
+    def shutdown(self):
+        """Cancel everything and stop the workers"""
+        with self._lock:
+            for task in self._pending:
+                task.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, task):
+        if task.cancelled:
+            self._done.put((task, None, None))
+            return
+        try:
+            result = task.func(*task.args, **task.kwargs)
+            self._done.put((task, result, None))
+        except Exception as e:
+            self._done.put((task, None, e))
+
+    def _poll(self):
+        while True:
+            try:
+                task, result, error = self._done.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._pending.discard(task)
+                if task.key is not None and self._by_key.get(task.key) is task:
+                    del self._by_key[task.key]
+            if task.cancelled:
+                continue
+            if task.owner is not None and not task.owner.winfo_exists():
+                continue
+            if error is not None:
+                if task.on_error:
+                    task.on_error(error)
+                else:
+                    self.root.report_callback_exception(type(error), error, error.__traceback__)
+            elif task.on_success:
+                task.on_success(result)
+
+        with self._lock:
+            busy = bool(self._pending)
+        if busy:
+            self.root.after(self.poll_interval, self._poll)
+        else:
+            self._polling = False
@@ -0,0 +1,130 @@
+"""Sustained throughput of async_database compared with calling database.py directly.
+
+Usage: python benchmarks/async_benchmark.py [--scale 100k] [--seconds 5] [--concurrency 1,4,16,64]
+
+Runs the same mix of read calls for a fixed time: first in a plain loop (the
+sync path), then from N concurrent coroutines through the async facade.
+Reports calls/sec and latency percentiles, plus patient-with-appointments
+lookups done sequentially versus fanned out.
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time as timer
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import async_database
+import database
+import generate_data
+
+def workload(rng, counts, days):
+    """(function name, args, kwargs) of one read call from the benchmark mix"""
+    day = (generate_data.FIRST_DAY + timedelta(days=rng.randrange(days))).isoformat()
+    choice = rng.randrange(4)
+    if choice == 0:
+        return 'get_patient_appointments', (rng.randint(1, counts['patients']),), {}
+    if choice == 1:
+        return 'get_available_time_slots', (rng.randint(1, counts['doctors']), day), {}
+    if choice == 2:
+        return 'is_time_slot_available', (rng.randint(1, counts['doctors']), day, "10:00", "10:30"), {}
+    return 'get_appointments', (), {'date': day, 'limit': 50}
+
+def summarize(label, latencies, elapsed):
+    latencies.sort()
+    print(f"{label:<28} {len(latencies) / elapsed:9.0f} calls/s   "
+          f"p50 {statistics.median(latencies):7.3f} ms   "
+          f"p95 {latencies[int(len(latencies) * 0.95)]:7.3f} ms")
+
+def run_sync(seconds, counts, days, seed):
+    rng = random.Random(seed)
+    latencies = []
+    started = timer.perf_counter()
+    deadline = started + seconds
+    while timer.perf_counter() < deadline:
+        name, args, kwargs = workload(rng, counts, days)
+        call_started = timer.perf_counter()
+        getattr(database, name)(*args, **kwargs)
+        latencies.append((timer.perf_counter() - call_started) * 1000)
+    summarize("sync", latencies, timer.perf_counter() - started)
+
+async def run_async(seconds, concurrency, counts, days, seed):
+    latencies = []
+    deadline = timer.perf_counter() + seconds
+
+    async def client(index):
+        rng = random.Random(seed + index)
+        while timer.perf_counter() < deadline:
+            name, args, kwargs = workload(rng, counts, days)
+            call_started = timer.perf_counter()
+            await getattr(async_database, name)(*args, **kwargs)
+            latencies.append((timer.perf_counter() - call_started) * 1000)
+
+    started = timer.perf_counter()
+    await asyncio.gather(*[client(i) for i in range(concurrency)])
+    summarize(f"async x{concurrency}", latencies, timer.perf_counter() - started)
+
+async def run_fan_out(counts, lookups, seed):
+    rng = random.Random(seed)
+    patient_ids = [rng.randint(1, counts['patients']) for _ in range(lookups)]
+
+    database.clear_caches()
+    started = timer.perf_counter()
+    for patient_id in patient_ids:
+        await async_database.get_patient_by_id(patient_id)
+        await async_database.get_patient_appointments(patient_id)
+    sequential = timer.perf_counter() - started
+
+    database.clear_caches()
+    started = timer.perf_counter()
+    for patient_id in patient_ids:
+        await async_database.get_patient_with_appointments(patient_id)
+    fanned_out = timer.perf_counter() - started
+
+    print(f"patient + appointments x{lookups}: sequential {sequential * 1000:.1f} ms, "
+          f"fan-out {fanned_out * 1000:.1f} ms")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare async_database with the sync API")
+    parser.add_argument('--scale', default='100k', choices=sorted(generate_data.SCALES))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--seconds', type=float, default=5.0, help="Duration of each run")
+    parser.add_argument('--concurrency', default='1,4,16,64', help="Comma separated client counts")
+    parser.add_argument('--workers', type=int, default=4, help="async_database worker threads")
+    parser.add_argument('--data-dir', help="Keep generated databases here and reuse them")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        source = os.path.join(args.data_dir or scratch, f"bench-{args.scale}-seed{args.seed}.db")
+        if not os.path.exists(source):
+            print(f"[{args.scale}] generating data...", file=sys.stderr)
+            generate_data.generate(source, args.scale, args.seed)
+            database.close_pool()
+        path = os.path.join(scratch, "async-run.db")
+        shutil.copyfile(source, path)
+
+        database.configure_pool(database=path, max_idle=max(args.workers, 5))
+        database.initialize_database()
+        counts = database.get_record_counts()
+        days = len(database.get_appointment_counts_by_day())
+        async_database.configure(max_workers=args.workers)
+
+        print(f"{counts['patients']} patients, {counts['doctors']} doctors, "
+              f"{counts['appointments']} appointments; {args.workers} async workers")
+        run_sync(args.seconds, counts, days, args.seed)
+        for concurrency in (int(value) for value in args.concurrency.split(',') if value.strip()):
+            asyncio.run(run_async(args.seconds, concurrency, counts, days, args.seed))
+        asyncio.run(run_fan_out(counts, 500, args.seed))
+
+        async_database.shutdown()
+        database.close_pool()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
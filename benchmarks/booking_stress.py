@@ -0,0 +1,127 @@
+"""Concurrent booking stress test: many processes booking the same few slots.
+
+Usage: python benchmarks/booking_stress.py [--writers 16] [--seconds 10] [--doctors 5] [--days 365] [--legacy]
+
+Every writer process books random 15-90 minute appointments on the same few
+doctors and days through schedule_appointment until the time is up. Afterwards
+the database is checked for overlapping appointments of the same doctor;
+any overlap is a double-booking and fails the run. --legacy books with the
+old check-then-insert sequence instead, to show the race this guards
+against.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time as timer
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from slot_engine import WORK_END, WORK_START, format_minutes
+
+FIRST_DAY = date(2030, 1, 1)
+
+def legacy_schedule_appointment(patient_id, doctor_id, appointment_date, start_time, end_time, notes=""):
+    """schedule_appointment as it was: availability check and insert on separate connections"""
+    if not database.is_time_slot_available(doctor_id, appointment_date, start_time, end_time):
+        raise ValueError("This time slot is already booked or invalid")
+    with database.get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''INSERT INTO appointments
+                          (patient_id, doctor_id, appointment_date, start_time, end_time, notes)
+                          VALUES (?, ?, ?, ?, ?, ?)''',
+                       (patient_id, doctor_id, appointment_date, start_time, end_time, notes))
+        conn.commit()
+        return cursor.lastrowid
+
+def writer(path, doctors, days, seconds, seed, legacy, start, results):
+    database.configure_pool(database=path)
+    book = legacy_schedule_appointment if legacy else database.schedule_appointment
+    rng = random.Random(seed)
+    dates = [(FIRST_DAY + timedelta(days=i)).isoformat() for i in range(days)]
+    counts = {'booked': 0, 'conflicts': 0, 'errors': 0}
+    latencies = []
+    start.wait()
+    deadline = timer.perf_counter() + seconds
+    while timer.perf_counter() < deadline:
+        begin = rng.randrange(WORK_START, WORK_END - 15, 15)
+        end = min(begin + rng.choice((15, 30, 45, 60, 90)), WORK_END)
+        called = timer.perf_counter()
+        try:
+            book(1, rng.randint(1, doctors), rng.choice(dates), format_minutes(begin), format_minutes(end))
+            counts['booked'] += 1
+        except ValueError:
+            counts['conflicts'] += 1
+        except sqlite3.OperationalError:
+            counts['errors'] += 1
+        latencies.append((timer.perf_counter() - called) * 1000)
+    latencies.sort()
+    counts['p50_ms'] = latencies[len(latencies) // 2] if latencies else 0.0
+    counts['p99_ms'] = latencies[int(len(latencies) * 0.99)] if latencies else 0.0
+    results.put(counts)
+
+def find_overlaps(path):
+    """Pairs of appointments of the same doctor whose times overlap"""
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('''SELECT a.id, b.id FROM appointments a
+                               JOIN appointments b ON b.doctor_id = a.doctor_id
+                                AND b.appointment_date = a.appointment_date AND b.id > a.id
+                                AND b.start_time < a.end_time AND a.start_time < b.end_time''').fetchall()
+    finally:
+        conn.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stress-test concurrent appointment booking")
+    parser.add_argument('--writers', type=int, default=16, help="Booking processes")
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--doctors', type=int, default=5, help="Fewer doctors means more contention")
+    parser.add_argument('--days', type=int, default=365, help="Days to book on")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--legacy', action='store_true', help="Use the old check-then-insert booking")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        path = os.path.join(scratch, "booking-stress.db")
+        database.configure_pool(database=path)
+        database.initialize_database()
+        database.insert_patient("Stress Patient", 40, "Other")
+        for i in range(args.doctors):
+            database.insert_doctor(f"Dr. Stress {i + 1}", "General Practice", 10, "Other")
+        database.close_pool()
+
+        context = multiprocessing.get_context('spawn')
+        start = context.Event()
+        results = context.Queue()
+        processes = [context.Process(target=writer, args=(path, args.doctors, args.days, args.seconds, args.seed + i,
+                                                          args.legacy, start, results))
+                     for i in range(args.writers)]
+        for process in processes:
+            process.start()
+        started = timer.perf_counter()
+        start.set()
+        totals = [results.get() for _ in processes]
+        elapsed = timer.perf_counter() - started
+        for process in processes:
+            process.join()
+
+        booked = sum(result['booked'] for result in totals)
+        conflicts = sum(result['conflicts'] for result in totals)
+        errors = sum(result['errors'] for result in totals)
+        overlaps = find_overlaps(path)
+        print(f"{args.writers} writers, {args.doctors} doctors x {args.days} days, {elapsed:.1f}s "
+              f"({'legacy' if args.legacy else 'transactional'} booking)")
+        print(f"booked {booked} ({booked / elapsed:.0f}/s), rejected as taken {conflicts}, "
+              f"lock errors {errors}, attempts {(booked + conflicts + errors) / elapsed:.0f}/s")
+        print(f"worst writer p50 {max(result['p50_ms'] for result in totals):.2f} ms, "
+              f"p99 {max(result['p99_ms'] for result in totals):.1f} ms")
+        print(f"double-bookings: {len(overlaps)}")
+    return 1 if overlaps else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""Seeded synthetic data for exercising database.py at scale.
+
+Usage: python benchmarks/generate_data.py {1k,100k,1m} path/to/scratch.db [--seed N]
+
+Writes realistic patients, doctors and appointments through the normal schema
+(so migrations, search index and triggers all apply). Appointments never
+overlap for a doctor: each doctor-day is filled with back-to-back visits and
+gaps inside working hours. The same scale and seed always produce the same
+database.
+"""
+import argparse
+import os
+import random
+import sys
+import time as timer
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from slot_engine import WORK_END, WORK_START, format_minutes
+
+# Number of patients and of appointments at each scale
+SCALES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+
+FIRST_NAMES = ("Aisha", "Ali", "Amir", "Anna", "Carlos", "Chen", "David", "Elena", "Fatima", "Grace",
+               "Hassan", "Ines", "James", "Jin", "Kofi", "Laila", "Liam", "Maria", "Mei", "Mohammed",
+               "Nadia", "Noah", "Olga", "Omar", "Priya", "Rahul", "Sara", "Sofia", "Tomas", "Yusuf", "Zainab")
+LAST_NAMES = ("Ahmed", "Ali", "Brown", "Chen", "Costa", "Diaz", "Garcia", "Hassan", "Ivanova", "Jones",
+              "Khan", "Kim", "Kowalski", "Lee", "Martin", "Mensah", "Nguyen", "Okafor", "Patel", "Rossi",
+              "Santos", "Schmidt", "Shah", "Silva", "Smith", "Tanaka", "Wang", "Williams", "Yilmaz")
+DIAGNOSES = ("Hypertension", "Type 2 diabetes", "Asthma", "Migraine", "Influenza", "Bronchitis",
+             "Back pain", "Anxiety", "Gastritis", "Allergic rhinitis", "Fractured wrist", "Anemia",
+             "Pneumonia", "Dermatitis", "Hypothyroidism", "Sinusitis", "Kidney stones", "")
+SPECIALIZATIONS = ("Cardiology", "Dermatology", "Endocrinology", "Gastroenterology", "General Practice",
+                   "Neurology", "Oncology", "Orthopedics", "Pediatrics", "Psychiatry", "Pulmonology")
+NOTES = ("Follow-up", "First visit", "Lab results review", "Prescription renewal", "Annual check-up",
+         "Post-operative check", "Referral", "", "", "")
+GENDERS = ('Male', 'Female', 'Other')
+DURATIONS = (15, 20, 30, 30, 45, 60)
+
+FIRST_DAY = date(2030, 1, 1)
+BATCH_SIZE = 10_000
+
+def doctor_count(scale_rows):
+    """Doctors needed so each works around ten visits a day over a few weeks"""
+    return max(5, scale_rows // 200)
+
+def _name(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+def patients(rng, count):
+    for _ in range(count):
+        admitted = FIRST_DAY - timedelta(days=rng.randrange(3 * 365))
+        yield (_name(rng), rng.randint(1, 95), rng.choice(GENDERS), rng.choice(DIAGNOSES), admitted.isoformat())
+
+def doctors(rng, count):
+    for _ in range(count):
+        yield ("Dr. " + _name(rng), rng.choice(SPECIALIZATIONS), rng.randint(0, 40), rng.choice(GENDERS))
+
+def appointments(rng, count, patient_count, doctor_ids):
+    """Yield non-overlapping appointments, day by day and doctor by doctor"""
+    produced = 0
+    day = FIRST_DAY
+    while produced < count:
+        day_text = day.isoformat()
+        for doctor_id in doctor_ids:
+            start = WORK_START
+            while produced < count:
+                start += rng.choice((0, 0, 0, 15, 30))  # Occasional gap between visits
+                end = start + rng.choice(DURATIONS)
+                if end > WORK_END:
+                    break
+                yield (rng.randint(1, patient_count), doctor_id, day_text,
+                       format_minutes(start), format_minutes(end), rng.choice(NOTES))
+                produced += 1
+                start = end
+            if produced >= count:
+                break
+        day += timedelta(days=1)
+
+def _insert(conn, query, rows, progress=None):
+    batch = []
+    total = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            conn.executemany(query, batch)
+            total += len(batch)
+            batch.clear()
+            if progress:
+                progress(total)
+    if batch:
+        conn.executemany(query, batch)
+        total += len(batch)
+    return total
+
+def generate(path, scale='1k', seed=42, progress=None):
+    """Create a fresh database at `path` filled with synthetic data; returns row counts"""
+    if scale not in SCALES:
+        raise ValueError("Scale must be one of: " + ", ".join(SCALES))
+    if os.path.exists(path):
+        raise FileExistsError(f"{path} already exists; generate into a fresh file")
+
+    rows = SCALES[scale]
+    rng = random.Random(seed)
+    database.configure_pool(database=path)
+    database.initialize_database()
+
+    with database.get_db_connection() as conn:
+        conn.execute('BEGIN')
+        patient_count = _insert(conn, '''INSERT INTO patients (name, age, gender, diagnosis, admission_date)
+                                          VALUES (?, ?, ?, ?, ?)''', patients(rng, rows))
+        count = _insert(conn, '''INSERT INTO doctors (name, specialization, experience, gender)
+                                 VALUES (?, ?, ?, ?)''', doctors(rng, doctor_count(rows)))
+        doctor_ids = list(range(1, count + 1))
+        appointment_count = _insert(conn, '''INSERT INTO appointments
+                                             (patient_id, doctor_id, appointment_date, start_time, end_time, notes)
+                                             VALUES (?, ?, ?, ?, ?, ?)''',
+                                    appointments(rng, rows, patient_count, doctor_ids), progress)
+        conn.commit()
+    return {'patients': patient_count, 'doctors': count, 'appointments': appointment_count}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic hospital database")
+    parser.add_argument('scale', choices=sorted(SCALES))
+    parser.add_argument('path')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    started = timer.perf_counter()
+
+    def report(done):
+        print(f"\r{done} appointments", end='', file=sys.stderr, flush=True)
+
+    try:
+        counts = generate(args.path, args.scale, args.seed, report)
+    except FileExistsError as e:
+        parser.error(str(e))
+    print(file=sys.stderr)
+    print(f"Generated {counts['patients']} patients, {counts['doctors']} doctors and "
+          f"{counts['appointments']} appointments in {timer.perf_counter() - started:.1f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
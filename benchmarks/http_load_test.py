@@ -0,0 +1,195 @@
+"""Load-test http_service.py over keep-alive connections.
+
+Usage:
+    python benchmarks/http_load_test.py [--scale 100k] [--clients 16] [--seconds 10]
+    python benchmarks/http_load_test.py --url http://127.0.0.1:8080 --clients 32
+
+Without --url a server is started on a scratch copy of generated data. Each
+client thread keeps one HTTP/1.1 connection open and sends a mix of list,
+detail, slot, conditional and booking requests. Reports requests/sec,
+latency percentiles and the status codes seen.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time as timer
+from collections import Counter
+from datetime import timedelta
+from urllib.parse import quote, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import generate_data
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def next_request(rng, counts, days, etags):
+    """(label, method, path, body, headers) of one request from the mix"""
+    day = (generate_data.FIRST_DAY + timedelta(days=rng.randrange(days))).isoformat()
+    choice = rng.random()
+    if choice < 0.2:
+        path = f"/patients?q={rng.choice(generate_data.LAST_NAMES)}&limit=20"
+        return 'search patients', 'GET', path, None, {}
+    if choice < 0.35:
+        return 'get patient', 'GET', f"/patients/{rng.randint(1, counts['patients'])}", None, {}
+    if choice < 0.5:
+        path = f"/doctors/{rng.randint(1, counts['doctors'])}/slots?date={day}"
+        return 'doctor slots', 'GET', path, None, {}
+    if choice < 0.65:
+        return 'appointments by date', 'GET', f"/appointments?date={day}&limit=50", None, {}
+    if choice < 0.8:
+        # Revalidate a list this client fetched before
+        path = "/doctors?limit=100"
+        headers = {'If-None-Match': etags[path]} if path in etags else {}
+        return 'conditional doctors', 'GET', path, None, headers
+    if choice < 0.9:
+        return 'patient appointments', 'GET', f"/patients/{rng.randint(1, counts['patients'])}/appointments", None, {}
+    if choice < 0.97:
+        path = f"/slots/earliest?from={day}&specialization={quote(rng.choice(generate_data.SPECIALIZATIONS))}&limit=5"
+        return 'earliest slots', 'GET', path, None, {}
+    # Bookings after the generated data, occasionally on a taken slot
+    booking_day = (generate_data.FIRST_DAY + timedelta(days=days + rng.randrange(30))).isoformat()
+    start = rng.randrange(9 * 60, 16 * 60, 30)
+    body = {'patient_id': rng.randint(1, counts['patients']), 'doctor_id': rng.randint(1, counts['doctors']),
+            'appointment_date': booking_day, 'start_time': f"{start // 60:02d}:{start % 60:02d}",
+            'end_time': f"{(start + 30) // 60:02d}:{(start + 30) % 60:02d}", 'notes': "Load test"}
+    return 'book appointment', 'POST', "/appointments", body, {}
+
+def client(host, port, deadline, seed, counts, days, results):
+    rng = random.Random(seed)
+    etags = {}
+    latencies = []
+    statuses = Counter()
+    by_label = {}
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    while timer.perf_counter() < deadline:
+        label, method, path, body, headers = next_request(rng, counts, days, etags)
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode('utf-8')
+            headers = dict(headers, **{'Content-Type': 'application/json'})
+        started = timer.perf_counter()
+        try:
+            conn.request(method, path, body=payload, headers=headers)
+            response = conn.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            statuses['connection error'] += 1
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+            continue
+        elapsed = (timer.perf_counter() - started) * 1000
+        latencies.append(elapsed)
+        by_label.setdefault(label, []).append(elapsed)
+        statuses[response.status] += 1
+        if response.getheader('ETag'):
+            etags[path] = response.getheader('ETag')
+    conn.close()
+    results.append((latencies, statuses, by_label))
+
+def _percentile(values, fraction):
+    """Value at `fraction` of a sorted sample, or None if it is empty"""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def run(host, port, clients, seconds, counts, days, seed):
+    results = []
+    deadline = timer.perf_counter() + seconds
+    threads = [threading.Thread(target=client, args=(host, port, deadline, seed + i, counts, days, results))
+               for i in range(clients)]
+    started = timer.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = timer.perf_counter() - started
+
+    latencies = sorted(value for result in results for value in result[0])
+    statuses = sum((result[1] for result in results), Counter())
+    by_label = {}
+    for result in results:
+        for label, values in result[2].items():
+            by_label.setdefault(label, []).extend(values)
+
+    if latencies:
+        print(f"{clients} clients, {elapsed:.1f}s: {len(latencies) / elapsed:.0f} requests/s, "
+              f"p50 {_percentile(latencies, 0.5):.2f} ms, p95 {_percentile(latencies, 0.95):.2f} ms, "
+              f"p99 {_percentile(latencies, 0.99):.2f} ms")
+    else:
+        print(f"{clients} clients, {elapsed:.1f}s: no successful requests "
+              f"({statuses['connection error']} connection errors)")
+    print("status codes: " + ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items(), key=str)))
+    for label, values in sorted(by_label.items()):
+        values.sort()
+        print(f"  {label:<24} {len(values):7d} requests   p50 {_percentile(values, 0.5):7.2f} ms   "
+              f"p95 {_percentile(values, 0.95):7.2f} ms")
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _wait_until_up(host, port, timeout=30):
+    deadline = timer.monotonic() + timeout
+    while timer.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=5)
+            conn.request('GET', '/health')
+            health = json.loads(conn.getresponse().read())
+            conn.close()
+            return health
+        except OSError:
+            timer.sleep(0.1)
+    raise RuntimeError("Server did not start")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the hospital HTTP service")
+    parser.add_argument('--url', help="Test a running server instead of starting one")
+    parser.add_argument('--scale', default='100k', choices=sorted(generate_data.SCALES))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--days', type=int, default=30,
+                        help="Days of generated appointments to query; bookings go after them")
+    parser.add_argument('--workers', type=int, default=4, help="Worker threads of the started server")
+    parser.add_argument('--data-dir', help="Keep generated databases here and reuse them")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        server = None
+        if args.url:
+            url = urlsplit(args.url)
+            host, port = url.hostname, url.port or 80
+        else:
+            source = os.path.join(args.data_dir or scratch, f"bench-{args.scale}-seed{args.seed}.db")
+            if not os.path.exists(source):
+                print(f"[{args.scale}] generating data...", file=sys.stderr)
+                generate_data.generate(source, args.scale, args.seed)
+                database.close_pool()
+            path = os.path.join(scratch, "http-run.db")
+            shutil.copyfile(source, path)
+            host, port = '127.0.0.1', _free_port()
+            server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'http_service.py'), '--port', str(port),
+                                       '--database', path, '--workers', str(args.workers)],
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            counts = _wait_until_up(host, port)['counts']
+            run(host, port, args.clients, args.seconds, counts, args.days, args.seed)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
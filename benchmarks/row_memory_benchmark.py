@@ -0,0 +1,76 @@
+"""Memory held by query results in each row format of database.py.
+
+Usage: python benchmarks/row_memory_benchmark.py [--scale 100k] [--rows 100000]
+
+Loads the same appointments, patients and doctors as dicts (the default),
+compact records and columns, and reports the memory the result occupies
+(measured with tracemalloc while it is alive), the peak while it was built,
+and the time taken.
+"""
+import argparse
+import gc
+import os
+import shutil
+import sys
+import tempfile
+import time as timer
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import generate_data
+from records import ROW_FORMATS
+
+QUERIES = {
+    'appointments': database.get_appointments,
+    'patients': database.get_patients,
+    'doctors': database.get_doctors,
+}
+
+def measure(fetch, rows, row_format):
+    """(result length, retained bytes, peak bytes, seconds) of one load"""
+    gc.collect()
+    tracemalloc.start()
+    started = timer.perf_counter()
+    result = fetch(limit=rows, row_format=row_format)
+    elapsed = timer.perf_counter() - started
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    length = len(result)
+    del result
+    return length, retained, peak, elapsed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the memory of dict, record and column results")
+    parser.add_argument('--scale', default='100k', choices=sorted(generate_data.SCALES))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--rows', type=int, default=100000, help="Rows to load per query")
+    parser.add_argument('--data-dir', help="Keep generated databases here and reuse them")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        source = os.path.join(args.data_dir or scratch, f"bench-{args.scale}-seed{args.seed}.db")
+        if not os.path.exists(source):
+            print(f"[{args.scale}] generating data...", file=sys.stderr)
+            generate_data.generate(source, args.scale, args.seed)
+            database.close_pool()
+        path = os.path.join(scratch, "row-memory-run.db")
+        shutil.copyfile(source, path)
+        database.configure_pool(database=path)
+        database.initialize_database()
+
+        for name, fetch in QUERIES.items():
+            fetch(limit=10)  # warm the connection and statement cache outside the measurement
+            baseline = None
+            for row_format in ROW_FORMATS:
+                length, retained, peak, elapsed = measure(fetch, args.rows, row_format)
+                baseline = baseline or retained
+                print(f"{name:<13} {row_format:<8} {length:8d} rows   retained {retained / 2**20:8.2f} MiB "
+                      f"({retained / max(length, 1):6.0f} B/row, {retained / baseline:5.0%} of dict)   "
+                      f"peak {peak / 2**20:8.2f} MiB   {elapsed * 1000:8.1f} ms")
+        database.close_pool()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
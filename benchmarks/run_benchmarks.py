@@ -0,0 +1,283 @@
+"""Time the database.py record, search, scheduling and dashboard functions at several scales.
+
+Usage:
+    python benchmarks/run_benchmarks.py --scales 1k,100k --output results.json
+    python benchmarks/run_benchmarks.py --scales 1m --data-dir ~/.cache/hms-bench --compare results.json
+
+Each scale is generated with generate_data.py (cached in --data-dir if given,
+always benchmarked on a scratch copy because some cases write). Every case is
+run a few times after a warm-up; min/median/p95/mean latencies in milliseconds
+are written as JSON so runs can be compared across commits with --compare.
+Connection, migration and validation helpers are not timed on their own.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time as timer
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import generate_data
+
+def _day(rng, days):
+    return (generate_data.FIRST_DAY + timedelta(days=rng.randrange(days))).isoformat()
+
+def build_cases(counts, days):
+    """(name, make_call) pairs; make_call(rng) returns the call to time"""
+    patients, doctors, appointments = counts['patients'], counts['doctors'], counts['appointments']
+    first_page = database.get_patients(limit=100)
+    specializations = database.get_specializations()
+    free_day = iter(range(10 ** 6))
+    series_window = iter(range(10 ** 4))
+
+    def new_patient():
+        return database.insert_patient("Benchmark Patient", 40, "Other", "Checkup")
+
+    def schedule(rng):
+        # A day after the generated data, so the slot is always free
+        day = (generate_data.FIRST_DAY + timedelta(days=days + next(free_day))).isoformat()
+        doctor_id = rng.randint(1, doctors)
+        return lambda: database.schedule_appointment(rng.randint(1, patients), doctor_id, day, "09:00", "09:30")
+
+    def update(rng):
+        patient_id = rng.randint(1, patients)
+        return lambda: database.update_patient(patient_id, "Updated Patient", 41, "Female", "Review")
+
+    def delete(rng):
+        patient_id = new_patient()
+        return lambda: database.delete_patient(patient_id)
+
+    def new_doctor():
+        return database.insert_doctor("Dr. Benchmark", specializations[0], 10, "Other")
+
+    def update_doctor(rng):
+        doctor_id = rng.randint(1, doctors)
+        return lambda: database.update_doctor(doctor_id, "Dr. Updated", specializations[0], 11, "Female")
+
+    def delete_doctor(rng):
+        doctor_id = new_doctor()
+        return lambda: database.delete_doctor(doctor_id)
+
+    def delete_booking(rng):
+        appointment_id = schedule(rng)()
+        return lambda: database.delete_appointment(appointment_id)
+
+    def schedule_series(rng):
+        # Twelve weekly visits in a window of their own, far after the single bookings
+        start = (generate_data.FIRST_DAY + timedelta(days=days + 10 ** 4 + 84 * next(series_window))).isoformat()
+        doctor_id = rng.randint(1, doctors)
+        return lambda: database.schedule_appointment_series(rng.randint(1, patients), doctor_id, start,
+                                                            "14:00", "14:30", "FREQ=WEEKLY;COUNT=12")
+
+    def get_series(rng):
+        series_id = schedule_series(rng)()['series_id']
+        return lambda: database.get_appointment_series(series_id)
+
+    def cancel_series(rng):
+        series_id = schedule_series(rng)()['series_id']
+        return lambda: database.cancel_appointment_series(series_id)
+
+    def uncached(call):
+        def make(rng):
+            database.clear_caches()
+            return call(rng)
+        return make
+
+    return [
+        # Patients
+        ("get_patients(limit=100)", lambda rng: lambda: database.get_patients(limit=100)),
+        ("get_patients(after, limit=100)",
+         lambda rng: lambda: database.get_patients(after=first_page[-1], limit=100)),
+        ("get_patients(search name, limit=100)",
+         lambda rng: lambda: database.get_patients(rng.choice(generate_data.LAST_NAMES), limit=100)),
+        ("get_patients(search prefix, limit=100)",
+         lambda rng: lambda: database.get_patients(rng.choice(generate_data.FIRST_NAMES)[:3], limit=100)),
+        ("search_patient_names(prefix, limit=10)",
+         lambda rng: lambda: database.search_patient_names(rng.choice(generate_data.FIRST_NAMES)[:2], limit=10)),
+        ("get_patients(search_by_id)",
+         lambda rng: lambda: database.get_patients(str(rng.randint(1, patients)), search_by_id=True)),
+        ("get_patient_by_id (uncached)", uncached(lambda rng: lambda: database.get_patient_by_id(rng.randint(1, patients)))),
+        ("get_patient_by_id (cached)", lambda rng: lambda: database.get_patient_by_id(1)),
+        ("get_patient_appointments",
+         lambda rng: lambda: database.get_patient_appointments(rng.randint(1, patients))),
+        ("insert_patient", lambda rng: new_patient),
+        ("update_patient", update),
+        ("delete_patient", delete),
+        # Doctors
+        ("get_doctors(limit=100)", lambda rng: lambda: database.get_doctors(limit=100)),
+        ("get_doctors(search specialization)",
+         lambda rng: lambda: database.get_doctors(rng.choice(generate_data.SPECIALIZATIONS), limit=100)),
+        ("search_doctor_names(surname, limit=10)",
+         lambda rng: lambda: database.search_doctor_names(rng.choice(generate_data.LAST_NAMES), limit=10)),
+        ("get_doctor_by_id (uncached)", uncached(lambda rng: lambda: database.get_doctor_by_id(rng.randint(1, doctors)))),
+        ("insert_doctor", lambda rng: new_doctor),
+        ("update_doctor", update_doctor),
+        ("delete_doctor", delete_doctor),
+        ("get_specializations", lambda rng: database.get_specializations),
+        # Appointments
+        ("get_appointments(limit=100)", lambda rng: lambda: database.get_appointments(limit=100)),
+        ("get_appointments(date, limit=100)",
+         lambda rng: lambda: database.get_appointments(date=_day(rng, days), limit=100)),
+        ("get_appointments(doctor_id)",
+         lambda rng: lambda: database.get_appointments(doctor_id=rng.randint(1, doctors))),
+        ("get_appointments(patient_id)",
+         lambda rng: lambda: database.get_appointments(patient_id=rng.randint(1, patients))),
+        ("get_appointments(date range, limit=100)",
+         lambda rng: lambda: database.get_appointments(date_from=_day(rng, days), date_to=_day(rng, days), limit=100)),
+        ("get_appointments(search, limit=100)",
+         lambda rng: lambda: database.get_appointments(search_term=rng.choice(generate_data.LAST_NAMES), limit=100)),
+        ("get_appointment_by_id (uncached)",
+         uncached(lambda rng: lambda: database.get_appointment_by_id(rng.randint(1, appointments)))),
+        ("is_time_slot_available",
+         lambda rng: lambda: database.is_time_slot_available(rng.randint(1, doctors), _day(rng, days), "10:00", "10:30")),
+        ("get_available_time_slots",
+         lambda rng: lambda: database.get_available_time_slots(rng.randint(1, doctors), _day(rng, days))),
+        ("get_day_schedules(20 doctors x 7 days)",
+         lambda rng: lambda: database.get_day_schedules(
+             rng.sample(range(1, doctors + 1), min(20, doctors)), [_day(rng, days) for _ in range(7)])),
+        ("get_available_time_slots_batch(20 doctors x 7 days)",
+         lambda rng: lambda: database.get_available_time_slots_batch(
+             rng.sample(range(1, doctors + 1), min(20, doctors)), [_day(rng, days) for _ in range(7)])),
+        ("find_earliest_slots(specialization, 30 days)",
+         lambda rng: lambda: database.find_earliest_slots(
+             30, generate_data.FIRST_DAY.isoformat(),
+             (generate_data.FIRST_DAY + timedelta(days=29)).isoformat(),
+             specialization=rng.choice(specializations), limit=10)),
+        ("schedule_appointment", schedule),
+        ("delete_appointment", delete_booking),
+        ("preview_appointment_series(weekly x 12)",
+         lambda rng: lambda: database.preview_appointment_series(
+             rng.randint(1, doctors), _day(rng, days), "10:00", "10:30", "FREQ=WEEKLY;COUNT=12")),
+        ("schedule_appointment_series(weekly x 12)", schedule_series),
+        ("get_appointment_series", get_series),
+        ("cancel_appointment_series", cancel_series),
+        # Dashboard and history
+        ("get_recent_activity", lambda rng: database.get_recent_activity),
+        ("get_activity_log(limit=100)", lambda rng: lambda: database.get_activity_log(limit=100)),
+        ("get_record_counts", lambda rng: database.get_record_counts),
+        ("get_appointment_counts_by_day", lambda rng: database.get_appointment_counts_by_day),
+        ("get_appointment_counts_by_doctor", lambda rng: database.get_appointment_counts_by_doctor),
+    ]
+
+def measure(make_call, rng, repeat, warmup=2):
+    """Latency statistics of one case in milliseconds"""
+    for _ in range(warmup):
+        make_call(rng)()
+    samples = []
+    for _ in range(repeat):
+        call = make_call(rng)
+        started = timer.perf_counter()
+        call()
+        samples.append((timer.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        'min_ms': round(samples[0], 4),
+        'median_ms': round(statistics.median(samples), 4),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        'mean_ms': round(statistics.fmean(samples), 4),
+        'runs': repeat,
+    }
+
+def benchmark_scale(scale, seed, repeat, data_dir, scratch, only=None):
+    source = os.path.join(data_dir or scratch, f"bench-{scale}-seed{seed}.db")
+    if not os.path.exists(source):
+        print(f"[{scale}] generating data...", file=sys.stderr)
+        generate_data.generate(source, scale, seed)
+        database.close_pool()
+    path = os.path.join(scratch, f"run-{scale}.db")
+    shutil.copyfile(source, path)
+
+    database.configure_pool(database=path)
+    database.initialize_database()
+    counts = database.get_record_counts()
+    days = len(database.get_appointment_counts_by_day())
+    rng = random.Random(seed)
+
+    results = {}
+    for name, make_call in build_cases(counts, days):
+        if only and only not in name:
+            continue
+        results[name] = measure(make_call, rng, repeat)
+        print(f"[{scale}] {name:<52} median {results[name]['median_ms']:9.3f} ms", file=sys.stderr)
+    database.close_pool()
+    os.remove(path)
+    return {'rows': counts, 'results': results}
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(previous, current):
+    """Print the median change of every case present in both runs (to stderr)"""
+    print(f"{'case':<60} {'before':>10} {'after':>10} {'change':>8}", file=sys.stderr)
+    for scale, run in current['scales'].items():
+        old = previous.get('scales', {}).get(scale, {}).get('results', {})
+        for name, stats in run['results'].items():
+            if name not in old:
+                continue
+            before, after = old[name]['median_ms'], stats['median_ms']
+            change = (after - before) / before * 100 if before else 0.0
+            print(f"{f'[{scale}] {name}':<60} {before:10.3f} {after:10.3f} {change:+7.1f}%", file=sys.stderr)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark database.py on synthetic data")
+    parser.add_argument('--scales', default='1k,100k', help="Comma separated: " + ", ".join(generate_data.SCALES))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=20, help="Timed runs per case")
+    parser.add_argument('--only', help="Only run cases whose name contains this text")
+    parser.add_argument('--data-dir', help="Keep generated databases here and reuse them")
+    parser.add_argument('--output', help="Write JSON results to this file (default: stdout)")
+    parser.add_argument('--compare', help="Earlier JSON results to compare medians against")
+    args = parser.parse_args(argv)
+
+    scales = [scale.strip() for scale in args.scales.split(',') if scale.strip()]
+    unknown = [scale for scale in scales if scale not in generate_data.SCALES]
+    if unknown:
+        parser.error("Unknown scale: " + ", ".join(unknown))
+    if args.data_dir:
+        os.makedirs(args.data_dir, exist_ok=True)
+
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': timer.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'repeat': args.repeat,
+        },
+        'scales': {},
+    }
+    with tempfile.TemporaryDirectory() as scratch:
+        for scale in scales:
+            report['scales'][scale] = benchmark_scale(scale, args.seed, args.repeat, args.data_dir,
+                                                      scratch, args.only)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(json.load(f), report)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""Compare the slot engine with the original per-slot scan.
+
+Usage: python benchmarks/slot_benchmark.py [--doctors 50] [--days 30] [--per-day 12]
+
+Builds a scratch database in a temporary directory, checks that both
+implementations return identical slots, then times them.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time as timer
+from datetime import date, datetime, time, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+def legacy_available_time_slots(doctor_id, date, duration_minutes=30):
+    """get_available_time_slots as it was before the slot engine"""
+    with database.get_db_connection() as conn:
+        cursor = conn.cursor()
+        work_start = time(9, 0)
+        work_end = time(17, 0)
+        cursor.execute('''SELECT start_time, end_time FROM appointments 
+                          WHERE doctor_id = ? AND appointment_date = ?
+                          ORDER BY start_time''',
+                     (doctor_id, date))
+        appointments = [(time.fromisoformat(row['start_time']), 
+                        time.fromisoformat(row['end_time'])) 
+                       for row in cursor.fetchall()]
+        available_slots = []
+        current_time = work_start
+        while current_time < work_end:
+            slot_end = (datetime.combine(datetime.today(), current_time) + 
+                       timedelta(minutes=duration_minutes)).time()
+            if slot_end > work_end:
+                break
+            slot_available = True
+            for appt_start, appt_end in appointments:
+                if not (current_time >= appt_end or slot_end <= appt_start):
+                    slot_available = False
+                    break
+            if slot_available:
+                available_slots.append((
+                    current_time.strftime('%H:%M'),
+                    slot_end.strftime('%H:%M')
+                ))
+            current_time = slot_end
+        return available_slots
+
+def populate(doctors, days, per_day, seed=42):
+    rng = random.Random(seed)
+    first_day = date(2030, 1, 1)
+    dates = [(first_day + timedelta(days=i)).isoformat() for i in range(days)]
+    with database.get_db_connection() as conn:
+        conn.execute("INSERT INTO patients (name, age, gender) VALUES ('Bench Patient', 30, 'Other')")
+        conn.executemany("INSERT INTO doctors (name, specialization, experience, gender) VALUES (?, 'General', 5, 'Other')",
+                         [(f"Doctor {i}",) for i in range(doctors)])
+        rows = []
+        for doctor_id in range(1, doctors + 1):
+            for day in dates:
+                for start in sorted(rng.sample(range(8 * 60, 18 * 60, 5), per_day)):
+                    end = start + rng.choice((10, 15, 20, 30, 45))
+                    rows.append((doctor_id, day, f"{start // 60:02d}:{start % 60:02d}",
+                                 f"{end // 60:02d}:{end % 60:02d}"))
+        conn.executemany('''INSERT INTO appointments (patient_id, doctor_id, appointment_date, start_time, end_time)
+                            VALUES (1, ?, ?, ?, ?)''', rows)
+        conn.commit()
+    return list(range(1, doctors + 1)), dates
+
+def timed(label, calls, func):
+    started = timer.perf_counter()
+    result = func()
+    elapsed = timer.perf_counter() - started
+    print(f"{label:<38} {elapsed * 1000:9.1f} ms  ({elapsed / calls * 1e6:8.1f} us per doctor-day)")
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the slot engine with the original per-slot scan")
+    parser.add_argument('--doctors', type=int, default=50)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--per-day', type=int, default=12, help="Appointments per doctor and day")
+    args = parser.parse_args(argv)
+    if args.doctors < 1 or args.days < 1 or not 0 <= args.per_day <= 120:
+        parser.error("need at least one doctor and day, and 0-120 appointments per day")
+    doctors, days, per_day = args.doctors, args.days, args.per_day
+    with tempfile.TemporaryDirectory() as scratch:
+        database.configure_pool(database=os.path.join(scratch, 'bench.db'))
+        database.initialize_database()
+        doctor_ids, dates = populate(doctors, days, per_day)
+        pairs = [(d, day) for d in doctor_ids for day in dates]
+        print(f"{doctors} doctors x {days} days, {per_day} appointments per day")
+        
+        for duration in (15, 30):
+            print(f"\nduration {duration} min")
+            legacy = timed("legacy get_available_time_slots", len(pairs),
+                           lambda: {p: legacy_available_time_slots(*p, duration) for p in pairs})
+            single = timed("get_available_time_slots", len(pairs),
+                           lambda: {p: database.get_available_time_slots(*p, duration) for p in pairs})
+            batch = timed("get_available_time_slots_batch", len(pairs),
+                          lambda: database.get_available_time_slots_batch(doctor_ids, dates, duration))
+            assert legacy == single == batch, "slot engine disagrees with the legacy implementation"
+            
+            earliest = timed("find_earliest_slots (first 20)", len(pairs),
+                             lambda: database.find_earliest_slots(duration, dates[0], dates[-1], limit=20))
+            expected = sorted((day, start, doctor_id, end) for (doctor_id, day), slots in batch.items()
+                              for start, end in slots)[:20]
+            assert [(s['date'], s['start_time'], s['doctor_id'], s['end_time']) for s in earliest] == expected, \
+                "find_earliest_slots disagrees with the batch slots"
+        database.close_pool()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+"""Streaming bulk import of patients, doctors and appointments.
+
+Reads CSV (with a header row) or NDJSON one record at a time, validates each
+record with the same rules as insert_patient/insert_doctor/schedule_appointment
+and writes accepted rows with executemany inside large transactions. Rejected
+records go to an optional reject file together with the reason.
+
+Usage:
+    python bulk_import.py patients registry.csv --rejects rejected.csv
+    python bulk_import.py appointments visits.ndjson --batch-size 5000
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+
+import database
+
+# Column order of the INSERT statement for each entity
+ENTITIES = {
+    'patients': ('name', 'age', 'gender', 'diagnosis', 'admission_date'),
+    'doctors': ('name', 'specialization', 'experience', 'gender'),
+    'appointments': ('patient_id', 'doctor_id', 'appointment_date', 'start_time', 'end_time', 'notes'),
+}
+
+_INSERTS = {
+    'patients': '''INSERT INTO patients (name, age, gender, diagnosis, admission_date)
+                   VALUES (?, ?, ?, ?, COALESCE(?, CURRENT_DATE))''',
+    'doctors': '''INSERT INTO doctors (name, specialization, experience, gender)
+                  VALUES (?, ?, ?, ?)''',
+    'appointments': '''INSERT INTO appointments
+                       (patient_id, doctor_id, appointment_date, start_time, end_time, notes,
+                        appointment_day, start_minute, end_minute)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+}
+
+def detect_format(path):
+    """Guess 'csv' or 'ndjson' from the file extension"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.ndjson', '.jsonl', '.json'):
+        return 'ndjson'
+    return 'csv'
+
+def read_records(path, fmt=None):
+    """Yield (line_number, record) pairs without loading the whole file
+
+    A record that cannot be parsed is yielded as (line_number, ValueError).
+    """
+    fmt = fmt or detect_format(path)
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        if fmt == 'csv':
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record
+        elif fmt == 'ndjson':
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    if not isinstance(record, dict):
+                        raise ValueError("Expected a JSON object")
+                except ValueError as e:
+                    yield line_number, ValueError(f"Malformed JSON: {e}")
+                    continue
+                yield line_number, record
+        else:
+            raise ValueError(f"Unsupported format: {fmt}")
+
+def _text(record, key):
+    value = record.get(key)
+    return "" if value is None else str(value)
+
+def _integer(record, key):
+    value = record.get(key)
+    if isinstance(value, int):
+        return value
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        raise ValueError(f"{key} must be a whole number")
+
+def parse_patient(record):
+    """Validate one patient record and return the INSERT parameters"""
+    values = database.validate_patient(_text(record, 'name'), _integer(record, 'age'),
+                                       _text(record, 'gender'), _text(record, 'diagnosis'))
+    admission_date = _text(record, 'admission_date').strip() or None
+    if admission_date:
+        database.to_day(admission_date)
+    return (*values, admission_date)
+
+def parse_doctor(record):
+    """Validate one doctor record and return the INSERT parameters"""
+    return database.validate_doctor(_text(record, 'name'), _text(record, 'specialization'),
+                                    _integer(record, 'experience'), _text(record, 'gender'))
+
+def parse_appointment(record):
+    """Validate one appointment record and return the INSERT parameters"""
+    values = (_integer(record, 'patient_id'), _integer(record, 'doctor_id'),
+              _text(record, 'appointment_date').strip(), _text(record, 'start_time').strip(),
+              _text(record, 'end_time').strip(), _text(record, 'notes'))
+    database.validate_appointment_time(*values[2:5])
+    return values
+
+_PARSERS = {
+    'patients': parse_patient,
+    'doctors': parse_doctor,
+    'appointments': parse_appointment,
+}
+
+class RejectWriter:
+    """Write rejected records, with the reason, in the format they came in"""
+
+    def __init__(self, path, fmt):
+        self.path = path
+        self.fmt = fmt
+        self._file = None
+        self._writer = None
+
+    def write(self, line_number, record, error):
+        if not self.path:
+            return
+        if self._file is None:
+            self._file = open(self.path, 'w', newline='', encoding='utf-8')
+        if not isinstance(record, dict):
+            record = {}
+        if self.fmt == 'csv':
+            if self._writer is None:
+                fields = ['line', 'error'] + [k for k in record if k not in ('line', 'error')]
+                self._writer = csv.DictWriter(self._file, fieldnames=fields, extrasaction='ignore')
+                self._writer.writeheader()
+            self._writer.writerow({**record, 'line': line_number, 'error': error})
+        else:
+            self._file.write(json.dumps({'line': line_number, 'error': error, 'record': record}) + "\n")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+def _check_appointments(cursor, batch):
+    """Split a batch of appointment rows into accepted rows and rejections
+
+    Referenced patients/doctors and existing bookings are fetched for the whole
+    batch at once; earlier rows of the same import are visible because they
+    were inserted through the same connection. Accepted rows gain the integer
+    day and minutes the insert stores and keep their line number and record.
+    """
+    patient_ids = {row[0] for _, _, row in batch}
+    doctor_ids = {row[1] for _, _, row in batch}
+    known_patients = _existing_ids(cursor, 'patients', patient_ids)
+    known_doctors = _existing_ids(cursor, 'doctors', doctor_ids)
+    schedules = database.load_day_schedules(
+        cursor, [row[1] for _, _, row in batch], [row[2] for _, _, row in batch])
+
+    accepted, rejected = [], []
+    for line_number, record, row in batch:
+        patient_id, doctor_id, date, start_time, end_time, _ = row
+        start, end = database.to_minutes(start_time), database.to_minutes(end_time)
+        schedule = schedules[(doctor_id, date)]
+        if patient_id not in known_patients:
+            rejected.append((line_number, record, f"Unknown patient_id {patient_id}"))
+        elif doctor_id not in known_doctors:
+            rejected.append((line_number, record, f"Unknown doctor_id {doctor_id}"))
+        elif schedule.conflicts(start, end):
+            rejected.append((line_number, record, "This time slot is already booked"))
+        else:
+            schedule.add(start, end)
+            accepted.append((line_number, record, (*row, database.to_day(date), start, end)))
+    return accepted, rejected
+
+def _insert_batch(cursor, insert, batch, reject):
+    """Insert (line_number, record, row) triples and return how many went in
+
+    If a row breaks a schema constraint the batch is undone and retried one
+    row at a time, so only the offending rows are rejected.
+    """
+    cursor.execute('SAVEPOINT import_batch')
+    try:
+        cursor.executemany(insert, [row for _, _, row in batch])
+        return len(batch)
+    except sqlite3.IntegrityError:
+        cursor.execute('ROLLBACK TO import_batch')
+        inserted = 0
+        for line_number, record, row in batch:
+            try:
+                cursor.execute(insert, row)
+                inserted += 1
+            except sqlite3.IntegrityError as e:
+                reject(line_number, record, str(e))
+        return inserted
+    finally:
+        cursor.execute('RELEASE import_batch')
+
+def _existing_ids(cursor, table, ids):
+    found = set()
+    ids = sorted(ids)
+    for i in range(0, len(ids), 900):
+        chunk = ids[i:i + 900]
+        cursor.execute(f"SELECT id FROM {table} WHERE id IN ({', '.join('?' for _ in chunk)})", chunk)
+        found.update(row[0] for row in cursor)
+    return found
+
+def import_records(entity, records, batch_size=1000, commit_every=None, rejects=None, progress=None):
+    """Validate and insert an iterable of (line_number, record) pairs
+
+    Each batch is committed on its own by default, so the write lock is only
+    held while a batch is checked and inserted and desk bookings can go on
+    meanwhile. commit_every=N keeps the transaction open until N rows are in,
+    which is somewhat faster for offline loads but blocks every other writer
+    for that long. progress(read, imported, rejected) is called after every
+    batch. Returns a dict with the read/imported/rejected counts and the
+    elapsed seconds.
+    """
+    if entity not in _PARSERS:
+        raise ValueError(f"Unknown entity: {entity}")
+    parse = _PARSERS[entity]
+    insert = _INSERTS[entity]
+    stats = {'read': 0, 'imported': 0, 'rejected': 0}
+    started = time.perf_counter()
+
+    def reject(line_number, record, error):
+        stats['rejected'] += 1
+        if rejects is not None:
+            rejects.write(line_number, record, error)
+
+    with database.get_db_connection() as conn:
+        cursor = conn.cursor()
+        uncommitted = 0
+        batch = []
+
+        def flush():
+            nonlocal uncommitted
+            if not conn.in_transaction:
+                # Hold the write lock before checking, so other writers cannot
+                # book a slot between the checks and the inserts
+                database.begin_immediate(conn)
+            if entity == 'appointments':
+                accepted, rejected = _check_appointments(cursor, batch)
+                for line_number, record, error in rejected:
+                    reject(line_number, record, error)
+            else:
+                accepted = batch
+            inserted = _insert_batch(cursor, insert, accepted, reject)
+            stats['imported'] += inserted
+            uncommitted += inserted
+            batch.clear()
+            if commit_every is None or uncommitted >= commit_every:
+                conn.commit()
+                uncommitted = 0
+            if progress:
+                progress(stats['read'], stats['imported'], stats['rejected'])
+
+        try:
+            for line_number, record in records:
+                stats['read'] += 1
+                if isinstance(record, Exception):
+                    reject(line_number, None, str(record))
+                    continue
+                try:
+                    batch.append((line_number, record, parse(record)))
+                except ValueError as e:
+                    reject(line_number, record, str(e))
+                    continue
+                if len(batch) >= batch_size:
+                    flush()
+            if batch:
+                flush()
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    stats['seconds'] = time.perf_counter() - started
+    return stats
+
+def import_file(entity, path, fmt=None, reject_path=None, batch_size=1000, commit_every=None, progress=None):
+    """Stream a CSV or NDJSON file into the database"""
+    fmt = fmt or detect_format(path)
+    rejects = RejectWriter(reject_path, fmt)
+    try:
+        return import_records(entity, read_records(path, fmt), batch_size=batch_size,
+                              commit_every=commit_every, rejects=rejects, progress=progress)
+    finally:
+        rejects.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import records into the hospital database")
+    parser.add_argument('entity', choices=sorted(ENTITIES))
+    parser.add_argument('path', help="CSV (with header) or NDJSON file")
+    parser.add_argument('--format', choices=('csv', 'ndjson'), help="Input format (default: from extension)")
+    parser.add_argument('--rejects', help="Write rejected records and reasons to this file")
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--commit-every', type=int,
+                        help="Commit every N rows instead of every batch; faster offline, "
+                             "but other writers wait for the whole transaction")
+    parser.add_argument('--database', help="Database file (default: hospital.db)")
+    args = parser.parse_args(argv)
+
+    if args.database:
+        database.configure_pool(database=args.database)
+    database.initialize_database()
+
+    started = time.perf_counter()
+
+    def report(read, imported, rejected):
+        rate = read / max(time.perf_counter() - started, 1e-9)
+        print(f"\r{read} read, {imported} imported, {rejected} rejected ({rate:,.0f} rows/sec)",
+              end='', file=sys.stderr, flush=True)
+
+    stats = import_file(args.entity, args.path, args.format, args.rejects,
+                        args.batch_size, args.commit_every, report)
+    print(file=sys.stderr)
+    print(f"Imported {stats['imported']} of {stats['read']} {args.entity} "
+          f"in {stats['seconds']:.1f}s ({stats['rejected']} rejected)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,358 +1,1577 @@
+import heapq
+import logging
+import random
+import re
 import sqlite3
+import threading
+import time as _time
+from collections import OrderedDict
 from contextlib import contextmanager
 from datetime import datetime, time, timedelta
 
+import instrumentation
+import records
+from recurrence import Recurrence
+from slot_engine import DaySchedule, format_day, format_minutes, to_day, to_minutes
+
+DB_PATH = 'hospital.db'
+
+logger = logging.getLogger(__name__)
+
+class ConnectionPool:
+    """Thread-aware pool of reusable SQLite connections.
+
+    A connection is only ever checked out by one thread at a time. Idle
+    connections remember the thread that last used them so a thread gets its
+    own warm connection back whenever possible. Connections that sat idle for
+    longer than ``health_check_interval`` seconds are pinged before reuse and
+    replaced if they turn out to be broken.
+
+    ``max_idle`` bounds only the connections kept open between uses, not how
+    many are checked out at once: every caller gets a connection straight
+    away, and a thread may hold several (get_db_connection nests), so a hard
+    limit could deadlock. Concurrency is bounded by the callers instead, e.g.
+    the async_database worker pool.
+    """
+
+    def __init__(self, database=DB_PATH, max_idle=5, health_check_interval=30.0, timeout=5.0):
+        self.database = database
+        self.max_idle = max_idle
+        self.health_check_interval = health_check_interval
+        self.timeout = timeout
+        self._idle = []  # (connection, owner thread id, last used)
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database, timeout=self.timeout, check_same_thread=False,
+                               factory=instrumentation.InstrumentedConnection)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        return conn
+
+    def _is_healthy(self, conn):
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self):
+        """Check out a connection, preferring the one this thread used last"""
+        thread_id = threading.get_ident()
+        entry = None
+        with self._lock:
+            for i in range(len(self._idle) - 1, -1, -1):
+                if self._idle[i][1] == thread_id:
+                    entry = self._idle.pop(i)
+                    break
+            if entry is None and self._idle:
+                entry = self._idle.pop()
+        
+        if entry is None:
+            return self._connect()
+        
+        conn, _, last_used = entry
+        if _time.monotonic() - last_used > self.health_check_interval and not self._is_healthy(conn):
+            self._discard(conn)
+            return self._connect()
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, closing it if max_idle are already idle"""
+        if conn.in_transaction:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                self._discard(conn)
+                return
+        
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append((conn, threading.get_ident(), _time.monotonic()))
+                return
+        self._discard(conn)
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def close_all(self):
+        """Close every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _, _ in idle:
+            self._discard(conn)
+
+_pool = ConnectionPool()
+
+def configure_pool(database=None, max_idle=None, health_check_interval=None):
+    """Change pool settings; switching databases drops the idle connections"""
+    if database is not None and database != _pool.database:
+        _pool.close_all()
+        _pool.database = database
+        _search_index_cache.clear()
+        clear_caches()
+    if max_idle is not None:
+        _pool.max_idle = max_idle
+    if health_check_interval is not None:
+        _pool.health_check_interval = health_check_interval
+
+def close_pool():
+    """Close all pooled connections (e.g. on application exit)"""
+    _pool.close_all()
+
+# Entity cache
+class EntityCache:
+    """Bounded LRU read-through cache of rows keyed by id
+
+    Writers call invalidate() for the rows they change; misses are not cached,
+    so inserts never leave anything stale behind. Every invalidation
+    bumps a generation counter, and a row loaded while an invalidation
+    happened is not stored, so a slow reader cannot put back a stale row.
+    """
+
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, load):
+        """Return a copy of the cached row, calling load(key) on a miss"""
+        with self._lock:
+            row = self._rows.get(key)
+            if row is not None:
+                self._rows.move_to_end(key)
+                self.hits += 1
+                return dict(row)
+            self.misses += 1
+            generation = self._generation
+        
+        row = load(key)
+        if row is None:
+            return None
+        
+        with self._lock:
+            if generation == self._generation:
+                self._rows[key] = row
+                self._rows.move_to_end(key)
+                while len(self._rows) > self.max_size:
+                    self._rows.popitem(last=False)
+                    self.evictions += 1
+        return dict(row)
+
+    def invalidate(self, key):
+        """Forget one row"""
+        with self._lock:
+            self._generation += 1
+            self._rows.pop(key, None)
+
+    def invalidate_where(self, predicate):
+        """Forget every cached row for which predicate(row) is true"""
+        with self._lock:
+            self._generation += 1
+            for key in [key for key, row in self._rows.items() if predicate(row)]:
+                del self._rows[key]
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._rows.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._rows), 'max_size': self.max_size, 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions}
+
+_patient_cache = EntityCache()
+_doctor_cache = EntityCache()
+# Appointment rows carry patient and doctor names, so they are also dropped
+# when the patient or doctor they refer to changes
+_appointment_cache = EntityCache()
+_ENTITY_CACHES = {'patients': _patient_cache, 'doctors': _doctor_cache, 'appointments': _appointment_cache}
+
+def cache_stats():
+    """Hit/miss/eviction counters of the entity caches"""
+    return {name: cache.stats() for name, cache in _ENTITY_CACHES.items()}
+
+def clear_caches():
+    """Drop every cached entity (e.g. after the database was changed externally)"""
+    for cache in _ENTITY_CACHES.values():
+        cache.clear()
+
+def _invalidate_patient(patient_id):
+    patient_id = int(patient_id)
+    _patient_cache.invalidate(patient_id)
+    _appointment_cache.invalidate_where(lambda row: row['patient_id'] == patient_id)
+
+def _invalidate_doctor(doctor_id):
+    doctor_id = int(doctor_id)
+    _doctor_cache.invalidate(doctor_id)
+    _appointment_cache.invalidate_where(lambda row: row['doctor_id'] == doctor_id)
+
+# Databases whose schema has been created/migrated by this process
+_initialized = set()
+_init_lock = threading.Lock()
+
+def _ensure_initialized(conn):
+    """Create and migrate the schema the first time a database file is used"""
+    with _init_lock:
+        if _pool.database in _initialized:
+            return
+        # Readers keep going while a booking holds the write lock
+        conn.execute('PRAGMA journal_mode = WAL')
+        _create_schema(conn)
+        migrate_database(conn)
+        _initialized.add(_pool.database)
+
+# Connection each thread currently has checked out, so its statement can be interrupted
+_active_connections = {}
+
 @contextmanager
 def get_db_connection():
     conn = None
+    thread_id = threading.get_ident()
+    outer = _active_connections.get(thread_id)
     try:
-        conn = sqlite3.connect('hospital.db')
-        conn.row_factory = sqlite3.Row
+        conn = _pool.acquire()
+        _active_connections[thread_id] = conn
+        if _pool.database not in _initialized:
+            _ensure_initialized(conn)
         yield conn
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         raise
     finally:
+        if outer is None:
+            _active_connections.pop(thread_id, None)
+        else:
+            _active_connections[thread_id] = outer
         if conn:
-            conn.close()
+            _pool.release(conn)
+
+def interrupt_thread(thread_id):
+    """Abort the statement running on the connection thread_id has checked out
+
+    The interrupted call raises sqlite3.OperationalError and its transaction
+    is rolled back when the connection goes back to the pool. Returns False
+    if the thread is not using a connection.
+    """
+    conn = _active_connections.get(thread_id)
+    if conn is None:
+        return False
+    conn.interrupt()
+    return True
+
+# Write transactions under contention: each attempt waits briefly for the write
+# lock, then backs off for a random, growing time so competing writers spread out
+WRITE_LOCK_WAIT_MS = 50
+WRITE_BACKOFF = (0.002, 0.1)  # first and largest backoff in seconds
+WRITE_MAX_WAIT = 10.0
+
+def _is_busy(error):
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+def begin_immediate(conn):
+    """Start a transaction that holds the write lock from its first statement
+
+    Checks made inside it cannot be invalidated by another writer before the
+    commit. Raises sqlite3.OperationalError if the lock stays taken for
+    WRITE_MAX_WAIT seconds.
+    """
+    deadline = _time.monotonic() + WRITE_MAX_WAIT
+    backoff = WRITE_BACKOFF[0]
+    conn.execute(f'PRAGMA busy_timeout = {WRITE_LOCK_WAIT_MS}')
+    try:
+        while True:
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                return
+            except sqlite3.OperationalError as e:
+                if not _is_busy(e) or _time.monotonic() >= deadline:
+                    raise
+            _time.sleep(random.uniform(0, backoff))
+            backoff = min(backoff * 2, WRITE_BACKOFF[1])
+    finally:
+        conn.execute(f'PRAGMA busy_timeout = {int(_pool.timeout * 1000)}')
 
 def initialize_database():
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        
-        # Patients table with creation timestamp
-        cursor.execute('''CREATE TABLE IF NOT EXISTS patients (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            name TEXT NOT NULL,
-                            age INTEGER CHECK(age > 0),
-                            gender TEXT CHECK(gender IN ('Male', 'Female', 'Other')),
-                            diagnosis TEXT,
-                            admission_date TEXT DEFAULT CURRENT_DATE,
-                            created_at TEXT DEFAULT (datetime('now','localtime')))''')
-        
-        # Doctors table
-        cursor.execute('''CREATE TABLE IF NOT EXISTS doctors (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            name TEXT NOT NULL,
-                            specialization TEXT NOT NULL,
-                            experience INTEGER CHECK(experience >= 0),
-                            gender TEXT CHECK(gender IN ('Male', 'Female', 'Other')))''')
-        
-        # Appointments table with time slots
-        cursor.execute('''CREATE TABLE IF NOT EXISTS appointments (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            patient_id INTEGER NOT NULL,
-                            doctor_id INTEGER NOT NULL,
-                            appointment_date TEXT NOT NULL,
-                            start_time TEXT NOT NULL,
-                            end_time TEXT NOT NULL,
-                            notes TEXT,
-                            created_at TEXT DEFAULT (datetime('now','localtime')),
-                            FOREIGN KEY (patient_id) REFERENCES patients(id),
-                            FOREIGN KEY (doctor_id) REFERENCES doctors(id))''')
-        
+    """Prepare the database now rather than on first use"""
+    with get_db_connection():
+        pass
+
+def _create_schema(conn):
+    """Create the base tables if they do not exist yet"""
+    cursor = conn.cursor()
+    
+    # Patients table with creation timestamp
+    cursor.execute('''CREATE TABLE IF NOT EXISTS patients (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        name TEXT NOT NULL,
+                        age INTEGER CHECK(age > 0),
+                        gender TEXT CHECK(gender IN ('Male', 'Female', 'Other')),
+                        diagnosis TEXT,
+                        admission_date TEXT DEFAULT CURRENT_DATE,
+                        created_at TEXT DEFAULT (datetime('now','localtime')))''')
+    
+    # Doctors table
+    cursor.execute('''CREATE TABLE IF NOT EXISTS doctors (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        name TEXT NOT NULL,
+                        specialization TEXT NOT NULL,
+                        experience INTEGER CHECK(experience >= 0),
+                        gender TEXT CHECK(gender IN ('Male', 'Female', 'Other')))''')
+    
+    # Appointments table with time slots
+    cursor.execute('''CREATE TABLE IF NOT EXISTS appointments (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        patient_id INTEGER NOT NULL,
+                        doctor_id INTEGER NOT NULL,
+                        appointment_date TEXT NOT NULL,
+                        start_time TEXT NOT NULL,
+                        end_time TEXT NOT NULL,
+                        notes TEXT,
+                        created_at TEXT DEFAULT (datetime('now','localtime')),
+                        FOREIGN KEY (patient_id) REFERENCES patients(id),
+                        FOREIGN KEY (doctor_id) REFERENCES doctors(id))''')
+    
+    conn.commit()
+
+# Full-text search
+# External-content FTS5 tables mirror the searchable columns and are kept in
+# sync by triggers. Builds of SQLite without FTS5 keep using LIKE scans.
+_SEARCH_INDEXES = {
+    'patients_fts': ('patients', ('name', 'diagnosis')),
+    'doctors_fts': ('doctors', ('name', 'specialization')),
+    'appointments_fts': ('appointments', ('notes',)),
+}
+
+_search_index_cache = {}
+
+def fts5_available(conn):
+    """Check whether this SQLite build was compiled with FTS5"""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+        conn.execute("DROP TABLE temp.fts5_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+def _create_search_index(conn):
+    if not fts5_available(conn):
+        logger.warning("SQLite was built without FTS5; searches will use LIKE scans")
+        return
+    
+    for fts_table, (table, columns) in _SEARCH_INDEXES.items():
+        column_list = ", ".join(columns)
+        new_values = ", ".join(f"new.{c}" for c in columns)
+        old_values = ", ".join(f"old.{c}" for c in columns)
+        conn.execute(f'''CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+                            {column_list}, content='{table}', content_rowid='id',
+                            tokenize='unicode61 remove_diacritics 2')''')
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS {fts_table}_insert AFTER INSERT ON {table} BEGIN
+                            INSERT INTO {fts_table} (rowid, {column_list}) VALUES (new.id, {new_values});
+                        END''')
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS {fts_table}_delete AFTER DELETE ON {table} BEGIN
+                            INSERT INTO {fts_table} ({fts_table}, rowid, {column_list})
+                            VALUES ('delete', old.id, {old_values});
+                        END''')
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS {fts_table}_update AFTER UPDATE OF {column_list} ON {table} BEGIN
+                            INSERT INTO {fts_table} ({fts_table}, rowid, {column_list})
+                            VALUES ('delete', old.id, {old_values});
+                            INSERT INTO {fts_table} (rowid, {column_list}) VALUES (new.id, {new_values});
+                        END''')
+        conn.execute(f"INSERT INTO {fts_table} ({fts_table}) VALUES ('rebuild')")
+
+def _has_search_index(conn):
+    """Whether the FTS5 tables exist in the connected database (cached)"""
+    database = _pool.database
+    if database not in _search_index_cache:
+        row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'patients_fts'").fetchone()
+        if row is None:
+            return False  # Not cached: the migration may not have run yet
+        _search_index_cache[database] = True
+    return _search_index_cache[database]
+
+def _fts_query(search_term, column=None):
+    """Turn free text into an FTS5 prefix query, e.g. 'jo smi' -> '"jo"* "smi"*'"""
+    tokens = re.findall(r'\w+', search_term)
+    if not tokens:
+        return None
+    query = " ".join(f'"{token}"*' for token in tokens)
+    return f"{column} : ({query})" if column else query
+
+# Statistics
+# Row counts, appointments per day and appointments per doctor are kept exact
+# by triggers, so the dashboard reads them without scanning the tables.
+def _create_statistics(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS record_counts (
+                        entity TEXT PRIMARY KEY,
+                        total INTEGER NOT NULL) WITHOUT ROWID''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS appointment_counts_by_day (
+                        appointment_date TEXT PRIMARY KEY,
+                        total INTEGER NOT NULL) WITHOUT ROWID''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS appointment_counts_by_doctor (
+                        doctor_id INTEGER PRIMARY KEY,
+                        total INTEGER NOT NULL)''')
+    
+    for table in ('patients', 'doctors', 'appointments'):
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS {table}_count_insert AFTER INSERT ON {table} BEGIN
+                            UPDATE record_counts SET total = total + 1 WHERE entity = '{table}';
+                        END''')
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS {table}_count_delete AFTER DELETE ON {table} BEGIN
+                            UPDATE record_counts SET total = total - 1 WHERE entity = '{table}';
+                        END''')
+    
+    for table, column in (('appointment_counts_by_day', 'appointment_date'),
+                          ('appointment_counts_by_doctor', 'doctor_id')):
+        add = f'''INSERT INTO {table} ({column}, total) VALUES (new.{column}, 1)
+                  ON CONFLICT ({column}) DO UPDATE SET total = total + 1;'''
+        remove = f'''UPDATE {table} SET total = total - 1 WHERE {column} = old.{column};
+                     DELETE FROM {table} WHERE {column} = old.{column} AND total <= 0;'''
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS {table}_insert AFTER INSERT ON appointments BEGIN
+                            {add}
+                        END''')
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS {table}_delete AFTER DELETE ON appointments BEGIN
+                            {remove}
+                        END''')
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS {table}_update AFTER UPDATE OF {column} ON appointments
+                        WHEN old.{column} IS NOT new.{column} BEGIN
+                            {remove}
+                            {add}
+                        END''')
+    
+    # Backfill from the existing rows
+    conn.execute("DELETE FROM record_counts")
+    for table in ('patients', 'doctors', 'appointments'):
+        conn.execute(f"INSERT INTO record_counts (entity, total) SELECT '{table}', COUNT(*) FROM {table}")
+    conn.execute("DELETE FROM appointment_counts_by_day")
+    conn.execute('''INSERT INTO appointment_counts_by_day (appointment_date, total)
+                    SELECT appointment_date, COUNT(*) FROM appointments GROUP BY appointment_date''')
+    conn.execute("DELETE FROM appointment_counts_by_doctor")
+    conn.execute('''INSERT INTO appointment_counts_by_doctor (doctor_id, total)
+                    SELECT doctor_id, COUNT(*) FROM appointments GROUP BY doctor_id''')
+
+# Activity log
+# Every insert, update and delete of a patient, doctor or appointment appends a
+# row. ids only grow, so "latest N" is a walk down the primary key. Updates are
+# only logged when one of the listed business columns is written, so internal
+# maintenance (e.g. backfilling derived columns) stays out of the log.
+ACTIVITY_TYPES = ('Patient', 'Doctor', 'Appointment')
+ACTIVITY_ACTIONS = ('created', 'updated', 'deleted')
+
+_APPOINTMENT_DESCRIPTION = '''(SELECT name FROM patients WHERE id = {row}.patient_id) || ' with ' ||
+                              (SELECT name FROM doctors WHERE id = {row}.doctor_id)'''
+
+_ACTIVITY_SOURCES = {
+    'patients': ('Patient', ('name', 'age', 'gender', 'diagnosis', 'admission_date'), '{row}.name'),
+    'doctors': ('Doctor', ('name', 'specialization', 'experience', 'gender'), '{row}.name'),
+    'appointments': ('Appointment',
+                     ('patient_id', 'doctor_id', 'appointment_date', 'start_time', 'end_time', 'notes'),
+                     _APPOINTMENT_DESCRIPTION),
+}
+
+def _create_activity_log(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS activity_log (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        type TEXT NOT NULL,
+                        action TEXT NOT NULL,
+                        entity_id INTEGER NOT NULL,
+                        description TEXT,
+                        created_at TEXT DEFAULT (datetime('now','localtime')))''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_activity_log_type ON activity_log (type, id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_activity_log_created ON activity_log (created_at)')
+    
+    for table, (activity_type, columns, description) in _ACTIVITY_SOURCES.items():
+        for event, action, row in (('INSERT', 'created', 'new'),
+                                   (f"UPDATE OF {', '.join(columns)}", 'updated', 'new'),
+                                   ('DELETE', 'deleted', 'old')):
+            name = f"{table}_activity_{action}"
+            conn.execute(f'''CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON {table} BEGIN
+                                INSERT INTO activity_log (type, action, entity_id, description)
+                                VALUES ('{activity_type}', '{action}', {row}.id,
+                                        {description.format(row=row)});
+                            END''')
+    
+    # Backfill one 'created' entry per existing row, oldest first
+    conn.execute(f'''INSERT INTO activity_log (type, action, entity_id, description, created_at)
+                     SELECT type, 'created', entity_id, description, created_at FROM (
+                         SELECT 'Patient' AS type, id AS entity_id, name AS description, created_at
+                         FROM patients
+                         UNION ALL
+                         SELECT 'Doctor', id, name, NULL FROM doctors
+                         UNION ALL
+                         SELECT 'Appointment', a.id, {_APPOINTMENT_DESCRIPTION.format(row='a')}, a.created_at
+                         FROM appointments a)
+                     ORDER BY created_at, type, entity_id''')
+
+# Integer dates and times
+# appointment_day (days since 1970-01-01), start_minute and end_minute mirror
+# the text columns so overlap checks, slot loading and range filters compare
+# integers. Inserts from this module fill them directly; triggers fill them
+# for rows written any other way and whenever the text columns change.
+BACKFILL_CHUNK = 20000
+
+_DAY_SQL = "CAST(julianday({row}.appointment_date) - 2440587.5 AS INTEGER)"
+_MINUTE_SQL = "(CAST(strftime('%H', {value}) AS INTEGER) * 60 + CAST(strftime('%M', {value}) AS INTEGER))"
+
+def _appointment_minutes_sql(row):
+    return (f"appointment_day = {_DAY_SQL.format(row=row)}, "
+            f"start_minute = {_MINUTE_SQL.format(value=f'{row}.start_time')}, "
+            f"end_minute = {_MINUTE_SQL.format(value=f'{row}.end_time')}")
+
+def _add_appointment_minutes(conn):
+    columns = {row['name'] for row in conn.execute('PRAGMA table_info(appointments)')}
+    for column in ('appointment_day', 'start_minute', 'end_minute'):
+        if column not in columns:
+            conn.execute(f'ALTER TABLE appointments ADD COLUMN {column} INTEGER')
+
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS appointments_minutes_insert AFTER INSERT ON appointments
+                    WHEN new.appointment_day IS NULL BEGIN
+                        UPDATE appointments SET {_appointment_minutes_sql('new')} WHERE id = new.id;
+                    END''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS appointments_minutes_update
+                    AFTER UPDATE OF appointment_date, start_time, end_time ON appointments BEGIN
+                        UPDATE appointments SET {_appointment_minutes_sql('new')} WHERE id = new.id;
+                    END''')
+
+def _backfill_appointment_minutes(conn):
+    """Fill the integer columns of existing rows, committing every BACKFILL_CHUNK ids
+
+    Committed chunks survive an interruption; the migration then runs again
+    and only visits rows that are still empty.
+    """
+    first, last = conn.execute('SELECT MIN(id), MAX(id) FROM appointments').fetchone()
+    if first is None:
+        return
+    for low in range(first - 1, last, BACKFILL_CHUNK):
+        conn.execute(f'''UPDATE appointments SET {_appointment_minutes_sql('appointments')}
+                         WHERE id > ? AND id <= ? AND appointment_day IS NULL''', (low, low + BACKFILL_CHUNK))
         conn.commit()
+        conn.execute('BEGIN')
+        logger.info("Backfilled appointment days and minutes up to id %d of %d", min(low + BACKFILL_CHUNK, last), last)
+
+def _legacy_date(value):
+    return datetime.strptime(value.strip(), '%Y-%m-%d').date().isoformat()
+
+def _legacy_time(value):
+    return datetime.strptime(value.strip()[:5].rstrip(':'), '%H:%M').strftime('%H:%M')
+
+def _normalise_appointment_text(conn):
+    """Rewrite legacy dates and times the integer columns cannot be computed from
+
+    Earlier versions validated dates with strptime, so rows can hold e.g.
+    '2030-1-3', for which julianday() is NULL. Those values are rewritten
+    zero-padded, which makes the update trigger recompute the integer
+    columns; this is maintenance, so the activity log trigger is suspended
+    meanwhile. Rows that cannot be read at all fail the migration.
+    """
+    rows = conn.execute('''SELECT id, appointment_date, start_time, end_time FROM appointments
+                           WHERE appointment_date IS NOT date(appointment_date)
+                              OR time(start_time) IS NULL OR time(end_time) IS NULL''').fetchall()
+    unreadable = []
+    if rows:
+        trigger = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' "
+                               "AND name = 'appointments_activity_updated'").fetchone()
+        if trigger:
+            conn.execute('DROP TRIGGER appointments_activity_updated')
+        for row in rows:
+            try:
+                values = (_legacy_date(row['appointment_date']),
+                          _legacy_time(row['start_time']), _legacy_time(row['end_time']))
+            except (AttributeError, ValueError):
+                unreadable.append(row)
+                continue
+            conn.execute('''UPDATE appointments SET appointment_date = ?, start_time = ?, end_time = ?
+                            WHERE id = ?''', (*values, row['id']))
+        if trigger:
+            conn.execute(trigger['sql'])
+        logger.info("Rewrote %d appointments with unpadded dates or times", len(rows) - len(unreadable))
+    
+    for row in unreadable[:20]:
+        logger.error("Appointment %d has an unreadable date or time: %r %r-%r", row['id'],
+                     row['appointment_date'], row['start_time'], row['end_time'])
+    missing = conn.execute('''SELECT COUNT(*) FROM appointments WHERE appointment_day IS NULL
+                              OR start_minute IS NULL OR end_minute IS NULL''').fetchone()[0]
+    if unreadable or missing:
+        ids = ", ".join(str(row['id']) for row in unreadable[:20]) or "see the log"
+        raise ValueError(f"{max(len(unreadable), missing)} appointments have a date or time that cannot "
+                         f"be read (ids {ids}); correct them (YYYY-MM-DD, HH:MM) and restart")
+
+def _require_appointment_days(conn):
+    # SQLite cannot add NOT NULL to an existing column, so writes that would
+    # leave the integer columns empty are refused by triggers instead
+    check = '''date(new.appointment_date) IS NOT new.appointment_date
+               OR time(new.start_time) IS NULL OR time(new.end_time) IS NULL'''
+    for event in ('INSERT', 'UPDATE OF appointment_date, start_time, end_time'):
+        name = 'appointments_require_day_' + event.split()[0].lower()
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS {name} BEFORE {event} ON appointments
+                        WHEN {check} BEGIN
+                            SELECT RAISE(ABORT, 'Appointment dates must be YYYY-MM-DD and times HH:MM');
+                        END''')
+
+# Schema migrations
+# Each entry is (version, description, steps). A step is either a SQL string or
+# a callable taking the connection. Applied versions are tracked in
+# PRAGMA user_version, so existing hospital.db files are upgraded in place.
+MIGRATIONS = [
+    (1, "Covering indexes for appointment and name lookups", [
+        '''CREATE INDEX IF NOT EXISTS idx_appointments_doctor_date
+           ON appointments (doctor_id, appointment_date, start_time, end_time)''',
+        '''CREATE INDEX IF NOT EXISTS idx_appointments_patient_date
+           ON appointments (patient_id, appointment_date, start_time)''',
+        '''CREATE INDEX IF NOT EXISTS idx_appointments_date
+           ON appointments (appointment_date, start_time)''',
+        'CREATE INDEX IF NOT EXISTS idx_patients_name ON patients (name)',
+        'CREATE INDEX IF NOT EXISTS idx_doctors_name ON doctors (name)',
+    ]),
+    (2, "FTS5 search index for patients, doctors and appointment notes", [
+        _create_search_index,
+    ]),
+    (3, "Trigger-maintained record counts and appointment statistics", [
+        _create_statistics,
+    ]),
+    (4, "Append-only activity log written by triggers", [
+        _create_activity_log,
+    ]),
+    (5, "Recurring appointment series", [
+        '''CREATE TABLE IF NOT EXISTS appointment_series (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               patient_id INTEGER NOT NULL REFERENCES patients(id),
+               doctor_id INTEGER NOT NULL REFERENCES doctors(id),
+               rule TEXT NOT NULL,
+               start_date TEXT NOT NULL,
+               start_time TEXT NOT NULL,
+               end_time TEXT NOT NULL,
+               notes TEXT,
+               created_at TEXT DEFAULT (datetime('now','localtime')))''',
+        'ALTER TABLE appointments ADD COLUMN series_id INTEGER REFERENCES appointment_series(id)',
+        '''CREATE INDEX IF NOT EXISTS idx_appointments_series
+           ON appointments (series_id, appointment_date)''',
+    ]),
+    (6, "Integer day and minute columns for appointment overlap and range queries", [
+        _add_appointment_minutes,
+        _backfill_appointment_minutes,
+        '''CREATE INDEX IF NOT EXISTS idx_appointments_doctor_day
+           ON appointments (doctor_id, appointment_day, start_minute, end_minute)''',
+        '''CREATE INDEX IF NOT EXISTS idx_appointments_day
+           ON appointments (appointment_day, start_minute)''',
+        '''CREATE INDEX IF NOT EXISTS idx_appointments_patient_day
+           ON appointments (patient_id, appointment_day, start_minute)''',
+        # Superseded by the integer indexes above
+        'DROP INDEX IF EXISTS idx_appointments_doctor_date',
+        'DROP INDEX IF EXISTS idx_appointments_date',
+        'DROP INDEX IF EXISTS idx_appointments_patient_date',
+    ]),
+    (7, "Case-insensitive name indexes for type-ahead lookups", [
+        'CREATE INDEX IF NOT EXISTS idx_patients_name_nocase ON patients (name COLLATE NOCASE)',
+        'CREATE INDEX IF NOT EXISTS idx_doctors_name_nocase ON doctors (name COLLATE NOCASE)',
+    ]),
+    (8, "Zero-padded legacy appointment dates and non-empty integer day columns", [
+        _normalise_appointment_text,
+        _require_appointment_days,
+    ]),
+]
+
+# Representative lookups whose query plans are logged around a migration.
+# Schemas before INTEGER_DAYS_VERSION have no integer day and minute columns,
+# so their plans are probed with the equivalent text-column queries.
+INTEGER_DAYS_VERSION = 6
+
+_TEXT_PLAN_PROBES = [
+    ("get_appointments(date)",
+     '''SELECT a.*, p.name as patient_name, d.name as doctor_name
+        FROM appointments a
+        JOIN patients p ON a.patient_id = p.id
+        JOIN doctors d ON a.doctor_id = d.id
+        WHERE a.appointment_date = ?
+        ORDER BY a.appointment_date, a.start_time''',
+     ('2000-01-01',)),
+    ("is_time_slot_available",
+     '''SELECT 1 FROM appointments
+        WHERE doctor_id = ? AND appointment_date = ?
+        AND start_time < ? AND end_time > ?''',
+     (1, '2000-01-01', '09:30', '09:00')),
+    ("get_patient_appointments",
+     '''SELECT a.*, d.name as doctor_name, d.specialization
+        FROM appointments a
+        JOIN doctors d ON a.doctor_id = d.id
+        WHERE a.patient_id = ?
+        ORDER BY a.appointment_date, a.start_time''',
+     (1,)),
+]
+
+_PLAN_PROBES = [
+    ("get_appointments(date)",
+     '''SELECT a.*, p.name as patient_name, d.name as doctor_name
+        FROM appointments a
+        JOIN patients p ON a.patient_id = p.id
+        JOIN doctors d ON a.doctor_id = d.id
+        WHERE a.appointment_day = ?
+        ORDER BY a.appointment_day, a.start_minute''',
+     (10957,)),
+    ("is_time_slot_available",
+     '''SELECT 1 FROM appointments
+        WHERE doctor_id = ? AND appointment_day = ?
+        AND start_minute < ? AND end_minute > ?''',
+     (1, 10957, 570, 540)),
+    ("get_patient_appointments",
+     '''SELECT a.*, d.name as doctor_name, d.specialization
+        FROM appointments a
+        JOIN doctors d ON a.doctor_id = d.id
+        WHERE a.patient_id = ?
+        ORDER BY a.appointment_day, a.start_minute''',
+     (1,)),
+]
+
+def get_schema_version(conn):
+    """Return the schema version stored in PRAGMA user_version"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def log_query_plans(conn, label):
+    """Log EXPLAIN QUERY PLAN output for the representative lookups"""
+    probes = _PLAN_PROBES if get_schema_version(conn) >= INTEGER_DAYS_VERSION else _TEXT_PLAN_PROBES
+    for name, query, params in probes:
+        try:
+            plan = conn.execute('EXPLAIN QUERY PLAN ' + query, params).fetchall()
+        except sqlite3.Error as e:
+            logger.info("Query plan %s [%s]: unavailable (%s)", label, name, e)
+            continue
+        logger.info("Query plan %s [%s]: %s", label, name,
+                    "; ".join(row['detail'] for row in plan))
+
+def migrate_database(conn):
+    """Apply pending migrations, each in its own transaction"""
+    current = get_schema_version(conn)
+    pending = [m for m in MIGRATIONS if m[0] > current]
+    if not pending:
+        return current
+    
+    log_query_plans(conn, "before migration")
+    for version, description, steps in pending:
+        logger.info("Migrating database to version %d: %s", version, description)
+        conn.execute('BEGIN')
+        try:
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f'PRAGMA user_version = {int(version)}')
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        current = version
+    # Migrations that rewrite tables leave a large WAL behind; fold it into
+    # the database now rather than during the first writes afterwards
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    log_query_plans(conn, "after migration")
+    return current
+
+# Keyset pagination
+# Sort orders are (SQL expression, result key) pairs ending in a unique column,
+# so the last row of a page identifies exactly where the next page starts.
+_NAME_ORDER = [('name', 'name'), ('id', 'id')]
+_RANKED_ORDER = [('search_rank', 'search_rank'), ('name', 'name'), ('id', 'id')]
+_APPOINTMENT_ORDER = [('a.appointment_day', 'appointment_day'),
+                      ('a.start_minute', 'start_minute'),
+                      ('a.id', 'id')]
+
+def _fetch_page(cursor, query, conditions, params, order_by, after=None, before=None, limit=None,
+                descending=False, row_format='dict'):
+    """Run a query in a stable order, optionally resuming after/before a row"""
+    conditions = list(conditions)
+    params = list(params)
+    columns = ", ".join(expr for expr, _ in order_by)
+    marks = ", ".join("?" for _ in order_by)
+    later, earlier = ("<", ">") if descending else (">", "<")
+    anchor = after if after is not None else before
+    if anchor is not None and any(key not in anchor for _, key in order_by):
+        raise ValueError("Cursor does not match the sort order of this list")
+    if after is not None:
+        conditions.append(f"({columns}) {later} ({marks})")
+        params.extend(after[key] for _, key in order_by)
+    elif before is not None:
+        conditions.append(f"({columns}) {earlier} ({marks})")
+        params.extend(before[key] for _, key in order_by)
+    
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    
+    # Walk backwards from `before` and flip the page back into order afterwards
+    direction = " DESC" if (before is not None) != descending else ""
+    query += " ORDER BY " + ", ".join(expr + direction for expr, _ in order_by)
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+    
+    cursor.execute(query, tuple(params))
+    rows = cursor
+    if before is not None:
+        rows = cursor.fetchall()
+        rows.reverse()
+    # Rows are converted as they are read, so no full list of sqlite3.Row is held
+    return records.convert(cursor.description, rows, row_format)
+
+# Validation shared by the single-record functions and bulk_import
+GENDERS = ('Male', 'Female', 'Other')
+
+def validate_patient(name, age, gender, diagnosis=""):
+    """Validate patient fields and return them normalised for the database"""
+    if not name or not isinstance(age, int) or age <= 0:
+        raise ValueError("Invalid patient data")
+    if gender.strip() not in GENDERS:
+        raise ValueError("Gender must be one of: " + ", ".join(GENDERS))
+    return (name.strip(), age, gender.strip(), (diagnosis or "").strip())
+
+def validate_doctor(name, specialization, experience, gender):
+    """Validate doctor fields and return them normalised for the database"""
+    if not name or not specialization or not isinstance(experience, int) or experience < 0:
+        raise ValueError("Invalid doctor data")
+    if gender.strip() not in GENDERS:
+        raise ValueError("Gender must be one of: " + ", ".join(GENDERS))
+    return (name.strip(), specialization.strip(), experience, gender.strip())
+
+def validate_appointment_time(appointment_date, start_time, end_time):
+    """Validate the date and time range of an appointment"""
+    to_day(appointment_date)
+    if time.fromisoformat(start_time) >= time.fromisoformat(end_time):
+        raise ValueError("Appointment must end after it starts")
 
 # Patient Functions
+@instrumentation.timed
 def insert_patient(name, age, gender, diagnosis=""):
     """Insert a new patient record with validation"""
-    if not name or not isinstance(age, int) or age <= 0:
-        raise ValueError("Invalid patient data")
+    values = validate_patient(name, age, gender, diagnosis)
     
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute('''INSERT INTO patients (name, age, gender, diagnosis) 
-                          VALUES (?, ?, ?, ?)''',
-                      (name.strip(), age, gender.strip(), diagnosis.strip()))
+                          VALUES (?, ?, ?, ?)''', values)
         conn.commit()
         return cursor.lastrowid
 
-def get_patients(search_term=None, search_by_id=False):
-    """Get all patients or search by name/diagnosis/ID"""
+@instrumentation.timed
+def get_patients(search_term=None, search_by_id=False, after=None, before=None, limit=None, row_format='dict'):
+    """Get all patients or search by name/diagnosis/ID
+
+    Pass the last row of a page as ``after`` (or the first row as ``before``)
+    together with ``limit`` to page through the results. ``row_format``
+    selects dicts, compact records or columns (see records.py).
+    """
     with get_db_connection() as conn:
         cursor = conn.cursor()
         if search_term:
             if search_by_id:
                 try:
                     patient_id = int(search_term)
-                    cursor.execute('''SELECT * FROM patients 
-                                     WHERE id = ? 
-                                     ORDER BY name''', (patient_id,))
                 except ValueError:
-                    return []
-            else:
-                cursor.execute('''SELECT * FROM patients 
-                                 WHERE name LIKE ? OR diagnosis LIKE ? 
-                                 ORDER BY name''',
-                             (f'%{search_term}%', f'%{search_term}%'))
-        else:
-            cursor.execute('SELECT * FROM patients ORDER BY name')
-        return [dict(row) for row in cursor.fetchall()]
+                    return records.convert(None, [], row_format)
+                return _fetch_page(cursor, 'SELECT * FROM patients', ['id = ?'], [patient_id],
+                                   _NAME_ORDER, after, before, limit, row_format=row_format)
+            
+            fts_query = _fts_query(search_term)
+            if fts_query and _has_search_index(conn):
+                # Best matches first, prefix matching on every word
+                return _fetch_page(cursor,
+                                   '''SELECT * FROM (SELECT p.*, f.rank AS search_rank
+                                                    FROM patients_fts f
+                                                    JOIN patients p ON p.id = f.rowid
+                                                    WHERE patients_fts MATCH ?)''',
+                                   [], [fts_query], _RANKED_ORDER, after, before, limit,
+                                   row_format=row_format)
+            return _fetch_page(cursor, 'SELECT * FROM patients',
+                               ['(name LIKE ? OR diagnosis LIKE ?)'],
+                               [f'%{search_term}%', f'%{search_term}%'],
+                               _NAME_ORDER, after, before, limit, row_format=row_format)
+        return _fetch_page(cursor, 'SELECT * FROM patients', [], [],
+                           _NAME_ORDER, after, before, limit, row_format=row_format)
 
+@instrumentation.timed
 def update_patient(patient_id, name, age, gender, diagnosis):
     """Update patient record with validation"""
-    if not name or not isinstance(age, int) or age <= 0:
-        raise ValueError("Invalid patient data")
+    values = validate_patient(name, age, gender, diagnosis)
     
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute('''UPDATE patients 
                           SET name = ?, age = ?, gender = ?, diagnosis = ? 
                           WHERE id = ?''',
-                      (name.strip(), age, gender.strip(), diagnosis.strip(), patient_id))
+                      (*values, patient_id))
         conn.commit()
+        _invalidate_patient(patient_id)
         return cursor.rowcount > 0
 
+@instrumentation.timed
 def delete_patient(patient_id):
     """Delete a patient record"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute('DELETE FROM patients WHERE id = ?', (patient_id,))
         conn.commit()
+        _invalidate_patient(patient_id)
         return cursor.rowcount > 0
 
+@instrumentation.timed
+def search_patient_names(prefix, limit=10):
+    """Patients whose name starts with prefix (any case), for type-ahead pickers
+
+    A number also matches the patient with that id, listed first; when too
+    few names start with the text, names with a later word starting with it
+    follow. Only id and name are read.
+    """
+    return _name_prefix_matches('patients', 'id, name', prefix, limit)
+
+def _name_prefix_matches(table, columns, prefix, limit):
+    prefix = prefix.strip()
+    if not prefix or limit <= 0:
+        return []
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        rows = []
+        if prefix.isdigit():
+            cursor.execute(f'SELECT {columns} FROM {table} WHERE id = ?', (int(prefix),))
+            rows = [dict(row) for row in cursor.fetchall()]
+        # A range scan over the NOCASE name index: every name from the prefix
+        # up to the prefix followed by the highest code point
+        cursor.execute(f'''SELECT {columns} FROM {table}
+                          WHERE name >= ? COLLATE NOCASE AND name < ? COLLATE NOCASE
+                          ORDER BY name COLLATE NOCASE, id
+                          LIMIT ?''',
+                       (prefix, prefix + '\U0010ffff', limit - len(rows)))
+        rows.extend(dict(row) for row in cursor.fetchall())
+        # Too few names start with the text: fill up with names containing a
+        # word that does, e.g. "costa" -> "Dr. Maria Costa", via the FTS index
+        fts_query = _fts_query(prefix, 'name')
+        if len(rows) < limit and fts_query and _has_search_index(conn):
+            seen = [row['id'] for row in rows]
+            excluded = f"AND t.id NOT IN ({', '.join('?' for _ in seen)})" if seen else ""
+            selected = ", ".join(f"t.{column.strip()}" for column in columns.split(','))
+            cursor.execute(f'''SELECT {selected} FROM {table}_fts f
+                              JOIN {table} t ON t.id = f.rowid
+                              WHERE {table}_fts MATCH ? {excluded}
+                              LIMIT ?''',
+                           (fts_query, *seen, limit - len(rows)))
+            # Unranked: ranking would score every match, not just these few
+            rows.extend(sorted((dict(row) for row in cursor.fetchall()),
+                               key=lambda row: (row['name'].casefold(), row['id'])))
+        return rows
+
 # Doctor Functions
+@instrumentation.timed
 def insert_doctor(name, specialization, experience, gender):
     """Insert a new doctor record with validation"""
-    if not name or not specialization or not isinstance(experience, int):
-        raise ValueError("Invalid doctor data")
+    values = validate_doctor(name, specialization, experience, gender)
     
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute('''INSERT INTO doctors (name, specialization, experience, gender) 
-                          VALUES (?, ?, ?, ?)''',
-                      (name.strip(), specialization.strip(), experience, gender.strip()))
+                          VALUES (?, ?, ?, ?)''', values)
         conn.commit()
         return cursor.lastrowid
 
-def get_doctors(search_term=None, search_by_id=False):
-    """Get all doctors or search by name/specialization/ID"""
+@instrumentation.timed
+def get_doctors(search_term=None, search_by_id=False, after=None, before=None, limit=None, row_format='dict'):
+    """Get all doctors or search by name/specialization/ID
+
+    Supports the same keyset pagination and row_format arguments as get_patients.
+    """
     with get_db_connection() as conn:
         cursor = conn.cursor()
         if search_term:
             if search_by_id:
                 try:
                     doctor_id = int(search_term)
-                    cursor.execute('''SELECT * FROM doctors 
-                                     WHERE id = ? 
-                                     ORDER BY name''', (doctor_id,))
                 except ValueError:
-                    return []
-            else:
-                cursor.execute('''SELECT * FROM doctors 
-                                 WHERE name LIKE ? OR specialization LIKE ? 
-                                 ORDER BY name''',
-                             (f'%{search_term}%', f'%{search_term}%'))
-        else:
-            cursor.execute('SELECT * FROM doctors ORDER BY name')
-        return [dict(row) for row in cursor.fetchall()]
+                    return records.convert(None, [], row_format)
+                return _fetch_page(cursor, 'SELECT * FROM doctors', ['id = ?'], [doctor_id],
+                                   _NAME_ORDER, after, before, limit, row_format=row_format)
+            
+            fts_query = _fts_query(search_term)
+            if fts_query and _has_search_index(conn):
+                # Best matches first, prefix matching on every word
+                return _fetch_page(cursor,
+                                   '''SELECT * FROM (SELECT d.*, f.rank AS search_rank
+                                                    FROM doctors_fts f
+                                                    JOIN doctors d ON d.id = f.rowid
+                                                    WHERE doctors_fts MATCH ?)''',
+                                   [], [fts_query], _RANKED_ORDER, after, before, limit,
+                                   row_format=row_format)
+            return _fetch_page(cursor, 'SELECT * FROM doctors',
+                               ['(name LIKE ? OR specialization LIKE ?)'],
+                               [f'%{search_term}%', f'%{search_term}%'],
+                               _NAME_ORDER, after, before, limit, row_format=row_format)
+        return _fetch_page(cursor, 'SELECT * FROM doctors', [], [],
+                           _NAME_ORDER, after, before, limit, row_format=row_format)
 
+@instrumentation.timed
 def update_doctor(doctor_id, name, specialization, experience, gender):
     """Update doctor record with validation"""
-    if not name or not specialization or not isinstance(experience, int):
-        raise ValueError("Invalid doctor data")
+    values = validate_doctor(name, specialization, experience, gender)
     
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute('''UPDATE doctors 
                           SET name = ?, specialization = ?, experience = ?, gender = ? 
                           WHERE id = ?''',
-                      (name.strip(), specialization.strip(), experience, gender.strip(), doctor_id))
+                      (*values, doctor_id))
         conn.commit()
+        _invalidate_doctor(doctor_id)
         return cursor.rowcount > 0
 
+@instrumentation.timed
 def delete_doctor(doctor_id):
     """Delete a doctor record"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute('DELETE FROM doctors WHERE id = ?', (doctor_id,))
         conn.commit()
+        _invalidate_doctor(doctor_id)
         return cursor.rowcount > 0
 
+@instrumentation.timed
+def search_doctor_names(prefix, limit=10):
+    """Doctors whose name starts with prefix (any case), like search_patient_names"""
+    return _name_prefix_matches('doctors', 'id, name, specialization', prefix, limit)
+
 # Appointment Functions
+@instrumentation.timed
 def schedule_appointment(patient_id, doctor_id, appointment_date, start_time, end_time, notes=""):
-    """Schedule a new appointment with time validation"""
-    try:
-        # Validate date and time format
-        datetime.strptime(appointment_date, '%Y-%m-%d')
-        time.fromisoformat(start_time)
-        time.fromisoformat(end_time)
-        
-        # Check if time slot is available
-        if not is_time_slot_available(doctor_id, appointment_date, start_time, end_time):
+    """Schedule a new appointment with time validation
+
+    The availability check and the insert run in one write transaction, so
+    concurrent bookings (from other threads or processes) cannot double-book.
+    """
+    # Validate date and time format
+    validate_appointment_time(appointment_date, start_time, end_time)
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        # Cheap early answer for taken slots, without queueing for the write lock
+        if not _slot_free(cursor, doctor_id, appointment_date, start_time, end_time):
             raise ValueError("This time slot is already booked or invalid")
-            
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
+        
+        begin_immediate(conn)
+        try:
+            if not _slot_free(cursor, doctor_id, appointment_date, start_time, end_time):
+                raise ValueError("This time slot is already booked or invalid")
             cursor.execute('''INSERT INTO appointments 
-                            (patient_id, doctor_id, appointment_date, start_time, end_time, notes) 
-                            VALUES (?, ?, ?, ?, ?, ?)''',
-                        (patient_id, doctor_id, appointment_date, start_time, end_time, notes))
+                            (patient_id, doctor_id, appointment_date, start_time, end_time, notes,
+                             appointment_day, start_minute, end_minute) 
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                        (patient_id, doctor_id, appointment_date, start_time, end_time, notes,
+                         to_day(appointment_date), to_minutes(start_time), to_minutes(end_time)))
             conn.commit()
             return cursor.lastrowid
-    except ValueError as e:
-        raise ValueError(str(e))
+        except BaseException:
+            conn.rollback()
+            raise
 
+@instrumentation.timed
 def is_time_slot_available(doctor_id, date, start_time, end_time):
     """Check if a time slot is available for a doctor"""
     with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('''SELECT * FROM appointments 
-                          WHERE doctor_id = ? AND appointment_date = ? 
-                          AND (
-                              (start_time < ? AND end_time > ?) OR
-                              (start_time >= ? AND start_time < ?) OR
-                              (end_time > ? AND end_time <= ?)
-                          )''',
-                     (doctor_id, date, end_time, start_time, 
-                      start_time, end_time, start_time, end_time))
-        return cursor.fetchone() is None
+        return _slot_free(conn.cursor(), doctor_id, date, start_time, end_time)
 
+def _slot_free(cursor, doctor_id, date, start_time, end_time):
+    # Two ranges overlap exactly when each one starts before the other ends
+    cursor.execute('''SELECT 1 FROM appointments 
+                      WHERE doctor_id = ? AND appointment_day = ? 
+                      AND start_minute < ? AND end_minute > ?
+                      LIMIT 1''',
+                 (doctor_id, to_day(date), to_minutes(end_time), to_minutes(start_time)))
+    return cursor.fetchone() is None
+
+@instrumentation.timed
 def get_available_time_slots(doctor_id, date, duration_minutes=30):
     """Get available time slots for a doctor on a specific date"""
+    slots = get_available_time_slots_batch([doctor_id], [date], duration_minutes)
+    return slots[(doctor_id, date)]
+
+@instrumentation.timed
+def get_day_schedules(doctor_ids, dates):
+    """Load booked intervals as {(doctor_id, date): DaySchedule} in one pass
+
+    Every requested doctor/date pair gets an entry, empty days included.
+    """
+    for date in set(dates):
+        to_day(date)  # Validate date format
+    
+    with get_db_connection() as conn:
+        return load_day_schedules(conn.cursor(), doctor_ids, dates)
+
+def load_day_schedules(cursor, doctor_ids, dates):
+    """get_day_schedules on an existing cursor, so uncommitted rows are seen"""
+    doctor_ids = list(dict.fromkeys(doctor_ids))
+    dates = sorted(set(dates))
+    days = [to_day(date) for date in dates]
+    booked = {}
+    # Keep each statement under SQLite's default limit of 999 parameters
+    for doctor_chunk in _chunks(doctor_ids, 400):
+        for day_chunk in _chunks(days, 400):
+            cursor.execute(f'''SELECT doctor_id, appointment_day, start_minute, end_minute
+                              FROM appointments
+                              WHERE doctor_id IN ({", ".join("?" for _ in doctor_chunk)})
+                              AND appointment_day IN ({", ".join("?" for _ in day_chunk)})''',
+                           (*doctor_chunk, *day_chunk))
+            for doctor_id, day, start, end in cursor:
+                booked.setdefault((doctor_id, format_day(day)), []).append((start, end))
+    
+    return {(doctor_id, date): DaySchedule(booked.get((doctor_id, date), ()))
+            for doctor_id in doctor_ids for date in dates}
+
+@instrumentation.timed
+def get_available_time_slots_batch(doctor_ids, dates, duration_minutes=30):
+    """Get available time slots for many doctors and dates with a single query
+
+    Returns {(doctor_id, date): [(start, end), ...]}.
+    """
+    if duration_minutes <= 0:
+        raise ValueError("Duration must be positive")
+    
+    schedules = get_day_schedules(doctor_ids, dates)
+    return {key: [(format_minutes(start), format_minutes(end))
+                  for start, end in schedule.free_slots(duration_minutes)]
+            for key, schedule in schedules.items()}
+
+@instrumentation.timed
+def find_earliest_slots(duration_minutes=30, date_from=None, date_to=None, specialization=None,
+                        doctor_ids=None, limit=10):
+    """Find the first free slots across doctors and dates, earliest first
+
+    Candidates are the doctors with the given specialization and/or ids (all
+    doctors if neither is given). Bookings are loaded for all candidates at
+    once, a window of days at a time, and each doctor's free slots are merged
+    through a priority queue until `limit` slots are found. Usually the first
+    window is enough. The search never starts before the current time: earlier
+    days of the range and slots of today that have already started are
+    skipped. Returns dicts with doctor_id, doctor_name, specialization, date,
+    start_time and end_time.
+    """
+    if duration_minutes <= 0:
+        raise ValueError("Duration must be positive")
+    if limit <= 0:
+        raise ValueError("Limit must be positive")
+    now = datetime.now()
+    today, current_minute = now.strftime('%Y-%m-%d'), now.hour * 60 + now.minute
     try:
-        datetime.strptime(date, '%Y-%m-%d')  # Validate date format
+        first = datetime.strptime(date_from or today, '%Y-%m-%d')
+        last = datetime.strptime(date_to, '%Y-%m-%d') if date_to else first
     except ValueError:
         raise ValueError("Invalid date format. Use YYYY-MM-DD")
-    
+    if last < first:
+        raise ValueError("The end date must not be before the start date")
+    first = max(first, datetime.strptime(today, '%Y-%m-%d'))
+    if last < first:
+        return []  # The whole range is in the past
+    dates = [(first + timedelta(days=i)).strftime('%Y-%m-%d') for i in range((last - first).days + 1)]
+
+    conditions = []
+    params = []
+    if specialization:
+        conditions.append("specialization = ?")
+        params.append(specialization)
+    if doctor_ids is not None:
+        doctor_ids = list(doctor_ids)
+        if not doctor_ids:
+            return []
+        conditions.append(f"id IN ({', '.join('?' for _ in doctor_ids)})")
+        params.extend(doctor_ids)
+    query = "SELECT id, name, specialization FROM doctors"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        
-        # Get doctor's working hours (default 9AM-5PM)
-        work_start = time(9, 0)
-        work_end = time(17, 0)
-        
-        # Get booked appointments
-        cursor.execute('''SELECT start_time, end_time FROM appointments 
-                          WHERE doctor_id = ? AND appointment_date = ?
-                          ORDER BY start_time''',
-                     (doctor_id, date))
-        appointments = [(time.fromisoformat(row['start_time']), 
-                        time.fromisoformat(row['end_time'])) 
-                       for row in cursor.fetchall()]
-        
-        # Generate available slots
-        available_slots = []
-        current_time = work_start
-        
-        while current_time < work_end:
-            slot_end = (datetime.combine(datetime.today(), current_time) + 
-                       timedelta(minutes=duration_minutes)).time()
-            
-            if slot_end > work_end:
-                break
-                
-            # Check if this slot is available
-            slot_available = True
-            for appt_start, appt_end in appointments:
-                if not (current_time >= appt_end or slot_end <= appt_start):
-                    slot_available = False
+        cursor.execute(query, params)
+        doctors = {row['id']: dict(row) for row in cursor.fetchall()}
+        if not doctors:
+            return []
+
+        results = []
+        window = 1
+        while dates and len(results) < limit:
+            # Windows cover disjoint, increasing days, so slots found in an
+            # earlier window always come before those of a later one
+            window_dates, dates = dates[:window], dates[window:]
+            window *= 2
+            schedules = load_day_schedules(cursor, list(doctors), window_dates)
+
+            def doctor_slots(doctor_id):
+                # Already in (date, start) order, which is what the merge relies on
+                for date in window_dates:
+                    for start, end in schedules[(doctor_id, date)].free_slots(duration_minutes):
+                        if date == today and start < current_minute:
+                            continue
+                        yield date, start, doctor_id, end
+
+            for date, start, doctor_id, end in heapq.merge(*(doctor_slots(d) for d in doctors)):
+                doctor = doctors[doctor_id]
+                results.append({
+                    'doctor_id': doctor_id,
+                    'doctor_name': doctor['name'],
+                    'specialization': doctor['specialization'],
+                    'date': date,
+                    'start_time': format_minutes(start),
+                    'end_time': format_minutes(end),
+                })
+                if len(results) >= limit:
                     break
-                    
-            if slot_available:
-                available_slots.append((
-                    current_time.strftime('%H:%M'),
-                    slot_end.strftime('%H:%M')
-                ))
-            
-            current_time = slot_end
-            
-        return available_slots
+        return results
 
-def get_appointments(patient_id=None, doctor_id=None, date=None, search_term=None, search_by_id=False):
-    """Get appointments with optional filters"""
+@instrumentation.timed
+def get_specializations():
+    """Get the distinct doctor specializations"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        query = '''SELECT a.*, p.name as patient_name, d.name as doctor_name 
-                   FROM appointments a
-                   JOIN patients p ON a.patient_id = p.id
-                   JOIN doctors d ON a.doctor_id = d.id'''
-        
-        conditions = []
-        params = []
+        cursor.execute("SELECT DISTINCT specialization FROM doctors ORDER BY specialization")
+        return [row[0] for row in cursor.fetchall()]
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+@instrumentation.timed
+def get_appointments(patient_id=None, doctor_id=None, date=None, search_term=None, search_by_id=False,
+                     after=None, before=None, limit=None, date_from=None, date_to=None, row_format='dict'):
+    """Get appointments with optional filters
+
+    Supports the same keyset pagination and row_format arguments as get_patients.
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        filters = appointment_filters(conn, patient_id, doctor_id, date, search_term, search_by_id,
+                                      date_from, date_to)
+        if filters is None:
+            return records.convert(None, [], row_format)
         
-        if patient_id:
-            conditions.append("a.patient_id = ?")
-            params.append(patient_id)
-        if doctor_id:
-            conditions.append("a.doctor_id = ?")
-            params.append(doctor_id)
-        if date:
-            conditions.append("a.appointment_date = ?")
-            params.append(date)
-        if search_term:
-            if search_by_id:
-                try:
-                    appointment_id = int(search_term)
-                    conditions.append("a.id = ?")
-                    params.append(appointment_id)
-                except ValueError:
-                    return []
+        conditions, params = filters
+        return _fetch_page(cursor, APPOINTMENT_QUERY, conditions, params,
+                           _APPOINTMENT_ORDER, after, before, limit, row_format=row_format)
+
+APPOINTMENT_QUERY = '''SELECT a.*, p.name as patient_name, d.name as doctor_name 
+                       FROM appointments a
+                       JOIN patients p ON a.patient_id = p.id
+                       JOIN doctors d ON a.doctor_id = d.id'''
+
+def appointment_filters(conn, patient_id=None, doctor_id=None, date=None, search_term=None,
+                        search_by_id=False, date_from=None, date_to=None):
+    """Build the WHERE conditions used by get_appointments over APPOINTMENT_QUERY
+
+    Returns (conditions, params), or None when the filters cannot match anything.
+    """
+    conditions = []
+    params = []
+    
+    if patient_id:
+        conditions.append("a.patient_id = ?")
+        params.append(patient_id)
+    if doctor_id:
+        conditions.append("a.doctor_id = ?")
+        params.append(doctor_id)
+    if date:
+        conditions.append("a.appointment_day = ?")
+        params.append(to_day(date))
+    if date_from:
+        conditions.append("a.appointment_day >= ?")
+        params.append(to_day(date_from))
+    if date_to:
+        conditions.append("a.appointment_day <= ?")
+        params.append(to_day(date_to))
+    if search_term:
+        if search_by_id:
+            try:
+                appointment_id = int(search_term)
+                conditions.append("a.id = ?")
+                params.append(appointment_id)
+            except ValueError:
+                return None
+        else:
+            fts_query = _fts_query(search_term)
+            if fts_query and _has_search_index(conn):
+                conditions.append('''(a.patient_id IN (SELECT rowid FROM patients_fts WHERE patients_fts MATCH ?)
+                                     OR a.doctor_id IN (SELECT rowid FROM doctors_fts WHERE doctors_fts MATCH ?)
+                                     OR a.id IN (SELECT rowid FROM appointments_fts WHERE appointments_fts MATCH ?))''')
+                params.extend([_fts_query(search_term, 'name'), _fts_query(search_term, 'name'), fts_query])
             else:
                 conditions.append("(p.name LIKE ? OR d.name LIKE ? OR a.notes LIKE ?)")
                 params.extend([f'%{search_term}%', f'%{search_term}%', f'%{search_term}%'])
-        
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
-        
-        query += " ORDER BY a.appointment_date, a.start_time"
-        cursor.execute(query, tuple(params))
-        return [dict(row) for row in cursor.fetchall()]
+    
+    return conditions, params
 
+@instrumentation.timed
 def delete_appointment(appointment_id):
     """Delete an appointment"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute('DELETE FROM appointments WHERE id = ?', (appointment_id,))
         conn.commit()
+        _appointment_cache.invalidate(int(appointment_id))
         return cursor.rowcount > 0
 
+# Appointment series
+# All occurrences of a series are checked against the doctor's bookings with a
+# single load_day_schedules query; the free ones are booked together in one
+# write transaction and the taken ones come back with nearby free times.
+SERIES_ALTERNATIVES = 3
+
+def _series_dates(start_date, rule):
+    recurrence = rule if isinstance(rule, Recurrence) else Recurrence.parse(rule)
+    return recurrence, [day.isoformat() for day in recurrence.dates(start_date)]
+
+def _plan_series(cursor, doctor_id, dates, start_time, end_time):
+    """Split occurrence dates into (free dates, conflicts with alternatives)"""
+    start, end = to_minutes(start_time), to_minutes(end_time)
+    schedules = load_day_schedules(cursor, [doctor_id], dates)
+    free = []
+    conflicts = []
+    for date in dates:
+        schedule = schedules[(doctor_id, date)]
+        if not schedule.conflicts(start, end):
+            free.append(date)
+            continue
+        # Free slots of the same length on that day, nearest to the requested time first
+        slots = sorted(schedule.free_slots(end - start), key=lambda slot: (abs(slot[0] - start), slot[0]))
+        conflicts.append({
+            'date': date,
+            'alternatives': [{'start_time': format_minutes(slot_start), 'end_time': format_minutes(slot_end)}
+                             for slot_start, slot_end in slots[:SERIES_ALTERNATIVES]],
+        })
+    return free, conflicts
+
+@instrumentation.timed
+def preview_appointment_series(doctor_id, start_date, start_time, end_time, rule):
+    """Which occurrences of a series are free, without booking anything
+
+    Returns {'dates': [...], 'conflicts': [{'date', 'alternatives'}]}.
+    """
+    validate_appointment_time(start_date, start_time, end_time)
+    _, dates = _series_dates(start_date, rule)
+    with get_db_connection() as conn:
+        free, conflicts = _plan_series(conn.cursor(), doctor_id, dates, start_time, end_time)
+        return {'dates': free, 'conflicts': conflicts}
+
+@instrumentation.timed
+def schedule_appointment_series(patient_id, doctor_id, start_date, start_time, end_time, rule, notes=""):
+    """Book every free occurrence of a recurring appointment in one transaction
+
+    `rule` is a recurrence rule such as 'FREQ=WEEKLY;COUNT=52' (see
+    recurrence.py). Occurrences whose time is taken are skipped and reported
+    with up to SERIES_ALTERNATIVES free times on the same day. Returns
+    {'series_id', 'booked': [appointment dicts], 'conflicts': [...]};
+    series_id is None when no occurrence was free.
+    """
+    validate_appointment_time(start_date, start_time, end_time)
+    recurrence, dates = _series_dates(start_date, rule)
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        begin_immediate(conn)
+        try:
+            free, conflicts = _plan_series(cursor, doctor_id, dates, start_time, end_time)
+            series_id = None
+            booked = []
+            if free:
+                cursor.execute('''INSERT INTO appointment_series
+                                (patient_id, doctor_id, rule, start_date, start_time, end_time, notes)
+                                VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                            (patient_id, doctor_id, recurrence.to_rule(), start_date, start_time, end_time, notes))
+                series_id = cursor.lastrowid
+                start, end = to_minutes(start_time), to_minutes(end_time)
+                cursor.executemany('''INSERT INTO appointments
+                                    (patient_id, doctor_id, appointment_date, start_time, end_time, notes, series_id,
+                                     appointment_day, start_minute, end_minute)
+                                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                                [(patient_id, doctor_id, date, start_time, end_time, notes, series_id,
+                                  to_day(date), start, end)
+                                 for date in free])
+                cursor.execute('''SELECT id, appointment_date, start_time, end_time FROM appointments
+                                WHERE series_id = ? ORDER BY appointment_day''', (series_id,))
+                booked = [dict(row) for row in cursor.fetchall()]
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return {'series_id': series_id, 'booked': booked, 'conflicts': conflicts}
+
+@instrumentation.timed
+def get_appointment_series(series_id):
+    """Get a series with its remaining appointments"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM appointment_series WHERE id = ?', (series_id,))
+        series = cursor.fetchone()
+        if series is None:
+            return None
+        cursor.execute('''SELECT id, appointment_date, start_time, end_time FROM appointments
+                       WHERE series_id = ? ORDER BY appointment_day''', (series_id,))
+        return dict(series, appointments=[dict(row) for row in cursor.fetchall()])
+
+@instrumentation.timed
+def cancel_appointment_series(series_id, from_date=None):
+    """Delete the appointments of a series, optionally only those on or after from_date
+
+    Returns the number of appointments deleted.
+    """
+    conditions = ["series_id = ?"]
+    params = [series_id]
+    if from_date:
+        conditions.append("appointment_day >= ?")
+        params.append(to_day(from_date))
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM appointments WHERE " + " AND ".join(conditions), params)
+        conn.commit()
+        series_id = int(series_id)
+        _appointment_cache.invalidate_where(lambda row: row.get('series_id') == series_id)
+        return cursor.rowcount
+
+@instrumentation.timed
 def get_recent_activity(limit=5):
     """Get recent system activity"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        
-        # Get recent patients
-        cursor.execute('''SELECT 'Patient' as type, name, created_at 
-                          FROM patients 
-                          ORDER BY created_at DESC 
+        cursor.execute('''SELECT * FROM activity_log
+                          ORDER BY id DESC
                           LIMIT ?''', (limit,))
-        patients = cursor.fetchall()
-        
-        # Get recent appointments
-        cursor.execute('''SELECT 'Appointment' as type, 
-                          p.name || ' with ' || d.name as description, 
-                          a.created_at 
-                          FROM appointments a
-                          JOIN patients p ON a.patient_id = p.id
-                          JOIN doctors d ON a.doctor_id = d.id
-                          ORDER BY a.created_at DESC 
-                          LIMIT ?''', (limit,))
-        appointments = cursor.fetchall()
-        
-        # Combine and sort
-        activity = patients + appointments
-        activity.sort(key=lambda x: x['created_at'], reverse=True)
-        return [dict(row) for row in activity[:limit]]
+        return [dict(row) for row in cursor.fetchall()]
+
+@instrumentation.timed
+def get_activity_log(activity_type=None, action=None, date_from=None, date_to=None,
+                     after=None, before=None, limit=None, row_format='dict'):
+    """Get the activity history, newest first, with optional filters
+    
+    Supports the same keyset pagination and row_format arguments as get_patients.
+    """
+    conditions = []
+    params = []
+    if activity_type:
+        conditions.append("type = ?")
+        params.append(activity_type)
+    if action:
+        conditions.append("action = ?")
+        params.append(action)
+    if date_from:
+        conditions.append("created_at >= ?")
+        params.append(date_from)
+    if date_to:
+        # Dates without a time include the whole day
+        conditions.append("created_at < date(?, '+1 day')")
+        params.append(date_to)
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        return _fetch_page(cursor, 'SELECT * FROM activity_log', conditions, params,
+                           [('id', 'id')], after, before, limit, descending=True, row_format=row_format)
+
+def warm_up(connections=2):
+    """Open pooled connections and touch the pages the first screens read"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('PRAGMA schema_version')  # Forces the schema to be parsed
+        for table in ('patients', 'doctors'):
+            cursor.execute(f"SELECT * FROM {table} ORDER BY name, id LIMIT 100").fetchall()
+        cursor.execute('''SELECT id FROM appointments
+                          ORDER BY appointment_day, start_minute, id LIMIT 100''').fetchall()
+    
+    # Fill the pool so the first background queries don't pay for connecting
+    held = [_pool.acquire() for _ in range(min(connections, _pool.max_idle))]
+    for conn in held:
+        _pool.release(conn)
+
+@instrumentation.timed
+def get_record_counts():
+    """Get the number of patients, doctors and appointments"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT entity, total FROM record_counts")
+        counts = {'patients': 0, 'doctors': 0, 'appointments': 0}
+        counts.update((row['entity'], row['total']) for row in cursor.fetchall())
+        return counts
+
+@instrumentation.timed
+def get_data_version():
+    """A number that grows with every change to patients, doctors or appointments
+
+    Every insert, update and delete writes an activity_log row, so its
+    newest id identifies the current state of the data (e.g. for ETags).
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM activity_log")
+        return cursor.fetchone()[0]
+
+@instrumentation.timed
+def get_appointment_counts_by_day(date_from=None, date_to=None):
+    """Get {date: number of appointments} for the days that have any"""
+    conditions = []
+    params = []
+    if date_from:
+        conditions.append("appointment_date >= ?")
+        params.append(date_from)
+    if date_to:
+        conditions.append("appointment_date <= ?")
+        params.append(date_to)
+    
+    query = "SELECT appointment_date, total FROM appointment_counts_by_day"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query + " ORDER BY appointment_date", params)
+        return {row['appointment_date']: row['total'] for row in cursor.fetchall()}
 
+@instrumentation.timed
+def get_appointment_counts_by_doctor():
+    """Get appointment totals per doctor, busiest first"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''SELECT c.doctor_id, d.name as doctor_name, c.total
+                          FROM appointment_counts_by_doctor c
+                          JOIN doctors d ON d.id = c.doctor_id
+                          ORDER BY c.total DESC, d.name''')
+        return [dict(row) for row in cursor.fetchall()]
+
+@instrumentation.timed
 def get_patient_by_id(patient_id):
     """Get a single patient by ID"""
+    return _patient_cache.get(int(patient_id), _load_patient)
+
+def _load_patient(patient_id):
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM patients WHERE id = ?", (patient_id,))
         result = cursor.fetchone()
         return dict(result) if result else None
 
+@instrumentation.timed
 def get_doctor_by_id(doctor_id):
     """Get a single doctor by ID"""
+    return _doctor_cache.get(int(doctor_id), _load_doctor)
+
+def _load_doctor(doctor_id):
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM doctors WHERE id = ?", (doctor_id,))
         result = cursor.fetchone()
         return dict(result) if result else None
 
+@instrumentation.timed
 def get_appointment_by_id(appointment_id):
     """Get a single appointment by ID"""
+    return _appointment_cache.get(int(appointment_id), _load_appointment)
+
+def _load_appointment(appointment_id):
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute('''SELECT a.*, p.name as patient_name, d.name as doctor_name 
@@ -363,7 +1582,8 @@ def get_appointment_by_id(appointment_id):
         result = cursor.fetchone()
         return dict(result) if result else None
 
-def get_patient_appointments(patient_id):
+@instrumentation.timed
+def get_patient_appointments(patient_id, row_format='dict'):
     """Get all appointments for a specific patient"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
@@ -371,8 +1591,5 @@ def get_patient_appointments(patient_id):
                        FROM appointments a
                        JOIN doctors d ON a.doctor_id = d.id
                        WHERE a.patient_id = ?
-                       ORDER BY a.appointment_date, a.start_time''', (patient_id,))
-        return [dict(row) for row in cursor.fetchall()]
-    
-# Initialize the database
-initialize_database()
\ No newline at end of file
+                       ORDER BY a.appointment_day, a.start_minute''', (patient_id,))
+        return records.convert(cursor.description, cursor, row_format)
@@ -0,0 +1,192 @@
+"""Constant-memory export of patients, doctors and appointments.
+
+Rows are read from the cursor in chunks and written straight to CSV, NDJSON or
+a fresh SQLite file, so exporting millions of rows never holds more than one
+chunk in memory. Appointment exports include the patient and doctor names and
+accept the same filters as get_appointments.
+
+Usage:
+    python export.py appointments march.csv --from 2025-03-01 --to 2025-03-31
+    python export.py patients patients.ndjson
+    python export.py all backup.db
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+
+import database
+
+ENTITIES = ('patients', 'doctors', 'appointments')
+FORMATS = ('csv', 'ndjson', 'sqlite')
+
+def detect_format(path):
+    """Guess the output format from the file extension"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.ndjson', '.jsonl', '.json'):
+        return 'ndjson'
+    if extension in ('.db', '.sqlite', '.sqlite3'):
+        return 'sqlite'
+    return 'csv'
+
+def iter_chunks(entity, chunk_size=5000, **filters):
+    """Yield (columns, rows) chunks of an entity in id order
+
+    The whole export reads from one transaction, so it sees a consistent
+    snapshot even while the application keeps writing.
+    """
+    if entity not in ENTITIES:
+        raise ValueError(f"Unknown entity: {entity}")
+
+    with database.get_db_connection() as conn:
+        conn.execute('BEGIN')
+        try:
+            if entity == 'appointments':
+                built = database.appointment_filters(conn, **filters)
+                if built is None:
+                    return
+                conditions, params = built
+                query = database.APPOINTMENT_QUERY
+                if conditions:
+                    query += " WHERE " + " AND ".join(conditions)
+                query += " ORDER BY a.id"
+            else:
+                if filters:
+                    raise ValueError(f"{entity} exports do not take filters")
+                query, params = f"SELECT * FROM {entity} ORDER BY id", []
+
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            columns = [column[0] for column in cursor.description]
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield columns, rows
+        finally:
+            conn.rollback()
+
+class _CsvWriter:
+    def __init__(self, path):
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        self._header_written = False
+
+    def write(self, entity, columns, rows):
+        if not self._header_written:
+            self._writer.writerow(columns)
+            self._header_written = True
+        self._writer.writerows(tuple(row) for row in rows)
+
+    def close(self):
+        self._file.close()
+
+class _NdjsonWriter:
+    def __init__(self, path):
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def write(self, entity, columns, rows):
+        self._file.writelines(json.dumps(dict(zip(columns, row))) + "\n" for row in rows)
+
+    def close(self):
+        self._file.close()
+
+class _SqliteWriter:
+    def __init__(self, path):
+        if os.path.exists(path):
+            raise FileExistsError(f"{path} already exists; SQLite exports go to a fresh file")
+        self._conn = sqlite3.connect(path)
+        self._conn.execute('PRAGMA journal_mode = OFF')
+        self._conn.execute('PRAGMA synchronous = OFF')
+        self._created = set()
+
+    def write(self, entity, columns, rows):
+        if entity not in self._created:
+            definitions = ", ".join('id INTEGER PRIMARY KEY' if c == 'id' else f'"{c}"' for c in columns)
+            self._conn.execute(f'CREATE TABLE "{entity}" ({definitions})')
+            self._created.add(entity)
+        marks = ", ".join("?" for _ in columns)
+        self._conn.executemany(f'INSERT INTO "{entity}" VALUES ({marks})', rows)
+
+    def close(self):
+        self._conn.commit()
+        self._conn.close()
+
+_WRITERS = {'csv': _CsvWriter, 'ndjson': _NdjsonWriter, 'sqlite': _SqliteWriter}
+
+def _export(entities, path, fmt, chunk_size, progress, filters):
+    writer = _WRITERS[fmt](path)
+    total = 0
+    started = time.perf_counter()
+    try:
+        for entity in entities:
+            entity_filters = filters if entity == 'appointments' else {}
+            for columns, rows in iter_chunks(entity, chunk_size, **entity_filters):
+                writer.write(entity, columns, rows)
+                total += len(rows)
+                if progress:
+                    progress(entity, total, total / max(time.perf_counter() - started, 1e-9))
+    finally:
+        writer.close()
+    seconds = time.perf_counter() - started
+    return {'rows': total, 'seconds': seconds, 'rows_per_sec': total / max(seconds, 1e-9)}
+
+def export_table(entity, path, fmt=None, chunk_size=5000, progress=None, **filters):
+    """Stream one entity to a file; returns rows, seconds and rows_per_sec
+
+    Appointment exports accept get_appointments filters such as doctor_id,
+    patient_id, date, date_from, date_to and search_term.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+    return _export([entity], path, fmt, chunk_size, progress, filters)
+
+def export_database(path, chunk_size=5000, progress=None, **filters):
+    """Stream all three entities into one fresh SQLite file"""
+    return _export(ENTITIES, path, 'sqlite', chunk_size, progress, filters)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export hospital records")
+    parser.add_argument('entity', choices=ENTITIES + ('all',),
+                        help="'all' writes every table into one SQLite file")
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=FORMATS, help="Output format (default: from extension)")
+    parser.add_argument('--from', dest='date_from', help="First appointment date (YYYY-MM-DD)")
+    parser.add_argument('--to', dest='date_to', help="Last appointment date (YYYY-MM-DD)")
+    parser.add_argument('--doctor', dest='doctor_id', type=int, help="Only this doctor's appointments")
+    parser.add_argument('--patient', dest='patient_id', type=int, help="Only this patient's appointments")
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--database', help="Database file (default: hospital.db)")
+    args = parser.parse_args(argv)
+
+    if args.database:
+        database.configure_pool(database=args.database)
+    database.initialize_database()
+
+    filters = {key: value for key, value in (('date_from', args.date_from), ('date_to', args.date_to),
+                                             ('doctor_id', args.doctor_id), ('patient_id', args.patient_id))
+               if value is not None}
+    if filters and args.entity in ('patients', 'doctors'):
+        parser.error("date, doctor and patient filters only apply to appointments")
+
+    def report(entity, rows, rate):
+        print(f"\r{entity}: {rows} rows ({rate:,.0f} rows/sec)", end='', file=sys.stderr, flush=True)
+
+    try:
+        if args.entity == 'all':
+            stats = export_database(args.path, args.chunk_size, report, **filters)
+        else:
+            stats = export_table(args.entity, args.path, args.format, args.chunk_size, report, **filters)
+    except FileExistsError as e:
+        parser.error(str(e))
+    print(file=sys.stderr)
+    print(f"Exported {stats['rows']} rows in {stats['seconds']:.1f}s "
+          f"({stats['rows_per_sec']:,.0f} rows/sec) to {args.path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
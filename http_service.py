@@ -0,0 +1,504 @@
+"""Local JSON HTTP API over database.py for kiosks and other systems.
+
+Usage: python http_service.py [--host 127.0.0.1] [--port 8080] [--database hospital.db] [--workers 4]
+
+    GET    /health
+    GET    /patients?q=&after=&limit=                POST /patients
+    GET    /patients/{id}   PUT /patients/{id}     DELETE /patients/{id}
+    GET    /patients/{id}/appointments
+    GET    /doctors?q=&after=&limit=                 POST /doctors
+    GET    /doctors/{id}    PUT /doctors/{id}      DELETE /doctors/{id}
+    GET    /doctors/{id}/slots?date=&duration=
+    GET    /slots/earliest?duration=&from=&to=&specialization=&doctor_id=&limit=
+    GET    /appointments?q=&patient_id=&doctor_id=&date=&from=&to=&after=&limit=
+    POST   /appointments
+    GET    /appointments/{id}                        DELETE /appointments/{id}
+    POST   /appointments/series
+    GET    /appointments/series/{id}                 DELETE /appointments/series/{id}?from=
+
+HTTP/1.1 with keep-alive is served on an asyncio event loop; database calls
+run on the async_database worker pool. List endpoints return
+{"items": [...], "next": cursor} (pass the cursor back as ?after= for the
+next page) with an ETag derived from the data version, so clients can
+revalidate with If-None-Match and get a 304 without the list being queried.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import re
+import sys
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import async_database as adb
+import database
+
+logger = logging.getLogger(__name__)
+
+MAX_HEADER_COUNT = 100
+MAX_BODY_SIZE = 1024 * 1024
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+class HttpError(Exception):
+    """Error turned into a JSON response with the given status"""
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+class Request:
+    __slots__ = ('method', 'path', 'query', 'version', 'headers', 'body')
+
+    def __init__(self, method, target, version, headers, body):
+        url = urlsplit(target)
+        self.method = method
+        self.path = url.path.rstrip('/') or '/'
+        self.query = parse_qs(url.query)
+        self.version = version
+        self.headers = headers
+        self.body = body
+
+    @property
+    def keep_alive(self):
+        connection = self.headers.get('connection', '').lower()
+        if self.version == 'HTTP/1.0':
+            return 'keep-alive' in connection
+        return 'close' not in connection
+
+    def json(self):
+        try:
+            body = json.loads(self.body or b'null')
+        except ValueError:
+            raise HttpError(400, "Request body must be JSON")
+        if not isinstance(body, dict):
+            raise HttpError(400, "Request body must be a JSON object")
+        return body
+
+class Response:
+    __slots__ = ('status', 'payload', 'headers')
+
+    def __init__(self, status=200, payload=None, headers=None):
+        self.status = status
+        self.payload = payload
+        self.headers = headers or {}
+
+    def encode(self, keep_alive, idle_timeout):
+        body = b''
+        headers = dict(self.headers)
+        if self.status not in (204, 304):
+            body = json.dumps(self.payload).encode('utf-8')
+            headers['Content-Type'] = 'application/json; charset=utf-8'
+            headers['Content-Length'] = str(len(body))
+        if keep_alive:
+            headers['Connection'] = 'keep-alive'
+            headers['Keep-Alive'] = f'timeout={int(idle_timeout)}'
+        else:
+            headers['Connection'] = 'close'
+        lines = [f'HTTP/1.1 {self.status} {HTTPStatus(self.status).phrase}']
+        lines.extend(f'{name}: {value}' for name, value in headers.items())
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+async def read_request(reader, writer):
+    """Parse one request from the stream; None when the client closed the connection"""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode('latin-1').split()
+    except ValueError:
+        raise HttpError(400, "Malformed request line")
+    if version not in ('HTTP/1.0', 'HTTP/1.1'):
+        raise HttpError(505, "Only HTTP/1.0 and HTTP/1.1 are supported")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n'):
+            break
+        if not line:
+            return None
+        name, sep, value = line.decode('latin-1').partition(':')
+        if not sep or len(headers) >= MAX_HEADER_COUNT:
+            raise HttpError(400, "Malformed headers")
+        headers[name.strip().lower()] = value.strip()
+
+    if 'transfer-encoding' in headers:
+        raise HttpError(501, "Chunked request bodies are not supported; send Content-Length")
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise HttpError(400, "Invalid Content-Length")
+    if length < 0 or length > MAX_BODY_SIZE:
+        raise HttpError(413, "Request body too large")
+    body = b''
+    if length:
+        if headers.get('expect', '').lower() == '100-continue':
+            writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+        body = await reader.readexactly(length)
+    return Request(method.upper(), target, version, headers, body)
+
+# Routing
+ROUTES = []
+
+def route(method, pattern):
+    """Register an async handler(request, *path groups) for method and path pattern"""
+    def register(handler):
+        ROUTES.append((method, re.compile(pattern + '$'), handler))
+        return handler
+    return register
+
+async def dispatch(request):
+    allowed = []
+    for method, pattern, handler in ROUTES:
+        match = pattern.match(request.path)
+        if match is None:
+            continue
+        if method != request.method:
+            allowed.append(method)
+            continue
+        return await handler(request, *match.groups())
+    if allowed:
+        raise HttpError(405, "Method not allowed", {'Allow': ', '.join(allowed)})
+    raise HttpError(404, "Not found")
+
+# Parameters
+def _param(request, name, default=None):
+    values = request.query.get(name)
+    return values[-1] if values else default
+
+def _int_param(request, name, default=None, minimum=None, maximum=None):
+    value = _param(request, name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise HttpError(400, f"{name} must be an integer")
+    if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+        raise HttpError(400, f"{name} must be between {minimum} and {maximum}")
+    return value
+
+def _fields(body, required, optional=None):
+    """Pick typed fields from a JSON body: {name: type}"""
+    values = {}
+    for name, kind in list(required.items()) + list((optional or {}).items()):
+        if name not in body:
+            if name in required:
+                raise HttpError(400, f"Missing field: {name}")
+            continue
+        value = body[name]
+        if not isinstance(value, kind) or isinstance(value, bool):
+            raise HttpError(400, f"Field {name} must be {'an integer' if kind is int else 'a string'}")
+        values[name] = value
+    return values
+
+# Keyset cursors: the sort keys of the last row of a page
+_CURSOR_KEYS = ('search_rank', 'name', 'appointment_day', 'start_minute', 'id')
+
+def encode_cursor(row):
+    data = {key: row[key] for key in _CURSOR_KEYS if key in row}
+    return base64.urlsafe_b64encode(json.dumps(data).encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(token):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except ValueError:
+        raise HttpError(400, "Invalid cursor")
+    if not isinstance(data, dict) or 'id' not in data or not set(data) <= set(_CURSOR_KEYS):
+        raise HttpError(400, "Invalid cursor")
+    if not all(value is None or isinstance(value, (str, int, float)) for value in data.values()):
+        raise HttpError(400, "Invalid cursor")
+    return data
+
+def _etag_matches(request, etag):
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(',')]
+    return '*' in tags or etag in tags or 'W/' + etag in tags
+
+async def list_response(request, fetch_page):
+    """Paginated list with an ETag; fetch_page(after=, limit=) returns rows"""
+    # Read the version before the rows: a write in between leaves the tag
+    # older than the data, which only costs the client a full response later
+    etag = f'"{await adb.get_data_version()}"'
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if _etag_matches(request, etag):
+        return Response(304, headers=headers)
+
+    limit = _int_param(request, 'limit', DEFAULT_PAGE_SIZE, 1, MAX_PAGE_SIZE)
+    after = _param(request, 'after')
+    cursor = decode_cursor(after) if after else None
+    # A cursor missing a sort key is refused by _fetch_page; one with extra
+    # keys came from a different ordering (e.g. a search) of the list
+    rows = await fetch_page(after=cursor, limit=limit + 1)
+    if cursor and rows and set(cursor) != {key for key in _CURSOR_KEYS if key in rows[0]}:
+        raise HttpError(400, "Cursor does not match the sort order of this list")
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return Response(200, {'items': rows[:limit], 'next': next_cursor}, headers)
+
+def _found(row, what):
+    if row is None:
+        raise HttpError(404, f"{what} not found")
+    return row
+
+# Endpoints
+@route('GET', r'/health')
+async def health(request):
+    return Response(200, {'status': 'ok', 'counts': await adb.get_record_counts()})
+
+_PATIENT_FIELDS = {'name': str, 'age': int, 'gender': str}
+
+@route('GET', r'/patients')
+async def list_patients(request):
+    search = _param(request, 'q')
+    return await list_response(request, lambda **page: adb.get_patients(search, **page))
+
+@route('POST', r'/patients')
+async def create_patient(request):
+    values = _fields(request.json(), _PATIENT_FIELDS, {'diagnosis': str})
+    patient_id = await adb.insert_patient(**values)
+    return Response(201, await adb.get_patient_by_id(patient_id), {'Location': f'/patients/{patient_id}'})
+
+@route('GET', r'/patients/(\d+)')
+async def get_patient(request, patient_id):
+    return Response(200, _found(await adb.get_patient_by_id(patient_id), "Patient"))
+
+@route('PUT', r'/patients/(\d+)')
+async def update_patient(request, patient_id):
+    values = _fields(request.json(), _PATIENT_FIELDS, {'diagnosis': str})
+    values.setdefault('diagnosis', "")
+    _found(await adb.update_patient(int(patient_id), **values) or None, "Patient")
+    return Response(200, await adb.get_patient_by_id(patient_id))
+
+@route('DELETE', r'/patients/(\d+)')
+async def delete_patient(request, patient_id):
+    _found(await adb.delete_patient(int(patient_id)) or None, "Patient")
+    return Response(204)
+
+@route('GET', r'/patients/(\d+)/appointments')
+async def patient_appointments(request, patient_id):
+    patient, appointments = await adb.get_patient_with_appointments(int(patient_id))
+    _found(patient, "Patient")
+    return Response(200, {'items': appointments})
+
+_DOCTOR_FIELDS = {'name': str, 'specialization': str, 'experience': int, 'gender': str}
+
+@route('GET', r'/doctors')
+async def list_doctors(request):
+    search = _param(request, 'q')
+    return await list_response(request, lambda **page: adb.get_doctors(search, **page))
+
+@route('POST', r'/doctors')
+async def create_doctor(request):
+    values = _fields(request.json(), _DOCTOR_FIELDS)
+    doctor_id = await adb.insert_doctor(**values)
+    return Response(201, await adb.get_doctor_by_id(doctor_id), {'Location': f'/doctors/{doctor_id}'})
+
+@route('GET', r'/doctors/(\d+)')
+async def get_doctor(request, doctor_id):
+    return Response(200, _found(await adb.get_doctor_by_id(doctor_id), "Doctor"))
+
+@route('PUT', r'/doctors/(\d+)')
+async def update_doctor(request, doctor_id):
+    values = _fields(request.json(), _DOCTOR_FIELDS)
+    _found(await adb.update_doctor(int(doctor_id), **values) or None, "Doctor")
+    return Response(200, await adb.get_doctor_by_id(doctor_id))
+
+@route('DELETE', r'/doctors/(\d+)')
+async def delete_doctor(request, doctor_id):
+    _found(await adb.delete_doctor(int(doctor_id)) or None, "Doctor")
+    return Response(204)
+
+@route('GET', r'/doctors/(\d+)/slots')
+async def doctor_slots(request, doctor_id):
+    date = _param(request, 'date')
+    if not date:
+        raise HttpError(400, "date is required (YYYY-MM-DD)")
+    duration = _int_param(request, 'duration', 30, 5, 480)
+    doctor, slots = await adb.get_doctor_with_slots(int(doctor_id), date, duration)
+    _found(doctor, "Doctor")
+    return Response(200, {'doctor_id': doctor['id'], 'date': date, 'duration': duration,
+                          'slots': [{'start_time': start, 'end_time': end} for start, end in slots]})
+
+@route('GET', r'/slots/earliest')
+async def earliest_slots(request):
+    try:
+        doctor_ids = [int(value) for value in request.query.get('doctor_id', [])] or None
+    except ValueError:
+        raise HttpError(400, "doctor_id must be an integer")
+    slots = await adb.find_earliest_slots(
+        duration_minutes=_int_param(request, 'duration', 30, 5, 480),
+        date_from=_param(request, 'from'),
+        date_to=_param(request, 'to'),
+        specialization=_param(request, 'specialization'),
+        doctor_ids=doctor_ids,
+        limit=_int_param(request, 'limit', 10, 1, 100))
+    return Response(200, {'items': slots})
+
+@route('GET', r'/appointments')
+async def list_appointments(request):
+    filters = {
+        'patient_id': _int_param(request, 'patient_id'),
+        'doctor_id': _int_param(request, 'doctor_id'),
+        'date': _param(request, 'date'),
+        'date_from': _param(request, 'from'),
+        'date_to': _param(request, 'to'),
+        'search_term': _param(request, 'q'),
+    }
+    return await list_response(request, lambda **page: adb.get_appointments(**filters, **page))
+
+@route('POST', r'/appointments')
+async def book_appointment(request):
+    values = _fields(request.json(),
+                     {'patient_id': int, 'doctor_id': int, 'appointment_date': str,
+                      'start_time': str, 'end_time': str},
+                     {'notes': str})
+    try:
+        database.validate_appointment_time(values['appointment_date'], values['start_time'],
+                                           values['end_time'])
+    except ValueError as e:
+        raise HttpError(400, str(e))
+    patient, doctor = await adb.fan_out(adb.get_patient_by_id(values['patient_id']),
+                                        adb.get_doctor_by_id(values['doctor_id']))
+    _found(patient, "Patient")
+    _found(doctor, "Doctor")
+    try:
+        appointment_id = await adb.schedule_appointment(**values)
+    except ValueError as e:
+        # The request itself was valid, so the slot is taken
+        raise HttpError(409, str(e))
+    return Response(201, await adb.get_appointment_by_id(appointment_id),
+                    {'Location': f'/appointments/{appointment_id}'})
+
+@route('GET', r'/appointments/(\d+)')
+async def get_appointment(request, appointment_id):
+    return Response(200, _found(await adb.get_appointment_by_id(appointment_id), "Appointment"))
+
+@route('DELETE', r'/appointments/(\d+)')
+async def delete_appointment(request, appointment_id):
+    _found(await adb.delete_appointment(int(appointment_id)) or None, "Appointment")
+    return Response(204)
+
+@route('POST', r'/appointments/series')
+async def book_appointment_series(request):
+    values = _fields(request.json(),
+                     {'patient_id': int, 'doctor_id': int, 'start_date': str,
+                      'start_time': str, 'end_time': str, 'rule': str},
+                     {'notes': str})
+    patient, doctor = await adb.fan_out(adb.get_patient_by_id(values['patient_id']),
+                                        adb.get_doctor_by_id(values['doctor_id']))
+    _found(patient, "Patient")
+    _found(doctor, "Doctor")
+    try:
+        result = await adb.schedule_appointment_series(**values)
+    except ValueError as e:
+        raise HttpError(400, str(e))
+    if result['series_id'] is None:
+        # Every occurrence was taken; the conflicts carry the alternatives
+        return Response(409, result)
+    return Response(201, result, {'Location': f"/appointments/series/{result['series_id']}"})
+
+@route('GET', r'/appointments/series/(\d+)')
+async def get_appointment_series(request, series_id):
+    return Response(200, _found(await adb.get_appointment_series(int(series_id)), "Series"))
+
+@route('DELETE', r'/appointments/series/(\d+)')
+async def cancel_appointment_series(request, series_id):
+    _found(await adb.get_appointment_series(int(series_id)), "Series")
+    try:
+        cancelled = await adb.cancel_appointment_series(int(series_id), _param(request, 'from'))
+    except ValueError:
+        raise HttpError(400, "from must be a date (YYYY-MM-DD)")
+    return Response(200, {'cancelled': cancelled})
+
+# Server
+async def handle_request(request):
+    try:
+        return await dispatch(request)
+    except HttpError as e:
+        return Response(e.status, {'error': e.message}, e.headers)
+    except ValueError as e:
+        return Response(400, {'error': str(e)})
+    except Exception:
+        logger.exception("Error handling %s %s", request.method, request.path)
+        return Response(500, {'error': "Internal server error"})
+
+class HospitalService:
+    """HTTP/1.1 server; each connection is served until it closes or idles out"""
+
+    def __init__(self, host='127.0.0.1', port=8080, idle_timeout=15.0):
+        self.host = host
+        self.port = port
+        self.idle_timeout = idle_timeout
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def _serve_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader, writer), self.idle_timeout)
+                except HttpError as e:
+                    writer.write(Response(e.status, {'error': e.message}, e.headers).encode(False, 0))
+                    await writer.drain()
+                    break
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, ConnectionError):
+                    break  # Idle, truncated or oversized request line: just hang up
+                if request is None:
+                    break
+
+                response = await handle_request(request)
+                keep_alive = request.keep_alive
+                writer.write(response.encode(keep_alive, self.idle_timeout))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the hospital database as a JSON HTTP API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080, help="0 picks a free port")
+    parser.add_argument('--database', default=database.DB_PATH)
+    parser.add_argument('--workers', type=int, default=4, help="Database worker threads")
+    parser.add_argument('--idle-timeout', type=float, default=15.0, help="Seconds to keep idle connections open")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    database.configure_pool(database=args.database, max_idle=max(args.workers, 5))
+    database.initialize_database()
+    adb.configure(max_workers=args.workers)
+
+    async def serve():
+        service = await HospitalService(args.host, args.port, args.idle_timeout).start()
+        print(f"Serving {args.database} on http://{args.host}:{service.port}", flush=True)
+        await service.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        adb.shutdown(wait=False)
+        database.close_pool()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
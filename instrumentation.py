@@ -0,0 +1,308 @@
+"""Optional query instrumentation for database.py.
+
+Pooled connections are created as InstrumentedConnection. While
+instrumentation is off they behave exactly like plain sqlite3 connections;
+after enable() their cursors time every statement (execute plus the fetches
+that read its rows) and the public database functions record latency
+histograms. Statements slower than the threshold are logged together with
+their EXPLAIN QUERY PLAN to the "hospital.slow_queries" logger and, if a path
+is given, to a log file.
+
+Set HMS_QUERY_STATS=1 (or a slow-query threshold in ms, e.g. 25) to enable it
+at startup, or use the diagnostics panel in the application.
+"""
+import functools
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+
+slow_logger = logging.getLogger("hospital.slow_queries")
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_lock = threading.Lock()
+_enabled = False
+_slow_query_ms = 100.0
+_log_handler = None
+_statements = {}  # normalised SQL -> [calls, total ms, max ms, rows]
+_functions = {}   # function name -> [calls, total ms, max ms, bucket counts]
+_slow_queries = deque(maxlen=200)
+
+def enable(slow_query_ms=100.0, log_path=None):
+    """Start recording; statements slower than slow_query_ms are logged with their plan"""
+    global _enabled, _slow_query_ms, _log_handler
+    with _lock:
+        _slow_query_ms = float(slow_query_ms)
+        if log_path and _log_handler is None:
+            _log_handler = logging.FileHandler(log_path, encoding='utf-8')
+            _log_handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            slow_logger.addHandler(_log_handler)
+            slow_logger.setLevel(logging.INFO)
+        _enabled = True
+
+def disable():
+    """Stop recording (collected statistics are kept)"""
+    global _enabled, _log_handler
+    with _lock:
+        _enabled = False
+        if _log_handler is not None:
+            slow_logger.removeHandler(_log_handler)
+            _log_handler.close()
+            _log_handler = None
+
+def is_enabled():
+    return _enabled
+
+def reset():
+    """Forget everything recorded so far"""
+    with _lock:
+        _statements.clear()
+        _functions.clear()
+        _slow_queries.clear()
+
+def enable_from_environment():
+    """Enable instrumentation if HMS_QUERY_STATS is set"""
+    value = os.environ.get('HMS_QUERY_STATS')
+    if not value or value == '0':
+        return False
+    try:
+        threshold = float(value) if value != '1' else 100.0
+    except ValueError:
+        threshold = 100.0
+    enable(threshold, os.environ.get('HMS_SLOW_QUERY_LOG'))
+    return True
+
+# Recording
+_IN_LIST = re.compile(r'\?(\s*,\s*\?)+')
+_SPACES = re.compile(r'\s+')
+
+def normalize_sql(sql):
+    """Collapse whitespace and placeholder lists so variants of a query group together"""
+    return _IN_LIST.sub('?, ...', _SPACES.sub(' ', sql).strip())
+
+def _record_statement(sql, elapsed_ms, rows):
+    key = normalize_sql(sql)
+    with _lock:
+        entry = _statements.get(key)
+        if entry is None:
+            entry = _statements[key] = [0, 0.0, 0.0, 0]
+        entry[0] += 1
+        entry[1] += elapsed_ms
+        entry[2] = max(entry[2], elapsed_ms)
+        entry[3] += rows
+
+def _record_slow(conn, sql, params, elapsed_ms, many):
+    plan = None
+    if not many:
+        try:
+            # A plain cursor, so capturing the plan is not itself instrumented
+            cursor = sqlite3.Connection.cursor(conn)
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = [row[3] for row in cursor.fetchall()]
+        except (sqlite3.Error, ValueError):
+            plan = None
+    entry = {
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'ms': round(elapsed_ms, 3),
+        'sql': normalize_sql(sql),
+        'plan': plan,
+    }
+    with _lock:
+        _slow_queries.append(entry)
+    slow_logger.warning("Slow query (%.1f ms): %s | plan: %s", elapsed_ms, entry['sql'],
+                        "; ".join(plan) if plan else "n/a")
+
+def _record_function(name, elapsed_ms):
+    bucket = len(BUCKETS_MS)
+    for i, bound in enumerate(BUCKETS_MS):
+        if elapsed_ms <= bound:
+            bucket = i
+            break
+    with _lock:
+        entry = _functions.get(name)
+        if entry is None:
+            entry = _functions[name] = [0, 0.0, 0.0, [0] * (len(BUCKETS_MS) + 1)]
+        entry[0] += 1
+        entry[1] += elapsed_ms
+        entry[2] = max(entry[2], elapsed_ms)
+        entry[3][bucket] += 1
+
+_active = threading.local()  # .running: a timed call is in progress on this thread
+
+def timed(func):
+    """Record a latency histogram for func while instrumentation is enabled
+
+    Only the outermost timed call on a thread is recorded, so a public
+    function built on another one (get_available_time_slots on
+    get_available_time_slots_batch) is not counted twice.
+    """
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _enabled or getattr(_active, 'running', False):
+            return func(*args, **kwargs)
+        _active.running = True
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _record_function(name, (time.perf_counter() - started) * 1000)
+            _active.running = False
+    return wrapper
+
+# Connection and cursor
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times each statement, including the fetches that read its rows"""
+
+    _sql = None
+
+    def _start(self, sql, params, many):
+        self._finish()
+        self._sql = sql
+        self._params = params
+        self._many = many
+        self._elapsed = 0.0
+        self._rows = 0
+
+    def _finish(self):
+        if self._sql is None:
+            return
+        sql, elapsed = self._sql, self._elapsed
+        self._sql = None
+        _record_statement(sql, elapsed, self._rows)
+        if elapsed >= _slow_query_ms:
+            _record_slow(self.connection, sql, self._params, elapsed, self._many)
+
+    def _timed(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._elapsed += (time.perf_counter() - started) * 1000
+
+    def execute(self, sql, parameters=()):
+        self._start(sql, parameters, False)
+        self._timed(super().execute, sql, parameters)
+        if self.description is None:
+            self._finish()  # Writes and DDL are complete once execute returns
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._start(sql, (), True)
+        self._timed(super().executemany, sql, seq_of_parameters)
+        self._finish()
+        return self
+
+    def fetchone(self):
+        if self._sql is None:
+            return super().fetchone()
+        row = self._timed(super().fetchone)
+        if row is None:
+            self._finish()
+        else:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        if self._sql is None:
+            return super().fetchmany(self.arraysize if size is None else size)
+        size = self.arraysize if size is None else size
+        rows = self._timed(super().fetchmany, size)
+        self._rows += len(rows)
+        if len(rows) < size:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        if self._sql is None:
+            return super().fetchall()
+        rows = self._timed(super().fetchall)
+        self._rows += len(rows)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        if self._sql is None:
+            return super().__next__()
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._elapsed += (time.perf_counter() - started) * 1000
+            self._finish()
+            raise
+        self._elapsed += (time.perf_counter() - started) * 1000
+        self._rows += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # Single-row lookups often never read to the end; record them when dropped
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+class InstrumentedConnection(sqlite3.Connection):
+    """sqlite3 connection whose cursors are instrumented while recording is enabled"""
+
+    def cursor(self, factory=None):
+        if factory is None and _enabled:
+            factory = InstrumentedCursor
+        return super().cursor(factory) if factory is not None else super().cursor()
+
+    # The C implementations of these shortcuts do not go through cursor()
+    def execute(self, sql, parameters=()):
+        if not _enabled:
+            return super().execute(sql, parameters)
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        if not _enabled:
+            return super().executemany(sql, seq_of_parameters)
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+# Reports
+def _percentile(buckets, count, fraction):
+    if not count:
+        return 0.0
+    target = count * fraction
+    seen = 0
+    for i, bucket_count in enumerate(buckets):
+        seen += bucket_count
+        if seen >= target:
+            return BUCKETS_MS[i] if i < len(BUCKETS_MS) else float('inf')
+    return float('inf')
+
+def top_statements(limit=20):
+    """Statements by total time: dicts with sql, calls, total_ms, avg_ms, max_ms, rows"""
+    with _lock:
+        items = [(sql, list(entry)) for sql, entry in _statements.items()]
+    items.sort(key=lambda item: item[1][1], reverse=True)
+    return [{'sql': sql, 'calls': calls, 'total_ms': round(total, 3), 'avg_ms': round(total / calls, 3),
+             'max_ms': round(worst, 3), 'rows': rows}
+            for sql, (calls, total, worst, rows) in items[:limit]]
+
+def function_latencies():
+    """Per-function histograms: dicts with name, calls, total/avg/max ms and p50/p95 bucket bounds"""
+    with _lock:
+        items = [(name, entry[0], entry[1], entry[2], list(entry[3])) for name, entry in _functions.items()]
+    items.sort(key=lambda item: item[2], reverse=True)
+    return [{'name': name, 'calls': calls, 'total_ms': round(total, 3), 'avg_ms': round(total / calls, 3),
+             'max_ms': round(worst, 3), 'p50_ms': _percentile(buckets, calls, 0.5),
+             'p95_ms': _percentile(buckets, calls, 0.95), 'histogram': buckets}
+            for name, calls, total, worst, buckets in items]
+
+def slow_queries():
+    """Most recent slow statements, newest first"""
+    with _lock:
+        return list(reversed(_slow_queries))
@@ -1,13 +1,324 @@
+import startup_profile
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from datetime import datetime, time, timedelta
-from database import *
-from welcome_screen import *
+from database import (
+    initialize_database, warm_up, get_record_counts, get_recent_activity, get_activity_log,
+    ACTIVITY_TYPES, ACTIVITY_ACTIONS,
+    get_appointment_counts_by_day, get_appointment_counts_by_doctor,
+    insert_patient, get_patients, update_patient, delete_patient, get_patient_by_id,
+    get_patient_appointments, search_patient_names,
+    insert_doctor, get_doctors, update_doctor, delete_doctor, get_doctor_by_id, search_doctor_names,
+    schedule_appointment, schedule_appointment_series, get_appointments, delete_appointment, get_available_time_slots,
+    find_earliest_slots, get_specializations, cache_stats
+)
+import instrumentation
+from welcome_screen import WelcomeScreen
+from background import TaskRunner
+import receipts
+import multiprocessing
+import threading
 import os
 from tkinter import simpledialog
 
+startup_profile.mark("imports")
+
+class VirtualTreeList:
+    """Keep only a window of rows in a Treeview and page more in on scroll
+
+    fetch_page(after=None, before=None, limit=None) returns rows in display
+    order (see the keyset arguments of get_patients); to_values(row) turns a
+    row into Treeview values. Items use the row id as their iid. Pages are
+    fetched on the task runner, so the window stays responsive meanwhile.
+    """
+
+    def __init__(self, tree, scrollbar, to_values, tasks, page_size=100, prefetch=30, max_rows=300):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.to_values = to_values
+        self.tasks = tasks
+        self.page_size = page_size
+        self.prefetch = prefetch
+        self.max_rows = max_rows
+        self.fetch_page = None
+        self.rows = []
+        self.at_start = True
+        self.at_end = True
+        self._loading = False
+        
+        tree.configure(yscrollcommand=self._on_scroll)
+        scrollbar.configure(command=tree.yview)
+
+    def load(self, fetch_page):
+        """Show the first page of a new result set"""
+        self.fetch_page = fetch_page
+        self.rows = []
+        self.tree.delete(*self.tree.get_children())
+        self.tree.insert("", "end", iid="loading", values=("", "Loading..."))
+        self._loading = True
+        self.tasks.submit(fetch_page, limit=self.page_size, key=self, owner=self.tree,
+                          on_success=self._show_first_page, on_error=self._show_error)
+
+    def refresh(self, select=None):
+        """Re-read the rows currently shown and apply only the differences
+
+        Scroll position and selection are kept; `select` is an optional row id
+        to select and bring into view once it is on screen.
+        """
+        if self.fetch_page is None or not self.rows:
+            if self.fetch_page is not None:
+                self.load(self.fetch_page)
+            return
+        
+        fetch_page = self.fetch_page
+        first_row = self.rows[0]
+        at_start = self.at_start
+        limit = min(max(len(self.rows), self.page_size), self.max_rows)
+        
+        def fetch_window():
+            # Resume right before the first row shown so the window stays where it is
+            anchor = None
+            if not at_start:
+                previous = fetch_page(before=first_row, limit=1)
+                anchor = previous[-1] if previous else None
+            rows = fetch_page(after=anchor, limit=limit)
+            return anchor is None, rows
+        
+        self._loading = True
+        self.tasks.submit(fetch_window, key=self, owner=self.tree, on_error=self._show_error,
+                          on_success=lambda result: self._apply_window(*result, limit=limit, select=select))
+
+    def _apply_window(self, at_start, rows, limit, select=None):
+        try:
+            tree = self.tree
+            top_item = None
+            if self.rows:
+                top_index = min(int(tree.yview()[0] * len(self.rows)), len(self.rows) - 1)
+                top_item = str(self.rows[top_index]['id'])
+            
+            old = {str(row['id']): row for row in self.rows}
+            new_ids = [str(row['id']) for row in rows]
+            gone = old.keys() - set(new_ids)
+            if gone:
+                tree.delete(*gone)
+            if tree.exists("loading"):
+                tree.delete("loading")
+            
+            for index, (iid, row) in enumerate(zip(new_ids, rows)):
+                if iid not in old:
+                    tree.insert("", index, iid=iid, values=self.to_values(row))
+                    continue
+                if old[iid] != row:
+                    tree.item(iid, values=self.to_values(row))
+                if tree.index(iid) != index:
+                    tree.move(iid, "", index)
+            
+            self.rows = rows
+            self.at_start = at_start
+            self.at_end = len(rows) < limit
+            
+            if top_item is not None and tree.exists(top_item) and rows:
+                tree.yview_moveto(tree.index(top_item) / len(rows))
+            if select is not None and tree.exists(str(select)):
+                tree.selection_set(str(select))
+                tree.see(str(select))
+        finally:
+            self._loading = False
+
+    def _show_first_page(self, rows):
+        self.tree.delete(*self.tree.get_children())
+        self.rows = rows
+        for row in rows:
+            self.tree.insert("", "end", iid=str(row['id']), values=self.to_values(row))
+        self.at_start = True
+        self.at_end = len(rows) < self.page_size
+        self._loading = False
+
+    def _show_error(self, error):
+        self.tree.delete(*self.tree.get_children())
+        self._loading = False
+        messagebox.showerror("Error", f"Failed to load records:\n{error}")
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self._loading or not self.rows:
+            return
+        
+        count = len(self.rows)
+        if not self.at_end and (1.0 - float(last)) * count < self.prefetch:
+            self._loading = True
+            self.tasks.submit(self.fetch_page, after=self.rows[-1], limit=self.page_size,
+                              key=self, owner=self.tree, on_error=self._show_error,
+                              on_success=lambda rows: self._add_page(rows, forward=True))
+        elif not self.at_start and float(first) * count < self.prefetch:
+            self._loading = True
+            self.tasks.submit(self.fetch_page, before=self.rows[0], limit=self.page_size,
+                              key=self, owner=self.tree, on_error=self._show_error,
+                              on_success=lambda rows: self._add_page(rows, forward=False))
+
+    def _add_page(self, rows, forward):
+        try:
+            top_index = min(int(self.tree.yview()[0] * len(self.rows)), len(self.rows) - 1)
+            top_item = str(self.rows[top_index]['id'])
+            if forward:
+                self.at_end = len(rows) < self.page_size
+                for row in rows:
+                    self.tree.insert("", "end", iid=str(row['id']), values=self.to_values(row))
+                self.rows.extend(rows)
+                overflow = len(self.rows) - self.max_rows
+                if overflow > 0:
+                    self.tree.delete(*[str(row['id']) for row in self.rows[:overflow]])
+                    del self.rows[:overflow]
+                    self.at_start = False
+            else:
+                self.at_start = len(rows) < self.page_size
+                for index, row in enumerate(rows):
+                    self.tree.insert("", index, iid=str(row['id']), values=self.to_values(row))
+                self.rows[:0] = rows
+                overflow = len(self.rows) - self.max_rows
+                if overflow > 0:
+                    self.tree.delete(*[str(row['id']) for row in self.rows[-overflow:]])
+                    del self.rows[-overflow:]
+                    self.at_end = False
+            
+            # Keep the row that was at the top of the view in place
+            if self.tree.exists(top_item):
+                self.tree.yview_moveto(self.tree.index(top_item) / len(self.rows))
+        finally:
+            self._loading = False
+
+
+class TypeAheadPicker:
+    """Entry that lists matching records while the user types
+
+    search(text, limit) returns rows with an 'id' (see search_patient_names);
+    to_label(row) is the text shown in the list and put in the entry once a
+    row is picked, starting with "<id> - ". Lookups run on the task runner
+    after a short pause in typing and only the latest one is shown, so the
+    full table is never loaded. on_select(row) is called when a row is picked.
+    """
+
+    def __init__(self, parent, search, to_label, tasks, font=None, limit=10, delay=150, on_select=None):
+        self.search = search
+        self.to_label = to_label
+        self.tasks = tasks
+        self.limit = limit
+        self.delay = delay
+        self.on_select = on_select
+        self.rows = []
+        self._text = ""
+        self._after = None
+        
+        self.entry = tk.Entry(parent, font=font)
+        # The list floats over the widgets below the entry
+        self.listbox = tk.Listbox(parent.winfo_toplevel(), font=font, height=limit,
+                                  activestyle="dotbox", exportselection=False)
+        
+        self.entry.bind("<KeyRelease>", self._on_key)
+        self.entry.bind("<Down>", self._focus_list)
+        self.entry.bind("<Return>", lambda e: self._choose(0))
+        self.entry.bind("<Escape>", lambda e: self.hide())
+        self.entry.bind("<FocusOut>", self._on_focus_out)
+        self.listbox.bind("<ButtonRelease-1>", lambda e: self._choose_current())
+        self.listbox.bind("<Return>", lambda e: self._choose_current())
+        self.listbox.bind("<Up>", self._leave_list)
+        self.listbox.bind("<Escape>", lambda e: (self.hide(), self.entry.focus_set()))
+        self.listbox.bind("<FocusOut>", self._on_focus_out)
+
+    def grid(self, **options):
+        self.entry.grid(**options)
+
+    def get(self):
+        return self.entry.get()
+
+    def set(self, label):
+        """Show a label, e.g. one built elsewhere for a known row"""
+        self.entry.delete(0, tk.END)
+        self.entry.insert(0, label)
+        self._text = label
+        self.hide()
+
+    def selected_id(self):
+        """Id of the picked row, or None if the entry holds only typed text"""
+        head, sep, _ = self.entry.get().partition(" - ")
+        return int(head) if sep and head.strip().isdigit() else None
+
+    def hide(self):
+        self.listbox.place_forget()
+
+    def _on_key(self, event):
+        text = self.entry.get()
+        if text == self._text:
+            return
+        self._text = text
+        if self._after is not None:
+            self.entry.after_cancel(self._after)
+            self._after = None
+        if not text.strip():
+            self.rows = []
+            self.hide()
+            return
+        self._after = self.entry.after(self.delay, self._lookup)
+
+    def _lookup(self):
+        self._after = None
+        text = self.entry.get()
+        self.tasks.submit(self.search, text, self.limit, key=(self, "search"), owner=self.entry,
+                          on_success=lambda rows: self._show(text, rows))
+
+    def _show(self, text, rows):
+        # Typing went on meanwhile, or the user has left the field
+        if text != self.entry.get() or self.entry.focus_get() not in (self.entry, self.listbox):
+            return
+        self.rows = rows
+        self.listbox.delete(0, tk.END)
+        if not rows:
+            self.hide()
+            return
+        for row in rows:
+            self.listbox.insert(tk.END, self.to_label(row))
+        self.listbox.configure(height=len(rows))
+        self.listbox.place(in_=self.entry, relx=0, rely=1, relwidth=1)
+        self.listbox.lift()
+
+    def _choose(self, index):
+        if not self.listbox.winfo_ismapped() or not 0 <= index < len(self.rows):
+            return
+        row = self.rows[index]
+        self.set(self.to_label(row))
+        self.entry.focus_set()
+        self.entry.icursor(tk.END)
+        if self.on_select:
+            self.on_select(row)
+
+    def _choose_current(self):
+        selection = self.listbox.curselection()
+        if selection:
+            self._choose(selection[0])
+
+    def _focus_list(self, event):
+        if self.listbox.winfo_ismapped():
+            self.listbox.focus_set()
+            self.listbox.selection_clear(0, tk.END)
+            self.listbox.selection_set(0)
+            self.listbox.activate(0)
+        return "break"
+
+    def _leave_list(self, event):
+        if self.listbox.curselection() in ((), (0,)):
+            self.entry.focus_set()
+            return "break"
+
+    def _on_focus_out(self, event):
+        # Focus may only be moving between the entry and its list
+        def hide_unless_focused():
+            if self.entry.winfo_exists() and self.entry.focus_get() not in (self.entry, self.listbox):
+                self.hide()
+        self.entry.after(100, hide_unless_focused)
+
+
 class HospitalApp:
-    def __init__(self, root):
+    def __init__(self, root, recent_activity=None):
         self.root = root
         self.root.title("Hospital Management System")
         self.root.geometry("1100x750")
@@ -29,14 +340,25 @@ class HospitalApp:
         self.font_medium = ("Helvetica", 14)
         self.font_small = ("Helvetica", 12)
         
+        self.tasks = TaskRunner(self.root)
         self.current_frame = None
-        self.show_home_page()
+        self.patient_list = None
+        self.doctor_list = None
+        self.appointment_list = None
+        self.show_home_page(recent_activity)
 
     def clear_frame(self):
         """Clear the current frame"""
         if self.current_frame:
+            # Results for a screen the user has left are no longer wanted
+            self.tasks.cancel(self.current_frame)
             self.current_frame.destroy()
 
+    def refresh_list(self, view, select=None):
+        """Refresh a list in place after a change, if it is still on screen"""
+        if view is not None and view.tree.winfo_exists():
+            view.refresh(select)
+
     def create_nav_button(self, frame):
         """Create a back to home button"""
         btn_home = tk.Button(
@@ -52,8 +374,8 @@ class HospitalApp:
         )
         btn_home.pack(anchor="nw", padx=10, pady=10)
 
-    def show_home_page(self):
-        """Show the main home page"""
+    def show_home_page(self, recent_activity=None):
+        """Show the main home page, optionally with activity preloaded at startup"""
         self.clear_frame()
         self.current_frame = tk.Frame(self.root, bg=self.colors["light"])
         self.current_frame.pack(fill="both", expand=True)
@@ -87,6 +409,7 @@ class HospitalApp:
             ("Doctor Management", self.show_doctor_management, self.colors["secondary"]),
             ("Appointment Scheduling", self.show_appointment_scheduling, self.colors["accent"]),
             ("View All Records", self.show_all_records, self.colors["purple"]),
+            ("Activity History", self.show_activity_history, self.colors["dark"]),
             ("Exit System", self.root.quit, self.colors["danger"])
         ]
         
@@ -130,15 +453,23 @@ class HospitalApp:
         activity_tree.column("Description", width=300)
         activity_tree.column("Time", width=150)
         
-        for activity in get_recent_activity():
-            activity_tree.insert("", "end", values=(
-                activity['type'],
-                activity.get('name', activity.get('description', '')),
-                activity['created_at']
-            ))
-        
         activity_tree.pack(fill="x")
         
+        def show_activity(activities):
+            activity_tree.delete(*activity_tree.get_children())
+            for activity in activities:
+                activity_tree.insert("", "end", values=(
+                    f"{activity['type']} {activity['action']}",
+                    activity['description'],
+                    activity['created_at']
+                ))
+        
+        if recent_activity is not None:
+            show_activity(recent_activity)
+        else:
+            activity_tree.insert("", "end", values=("", "Loading..."))
+            self.tasks.submit(get_recent_activity, owner=activity_tree, on_success=show_activity)
+        
         # Footer
         footer_frame = tk.Frame(self.current_frame, bg=self.colors["light"])
         footer_frame.pack(side="bottom", fill="x", pady=20)
@@ -150,6 +481,239 @@ class HospitalApp:
             bg=self.colors["light"],
             fg=self.colors["dark"]
         ).pack()
+        
+        tk.Button(
+            footer_frame,
+            text="Diagnostics",
+            command=self.show_diagnostics,
+            font=self.font_small,
+            bg=self.colors["light"],
+            fg=self.colors["dark"],
+            relief="flat"
+        ).pack(pady=(5, 0))
+
+    def show_activity_history(self):
+        """Show the full activity log with filters"""
+        self.clear_frame()
+        self.current_frame = tk.Frame(self.root, bg=self.colors["light"])
+        self.current_frame.pack(fill="both", expand=True)
+        
+        # Navigation
+        self.create_nav_button(self.current_frame)
+        
+        # Header
+        header_frame = tk.Frame(self.current_frame, bg=self.colors["light"])
+        header_frame.pack(fill="x", pady=10)
+        
+        tk.Label(
+            header_frame,
+            text="Activity History",
+            font=self.font_large,
+            bg=self.colors["light"],
+            fg=self.colors["dark"]
+        ).pack(side="left", padx=20)
+        
+        # Filters
+        filter_frame = tk.Frame(self.current_frame, bg=self.colors["light"])
+        filter_frame.pack(fill="x", padx=20, pady=10)
+        
+        type_var = tk.StringVar(value="All")
+        action_var = tk.StringVar(value="All")
+        date_from_var = tk.StringVar()
+        date_to_var = tk.StringVar()
+        
+        filters = [
+            ("Type:", ttk.Combobox(filter_frame, textvariable=type_var, state="readonly", width=12,
+                                   values=("All",) + ACTIVITY_TYPES)),
+            ("Action:", ttk.Combobox(filter_frame, textvariable=action_var, state="readonly", width=10,
+                                     values=("All",) + ACTIVITY_ACTIONS)),
+            ("From (YYYY-MM-DD):", tk.Entry(filter_frame, textvariable=date_from_var, font=self.font_small, width=12)),
+            ("To:", tk.Entry(filter_frame, textvariable=date_to_var, font=self.font_small, width=12)),
+        ]
+        for label, widget in filters:
+            tk.Label(
+                filter_frame,
+                text=label,
+                font=self.font_small,
+                bg=self.colors["light"]
+            ).pack(side="left", padx=(10, 5))
+            widget.pack(side="left")
+        
+        # Activity list
+        list_frame = tk.Frame(self.current_frame, bg=self.colors["light"])
+        list_frame.pack(fill="both", expand=True, padx=20, pady=10)
+        
+        activity_tree = ttk.Treeview(
+            list_frame,
+            columns=("ID", "Type", "Action", "Description", "Time"),
+            show="headings"
+        )
+        for column, width in (("ID", 60), ("Type", 100), ("Action", 80), ("Description", 350), ("Time", 150)):
+            activity_tree.heading(column, text=column)
+            activity_tree.column(column, width=width)
+        
+        scrollbar = ttk.Scrollbar(list_frame, orient="vertical")
+        scrollbar.pack(side="right", fill="y")
+        activity_tree.pack(side="left", fill="both", expand=True)
+        activity_list = VirtualTreeList(activity_tree, scrollbar, tasks=self.tasks, to_values=lambda entry: (
+            entry['id'],
+            entry['type'],
+            entry['action'],
+            entry['description'],
+            entry['created_at']
+        ))
+        
+        def apply_filters():
+            options = {
+                'activity_type': None if type_var.get() == "All" else type_var.get(),
+                'action': None if action_var.get() == "All" else action_var.get(),
+                'date_from': date_from_var.get().strip() or None,
+                'date_to': date_to_var.get().strip() or None,
+            }
+            try:
+                for key in ('date_from', 'date_to'):
+                    if options[key]:
+                        datetime.strptime(options[key], "%Y-%m-%d")
+            except ValueError:
+                messagebox.showerror("Error", "Dates must be in YYYY-MM-DD format")
+                return
+            activity_list.load(lambda **page: get_activity_log(**options, **page, row_format='record'))
+        
+        tk.Button(
+            filter_frame,
+            text="Apply",
+            command=apply_filters,
+            font=self.font_small,
+            bg=self.colors["accent"],
+            fg="white",
+            relief="flat"
+        ).pack(side="left", padx=10)
+        
+        apply_filters()
+
+    def show_diagnostics(self):
+        """Show query statistics, function latencies and slow queries"""
+        self.clear_frame()
+        self.current_frame = tk.Frame(self.root, bg=self.colors["light"])
+        self.current_frame.pack(fill="both", expand=True)
+        
+        # Navigation
+        self.create_nav_button(self.current_frame)
+        
+        # Header
+        header_frame = tk.Frame(self.current_frame, bg=self.colors["light"])
+        header_frame.pack(fill="x", pady=10)
+        
+        tk.Label(
+            header_frame,
+            text="Diagnostics",
+            font=self.font_large,
+            bg=self.colors["light"],
+            fg=self.colors["dark"]
+        ).pack(side="left", padx=20)
+        
+        status_label = tk.Label(
+            header_frame,
+            font=self.font_small,
+            bg=self.colors["light"],
+            fg=self.colors["dark"]
+        )
+        status_label.pack(side="left", padx=10)
+        
+        # Tables
+        notebook = ttk.Notebook(self.current_frame)
+        notebook.pack(fill="both", expand=True, padx=20, pady=10)
+        
+        def add_tab(title, columns):
+            tab = ttk.Frame(notebook)
+            notebook.add(tab, text=title)
+            tree = ttk.Treeview(tab, columns=[column for column, _ in columns], show="headings")
+            for column, width in columns:
+                tree.heading(column, text=column)
+                tree.column(column, width=width, anchor="w" if width > 100 else "e")
+            scrollbar = ttk.Scrollbar(tab, orient="vertical", command=tree.yview)
+            tree.configure(yscrollcommand=scrollbar.set)
+            scrollbar.pack(side="right", fill="y", pady=10)
+            tree.pack(fill="both", expand=True, padx=10, pady=10)
+            return tab, tree
+        
+        _, statement_tree = add_tab("Statements", (("SQL", 500), ("Calls", 60), ("Total ms", 80),
+                                                   ("Avg ms", 70), ("Max ms", 70), ("Rows", 70)))
+        _, function_tree = add_tab("Functions", (("Function", 250), ("Calls", 60), ("Avg ms", 70),
+                                                 ("p50 ms", 70), ("p95 ms", 70), ("Max ms", 70)))
+        slow_tab, slow_tree = add_tab("Slow Queries", (("Time", 150), ("ms", 70), ("SQL", 550)))
+        plan_text = tk.Text(slow_tab, height=6, font=self.font_small, wrap="word")
+        plan_text.pack(fill="x", padx=10, pady=(0, 10))
+        _, cache_tree = add_tab("Caches", (("Cache", 150), ("Size", 60), ("Hits", 70),
+                                           ("Misses", 70), ("Evictions", 80)))
+        slow_entries = []
+        
+        def show_plan(event):
+            plan_text.delete("1.0", "end")
+            selection = slow_tree.selection()
+            if selection:
+                entry = slow_entries[int(selection[0])]
+                plan_text.insert("end", entry['sql'] + "\n\n" + "\n".join(entry['plan'] or ["(plan not available)"]))
+        
+        slow_tree.bind("<<TreeviewSelect>>", show_plan)
+        
+        def refresh():
+            for tree in (statement_tree, function_tree, slow_tree, cache_tree):
+                tree.delete(*tree.get_children())
+            plan_text.delete("1.0", "end")
+            status_label.config(text="Recording" if instrumentation.is_enabled() else
+                                "Not recording (statistics are kept until reset)")
+            toggle_button.config(text="Disable" if instrumentation.is_enabled() else "Enable")
+            
+            for stat in instrumentation.top_statements(100):
+                statement_tree.insert("", "end", values=(stat['sql'], stat['calls'], stat['total_ms'],
+                                                         stat['avg_ms'], stat['max_ms'], stat['rows']))
+            for stat in instrumentation.function_latencies():
+                function_tree.insert("", "end", values=(stat['name'], stat['calls'], stat['avg_ms'],
+                                                        f"<= {stat['p50_ms']}", f"<= {stat['p95_ms']}",
+                                                        stat['max_ms']))
+            slow_entries[:] = instrumentation.slow_queries()
+            for i, entry in enumerate(slow_entries):
+                slow_tree.insert("", "end", iid=str(i), values=(entry['time'], entry['ms'], entry['sql']))
+            for name, stat in cache_stats().items():
+                cache_tree.insert("", "end", values=(name, stat['size'], stat['hits'],
+                                                     stat['misses'], stat['evictions']))
+        
+        def toggle():
+            if instrumentation.is_enabled():
+                instrumentation.disable()
+            else:
+                instrumentation.enable()
+            refresh()
+        
+        def reset():
+            instrumentation.reset()
+            refresh()
+        
+        button_frame = tk.Frame(header_frame, bg=self.colors["light"])
+        button_frame.pack(side="right", padx=20)
+        toggle_button = tk.Button(
+            button_frame,
+            command=toggle,
+            font=self.font_small,
+            bg=self.colors["primary"],
+            fg="white",
+            relief="flat"
+        )
+        for text, command, color in (("Reset", reset, self.colors["danger"]),
+                                     ("Refresh", refresh, self.colors["accent"])):
+            tk.Button(
+                button_frame,
+                text=text,
+                command=command,
+                font=self.font_small,
+                bg=color,
+                fg="white",
+                relief="flat"
+            ).pack(side="right", padx=5)
+        toggle_button.pack(side="right", padx=5)
+        
+        refresh()
 
     def show_patient_management(self):
         """Show patient management page"""
@@ -190,7 +754,7 @@ class HospitalApp:
         btn_refresh = tk.Button(
             action_frame,
             text="Refresh List",
-            command=lambda: self.show_patient_list(patient_tree),
+            command=lambda: self.show_patient_list(patient_list),
             font=self.font_small,
             bg=self.colors["secondary"],
             fg="white",
@@ -214,7 +778,7 @@ class HospitalApp:
         btn_search = tk.Button(
             search_frame,
             text="Search",
-            command=lambda: self.show_patient_list(patient_tree, self.patient_search_var.get()),
+            command=lambda: self.show_patient_list(patient_list, self.patient_search_var.get()),
             font=self.font_small,
             bg=self.colors["accent"],
             fg="white",
@@ -225,7 +789,7 @@ class HospitalApp:
         btn_search_id = tk.Button(
             search_frame,
             text="Search by ID",
-            command=lambda: self.show_patient_list(patient_tree, self.patient_search_var.get(), True),
+            command=lambda: self.show_patient_list(patient_list, self.patient_search_var.get(), True),
             font=self.font_small,
             bg=self.colors["purple"],
             fg="white",
@@ -261,13 +825,22 @@ class HospitalApp:
         patient_tree.column("Created At", width=150, anchor="center")
         
         # Add scrollbar
-        scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=patient_tree.yview)
-        patient_tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar = ttk.Scrollbar(list_frame, orient="vertical")
         scrollbar.pack(side="right", fill="y")
         patient_tree.pack(side="left", fill="both", expand=True)
+        patient_list = VirtualTreeList(patient_tree, scrollbar, tasks=self.tasks, to_values=lambda patient: (
+            patient['id'],
+            patient['name'],
+            patient['age'],
+            patient['gender'],
+            patient['diagnosis'],
+            patient['admission_date'],
+            patient['created_at']
+        ))
         
         # Show initial patient list
-        self.show_patient_list(patient_tree)
+        self.patient_list = patient_list
+        self.show_patient_list(patient_list)
         
         # Action buttons for selected patient
         action_btn_frame = tk.Frame(self.current_frame, bg=self.colors["light"])
@@ -305,23 +878,21 @@ class HospitalApp:
             relief="flat"
         )
         btn_print.pack(side="left", padx=10)
+        
+        btn_batch = tk.Button(
+            action_btn_frame,
+            text="Batch Receipts...",
+            command=self.open_batch_receipts,
+            font=self.font_small,
+            bg=self.colors["purple"],
+            fg="white",
+            relief="flat"
+        )
+        btn_batch.pack(side="left", padx=10)
 
-    def show_patient_list(self, tree, search_term=None, search_by_id=False):
+    def show_patient_list(self, patient_list, search_term=None, search_by_id=False):
         """Populate patient treeview"""
-        for item in tree.get_children():
-            tree.delete(item)
-            
-        patients = get_patients(search_term, search_by_id)
-        for patient in patients:
-            tree.insert("", "end", values=(
-                patient['id'],
-                patient['name'],
-                patient['age'],
-                patient['gender'],
-                patient['diagnosis'],
-                patient['admission_date'],
-                patient['created_at']
-            ))
+        patient_list.load(lambda **page: get_patients(search_term, search_by_id, **page, row_format='record'))
 
     def open_patient_form(self, patient_id=None):
         """Open patient form for adding/editing"""
@@ -350,7 +921,11 @@ class HospitalApp:
         
         # Pre-fill for edit
         if patient_id:
-            patient = next(p for p in get_patients() if p['id'] == patient_id)
+            patient = get_patient_by_id(patient_id)
+            if patient is None:
+                messagebox.showerror("Error", "This patient no longer exists")
+                form.destroy()
+                return
             fields[0][2].insert(0, patient['name'])
             fields[1][2].insert(0, patient['age'])
             fields[2][2].set(patient['gender'])
@@ -374,12 +949,13 @@ class HospitalApp:
                 if patient_id:
                     update_patient(patient_id, **data)
                     messagebox.showinfo("Success", "Patient updated successfully!")
+                    saved_id = patient_id
                 else:
-                    insert_patient(**data)
+                    saved_id = insert_patient(**data)
                     messagebox.showinfo("Success", "Patient added successfully!")
                 
                 form.destroy()
-                self.show_patient_management()
+                self.refresh_list(self.patient_list, select=saved_id)
             except ValueError as e:
                 messagebox.showerror("Error", str(e))
         
@@ -414,7 +990,7 @@ class HospitalApp:
         if messagebox.askyesno("Confirm", "Are you sure you want to delete this patient?"):
             if delete_patient(patient_id):
                 messagebox.showinfo("Success", "Patient deleted successfully")
-                self.show_patient_management()
+                self.refresh_list(self.patient_list)
             else:
                 messagebox.showerror("Error", "Failed to delete patient")
 
@@ -428,41 +1004,13 @@ class HospitalApp:
         patient_id = tree.item(selected[0])['values'][0]
         patient = get_patient_by_id(patient_id)
         appointments = get_patient_appointments(patient_id)
-        
-        # Create receipt content
-        receipt = f"""
-        HOSPITAL MANAGEMENT SYSTEM
-        --------------------------
-        PATIENT RECEIPT
-        --------------------------
-        Patient ID: {patient['id']}
-        Name: {patient['name']}
-        Age: {patient['age']}
-        Gender: {patient['gender']}
-        Admission Date: {patient['admission_date']}
-        Diagnosis: {patient['diagnosis']}
-        
-        APPOINTMENTS:
-        """
-        
-        for appt in appointments:
-            receipt += f"""
-            - Appointment with Dr. {appt['doctor_name']} ({appt['specialization']})
-              Date: {appt['appointment_date']}
-              Time: {appt['start_time']} - {appt['end_time']}
-              Notes: {appt['notes']}
-            """
-        
-        receipt += """
-        --------------------------
-        Thank you for choosing our hospital!
-        """
+        receipt = receipts.render_receipt(patient, appointments)
         
         # Ask for save location
         file_path = filedialog.asksaveasfilename(
             defaultextension=".txt",
             filetypes=[("Text Files", "*.txt"), ("All Files", "*.*")],
-            initialfile=f"patient_{patient_id}_receipt.txt"
+            initialfile=receipts.receipt_filename(patient)
         )
         
         if file_path:
@@ -473,6 +1021,146 @@ class HospitalApp:
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to save receipt:\n{str(e)}")
 
+    def open_batch_receipts(self):
+        """Generate receipts for every patient admitted or seen in a date range"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Batch Receipts")
+        dialog.geometry("480x300")
+        dialog.config(bg=self.colors["light"])
+        
+        form_frame = tk.Frame(dialog, bg=self.colors["light"])
+        form_frame.pack(fill="x", padx=10, pady=10)
+        
+        today = datetime.now()
+        mode_var = tk.StringVar(value="appointments")
+        date_from_var = tk.StringVar(value=today.replace(day=1).strftime("%Y-%m-%d"))
+        date_to_var = tk.StringVar(value=today.strftime("%Y-%m-%d"))
+        
+        for i, (text, value) in enumerate((("Patients with appointments", "appointments"),
+                                           ("Patients admitted", "admitted"))):
+            tk.Radiobutton(
+                form_frame,
+                text=text,
+                variable=mode_var,
+                value=value,
+                bg=self.colors["light"],
+                font=self.font_small
+            ).grid(row=0, column=i * 2, columnspan=2, padx=5, pady=5, sticky="w")
+        
+        for i, (label, variable) in enumerate((("From (YYYY-MM-DD):", date_from_var), ("To:", date_to_var))):
+            tk.Label(
+                form_frame,
+                text=label,
+                bg=self.colors["light"],
+                fg=self.colors["dark"],
+                font=self.font_small
+            ).grid(row=1, column=i * 2, padx=5, pady=5, sticky="e")
+            tk.Entry(form_frame, textvariable=variable, font=self.font_small, width=12).grid(
+                row=1, column=i * 2 + 1, padx=5, pady=5, sticky="w")
+        
+        progress = ttk.Progressbar(dialog, orient="horizontal", length=440, mode="determinate")
+        progress.pack(padx=10, pady=10)
+        status_label = tk.Label(dialog, text="", bg=self.colors["light"], fg=self.colors["dark"],
+                                font=self.font_small)
+        status_label.pack()
+        
+        button_frame = tk.Frame(dialog, bg=self.colors["light"])
+        button_frame.pack(pady=10)
+        cancel = threading.Event()
+        state = {'progress': None, 'result': None, 'error': None}
+        
+        def report(done, total):
+            state['progress'] = (done, total)  # Read by poll() on the Tk thread
+        
+        def run(output, filters):
+            try:
+                state['result'] = receipts.generate_receipts(output, progress=report, cancel=cancel, **filters)
+            except Exception as e:
+                state['error'] = e
+        
+        def poll():
+            if not dialog.winfo_exists():
+                return
+            if state['progress']:
+                done, total = state['progress']
+                progress.configure(maximum=max(total, 1), value=done)
+                status_label.config(text=f"{done} of {total} receipts")
+            if state['result'] is None and state['error'] is None:
+                dialog.after(100, poll)
+                return
+            
+            for button in generate_buttons:
+                button.config(state="normal")
+            if state['error'] is not None:
+                messagebox.showerror("Error", f"Failed to generate receipts:\n{state['error']}", parent=dialog)
+            elif state['result']['cancelled']:
+                status_label.config(text=f"Cancelled after {state['result']['receipts']} receipts")
+            else:
+                result = state['result']
+                status_label.config(text=f"{result['receipts']} receipts in {result['seconds']:.1f}s")
+        
+        def generate(to_zip):
+            key = "appointments" if mode_var.get() == "appointments" else "admitted"
+            filters = {f"{key}_from": date_from_var.get().strip() or None,
+                       f"{key}_to": date_to_var.get().strip() or None}
+            try:
+                for value in filters.values():
+                    if value:
+                        datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                messagebox.showerror("Error", "Dates must be in YYYY-MM-DD format", parent=dialog)
+                return
+            
+            if to_zip:
+                output = filedialog.asksaveasfilename(parent=dialog, defaultextension=".zip",
+                                                      filetypes=[("Zip Files", "*.zip")],
+                                                      initialfile="receipts.zip")
+                if output and os.path.exists(output):
+                    os.remove(output)  # The save dialog already confirmed overwriting
+            else:
+                output = filedialog.askdirectory(parent=dialog, mustexist=False)
+            if not output:
+                return
+            
+            cancel.clear()
+            state.update(progress=None, result=None, error=None)
+            for button in generate_buttons:
+                button.config(state="disabled")
+            status_label.config(text="Selecting patients...")
+            threading.Thread(target=run, args=(output, filters), name="receipts", daemon=True).start()
+            dialog.after(100, poll)
+        
+        def close():
+            cancel.set()
+            dialog.destroy()
+        
+        generate_buttons = []
+        for text, to_zip, color in (("Save as Zip...", True, self.colors["primary"]),
+                                    ("Save to Folder...", False, self.colors["accent"])):
+            button = tk.Button(
+                button_frame,
+                text=text,
+                command=lambda to_zip=to_zip: generate(to_zip),
+                font=self.font_small,
+                bg=color,
+                fg="white",
+                relief="flat"
+            )
+            button.pack(side="left", padx=5)
+            generate_buttons.append(button)
+        
+        tk.Button(
+            button_frame,
+            text="Cancel",
+            command=cancel.set,
+            font=self.font_small,
+            bg=self.colors["danger"],
+            fg="white",
+            relief="flat"
+        ).pack(side="left", padx=5)
+        
+        dialog.protocol("WM_DELETE_WINDOW", close)
+
     def show_doctor_management(self):
         """Show doctor management page"""
         self.clear_frame()
@@ -512,7 +1200,7 @@ class HospitalApp:
         btn_refresh = tk.Button(
             action_frame,
             text="Refresh List",
-            command=lambda: self.show_doctor_list(doctor_tree),
+            command=lambda: self.show_doctor_list(doctor_list),
             font=self.font_small,
             bg=self.colors["secondary"],
             fg="white",
@@ -536,7 +1224,7 @@ class HospitalApp:
         btn_search = tk.Button(
             search_frame,
             text="Search",
-            command=lambda: self.show_doctor_list(doctor_tree, self.doctor_search_var.get()),
+            command=lambda: self.show_doctor_list(doctor_list, self.doctor_search_var.get()),
             font=self.font_small,
             bg=self.colors["accent"],
             fg="white",
@@ -547,7 +1235,7 @@ class HospitalApp:
         btn_search_id = tk.Button(
             search_frame,
             text="Search by ID",
-            command=lambda: self.show_doctor_list(doctor_tree, self.doctor_search_var.get(), True),
+            command=lambda: self.show_doctor_list(doctor_list, self.doctor_search_var.get(), True),
             font=self.font_small,
             bg=self.colors["purple"],
             fg="white",
@@ -579,13 +1267,20 @@ class HospitalApp:
         doctor_tree.column("Gender", width=80, anchor="center")
         
         # Add scrollbar
-        scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=doctor_tree.yview)
-        doctor_tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar = ttk.Scrollbar(list_frame, orient="vertical")
         scrollbar.pack(side="right", fill="y")
         doctor_tree.pack(side="left", fill="both", expand=True)
+        doctor_list = VirtualTreeList(doctor_tree, scrollbar, tasks=self.tasks, to_values=lambda doctor: (
+            doctor['id'],
+            doctor['name'],
+            doctor['specialization'],
+            doctor['experience'],
+            doctor['gender']
+        ))
         
         # Show initial doctor list
-        self.show_doctor_list(doctor_tree)
+        self.doctor_list = doctor_list
+        self.show_doctor_list(doctor_list)
         
         # Action buttons for selected doctor
         action_btn_frame = tk.Frame(self.current_frame, bg=self.colors["light"])
@@ -613,20 +1308,9 @@ class HospitalApp:
         )
         btn_delete.pack(side="left", padx=10)
 
-    def show_doctor_list(self, tree, search_term=None, search_by_id=False):
+    def show_doctor_list(self, doctor_list, search_term=None, search_by_id=False):
         """Populate doctor treeview"""
-        for item in tree.get_children():
-            tree.delete(item)
-            
-        doctors = get_doctors(search_term, search_by_id)
-        for doctor in doctors:
-            tree.insert("", "end", values=(
-                doctor['id'],
-                doctor['name'],
-                doctor['specialization'],
-                doctor['experience'],
-                doctor['gender']
-            ))
+        doctor_list.load(lambda **page: get_doctors(search_term, search_by_id, **page, row_format='record'))
 
     def open_doctor_form(self, doctor_id=None):
         """Open doctor form for adding/editing"""
@@ -655,7 +1339,11 @@ class HospitalApp:
         
         # Pre-fill for edit
         if doctor_id:
-            doctor = next(d for d in get_doctors() if d['id'] == doctor_id)
+            doctor = get_doctor_by_id(doctor_id)
+            if doctor is None:
+                messagebox.showerror("Error", "This doctor no longer exists")
+                form.destroy()
+                return
             fields[0][2].insert(0, doctor['name'])
             fields[1][2].insert(0, doctor['specialization'])
             fields[2][2].insert(0, doctor['experience'])
@@ -679,12 +1367,13 @@ class HospitalApp:
                 if doctor_id:
                     update_doctor(doctor_id, **data)
                     messagebox.showinfo("Success", "Doctor updated successfully!")
+                    saved_id = doctor_id
                 else:
-                    insert_doctor(**data)
+                    saved_id = insert_doctor(**data)
                     messagebox.showinfo("Success", "Doctor added successfully!")
                 
                 form.destroy()
-                self.show_doctor_management()
+                self.refresh_list(self.doctor_list, select=saved_id)
             except ValueError as e:
                 messagebox.showerror("Error", str(e))
         
@@ -719,7 +1408,7 @@ class HospitalApp:
         if messagebox.askyesno("Confirm", "Are you sure you want to delete this doctor?"):
             if delete_doctor(doctor_id):
                 messagebox.showinfo("Success", "Doctor deleted successfully")
-                self.show_doctor_management()
+                self.refresh_list(self.doctor_list)
             else:
                 messagebox.showerror("Error", "Failed to delete doctor")
 
@@ -762,7 +1451,7 @@ class HospitalApp:
         btn_refresh = tk.Button(
             action_frame,
             text="Refresh List",
-            command=lambda: self.show_appointment_list(appointment_tree),
+            command=lambda: self.show_appointment_list(appointment_list),
             font=self.font_small,
             bg=self.colors["secondary"],
             fg="white",
@@ -795,7 +1484,7 @@ class HospitalApp:
         btn_filter = tk.Button(
             filter_frame,
             text="Apply Filter",
-            command=lambda: self.show_appointment_list(appointment_tree, self.appointment_date_var.get()),
+            command=lambda: self.show_appointment_list(appointment_list, self.appointment_date_var.get()),
             font=self.font_small,
             bg=self.colors["accent"],
             fg="white",
@@ -819,7 +1508,7 @@ class HospitalApp:
         btn_search = tk.Button(
             search_frame,
             text="Search",
-            command=lambda: self.show_appointment_list(appointment_tree, search_term=self.appointment_search_var.get()),
+            command=lambda: self.show_appointment_list(appointment_list, search_term=self.appointment_search_var.get()),
             font=self.font_small,
             bg=self.colors["accent"],
             fg="white",
@@ -830,7 +1519,7 @@ class HospitalApp:
         btn_search_id = tk.Button(
             search_frame,
             text="Search by ID",
-            command=lambda: self.show_appointment_list(appointment_tree, search_term=self.appointment_search_var.get(), search_by_id=True),
+            command=lambda: self.show_appointment_list(appointment_list, search_term=self.appointment_search_var.get(), search_by_id=True),
             font=self.font_small,
             bg=self.colors["purple"],
             fg="white",
@@ -864,13 +1553,21 @@ class HospitalApp:
         appointment_tree.column("Notes", width=200)
         
         # Add scrollbar
-        scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=appointment_tree.yview)
-        appointment_tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar = ttk.Scrollbar(list_frame, orient="vertical")
         scrollbar.pack(side="right", fill="y")
         appointment_tree.pack(side="left", fill="both", expand=True)
+        appointment_list = VirtualTreeList(appointment_tree, scrollbar, tasks=self.tasks, to_values=lambda appt: (
+            appt['id'],
+            appt['patient_name'],
+            appt['doctor_name'],
+            appt['appointment_date'],
+            f"{appt['start_time']} - {appt['end_time']}",
+            appt['notes']
+        ))
         
         # Show initial appointment list
-        self.show_appointment_list(appointment_tree)
+        self.appointment_list = appointment_list
+        self.show_appointment_list(appointment_list)
         
         # Action buttons for selected appointment
         action_btn_frame = tk.Frame(self.current_frame, bg=self.colors["light"])
@@ -887,45 +1584,33 @@ class HospitalApp:
         )
         btn_delete.pack(side="left", padx=10)
 
-    def show_appointment_list(self, tree, date=None, search_term=None, search_by_id=False):
+    def show_appointment_list(self, appointment_list, date=None, search_term=None, search_by_id=False):
         """Populate appointment treeview"""
-        for item in tree.get_children():
-            tree.delete(item)
-            
-        appointments = get_appointments(date=date, search_term=search_term, search_by_id=search_by_id)
-        for appt in appointments:
-            tree.insert("", "end", values=(
-                appt['id'],
-                appt['patient_name'],
-                appt['doctor_name'],
-                appt['appointment_date'],
-                f"{appt['start_time']} - {appt['end_time']}",
-                appt['notes']
-            ))
+        appointment_list.load(lambda **page: get_appointments(
+            date=date, search_term=search_term, search_by_id=search_by_id, **page, row_format='record'))
 
     def open_appointment_form(self):
         """Open appointment scheduling form"""
         form = tk.Toplevel(self.root)
         form.title("Schedule New Appointment")
-        form.geometry("500x500")
+        form.geometry("500x580")
         form.config(bg=self.colors["light"])
         
-        # Get patients and doctors
-        patients = get_patients()
-        doctors = get_doctors()
-        
-        if not patients or not doctors:
-            messagebox.showwarning("Warning", "No patients or doctors available")
-            form.destroy()
-            return
-        
         # Form fields
         fields = [
-            ("Patient:", "patient", ttk.Combobox(form, values=[f"{p['id']} - {p['name']}" for p in patients], state="readonly", font=self.font_small)),
-            ("Doctor:", "doctor", ttk.Combobox(form, values=[f"{d['id']} - {d['name']} ({d['specialization']})" for d in doctors], state="readonly", font=self.font_small)),
+            ("Patient:", "patient", TypeAheadPicker(form, search_patient_names,
+                                                    lambda p: f"{p['id']} - {p['name']}",
+                                                    self.tasks, font=self.font_small)),
+            ("Doctor:", "doctor", TypeAheadPicker(form, search_doctor_names,
+                                                  lambda d: f"{d['id']} - {d['name']} ({d['specialization']})",
+                                                  self.tasks, font=self.font_small,
+                                                  on_select=lambda d: update_time_slots())),
             ("Date:", "date", tk.Entry(form, font=self.font_small)),
             ("Time Slot:", "time_slot", ttk.Combobox(form, state="readonly", font=self.font_small)),
-            ("Notes:", "notes", tk.Text(form, font=self.font_small, height=5, width=30))
+            ("Notes:", "notes", tk.Text(form, font=self.font_small, height=5, width=30)),
+            ("Repeat:", "repeat", ttk.Combobox(form, state="readonly", font=self.font_small,
+                                               values=list(self.REPEAT_RULES))),
+            ("Occurrences:", "count", tk.Spinbox(form, from_=2, to=52, font=self.font_small))
         ]
         
         for i, (label, _, widget) in enumerate(fields):
@@ -940,42 +1625,65 @@ class HospitalApp:
         
         # Set default date
         fields[2][2].insert(0, datetime.now().strftime("%Y-%m-%d"))
+        fields[5][2].current(0)
+        fields[6][2].delete(0, tk.END)
+        fields[6][2].insert(0, "12")
+        
+        fields[0][2].entry.focus_set()
         
         # Function to update time slots when doctor or date changes
         def update_time_slots():
+            doctor_id = fields[1][2].selected_id()
+            date = fields[2][2].get()
             try:
-                doctor_id = int(fields[1][2].get().split(" - ")[0])
-                date = fields[2][2].get()
                 datetime.strptime(date, "%Y-%m-%d")  # Validate date
-                
-                time_slots = get_available_time_slots(doctor_id, date)
+            except ValueError:
+                return
+            if doctor_id is None:
+                return
+            
+            def show_slots(time_slots):
                 fields[3][2]['values'] = [f"{slot[0]} - {slot[1]}" for slot in time_slots]
                 if time_slots:
                     fields[3][2].current(0)
-            except (ValueError, IndexError):
-                pass
+                else:
+                    fields[3][2].set("")
+            
+            fields[3][2].set("Loading...")
+            self.tasks.submit(get_available_time_slots, doctor_id, date, key=(form, "slots"), owner=form,
+                              on_success=show_slots, on_error=lambda e: fields[3][2].set(""))
         
-        fields[1][2].bind("<<ComboboxSelected>>", lambda e: update_time_slots())
         fields[2][2].bind("<FocusOut>", lambda e: update_time_slots())
         
         # Submit button
         def submit():
             try:
-                patient_id = int(fields[0][2].get().split(" - ")[0])
-                doctor_id = int(fields[1][2].get().split(" - ")[0])
+                patient_id = fields[0][2].selected_id()
+                doctor_id = fields[1][2].selected_id()
+                if patient_id is None or doctor_id is None:
+                    raise ValueError("Please choose a patient and a doctor from the list")
                 date = fields[2][2].get()
                 time_range = fields[3][2].get()
                 notes = fields[4][2].get("1.0", tk.END).strip()
                 
-                if not time_range:
+                if " - " not in time_range:
                     raise ValueError("Please select a time slot")
                 
                 start_time, end_time = time_range.split(" - ")
                 
-                schedule_appointment(patient_id, doctor_id, date, start_time, end_time, notes)
-                messagebox.showinfo("Success", "Appointment scheduled successfully!")
+                rule = self.REPEAT_RULES[fields[5][2].get()]
+                if rule:
+                    count = int(fields[6][2].get())
+                    series = schedule_appointment_series(patient_id, doctor_id, date, start_time, end_time,
+                                                         f"{rule};COUNT={count}", notes)
+                    if not self.show_series_result(series, count):
+                        return
+                    appointment_id = series['booked'][0]['id']
+                else:
+                    appointment_id = schedule_appointment(patient_id, doctor_id, date, start_time, end_time, notes)
+                    messagebox.showinfo("Success", "Appointment scheduled successfully!")
                 form.destroy()
-                self.show_appointment_scheduling()
+                self.refresh_list(self.appointment_list, select=appointment_id)
             except ValueError as e:
                 messagebox.showerror("Error", str(e))
         
@@ -988,6 +1696,162 @@ class HospitalApp:
             fg="white",
             relief="flat"
         ).grid(row=len(fields), column=1, pady=10, sticky="e")
+        
+        # Let the earliest-slot search fill in doctor, date and time
+        def use_slot(slot):
+            fields[1][2].set(f"{slot['doctor_id']} - {slot['doctor_name']} ({slot['specialization']})")
+            fields[2][2].delete(0, tk.END)
+            fields[2][2].insert(0, slot['date'])
+            time_range = f"{slot['start_time']} - {slot['end_time']}"
+            fields[3][2]['values'] = [time_range]
+            fields[3][2].set(time_range)
+        
+        tk.Button(
+            form,
+            text="Find Earliest Slot...",
+            command=lambda: self.open_earliest_slot_search(use_slot),
+            font=self.font_small,
+            bg=self.colors["secondary"],
+            fg="white",
+            relief="flat"
+        ).grid(row=len(fields), column=0, padx=10, pady=10, sticky="w")
+
+    # Repeat choices of the appointment form and their recurrence rules
+    REPEAT_RULES = {
+        "Does not repeat": None,
+        "Daily": "FREQ=DAILY",
+        "Weekly": "FREQ=WEEKLY",
+        "Every 2 weeks": "FREQ=WEEKLY;INTERVAL=2",
+        "Monthly": "FREQ=MONTHLY",
+    }
+
+    def show_series_result(self, series, requested):
+        """Report which occurrences of a series were booked; False if none were"""
+        lines = []
+        for conflict in series['conflicts'][:10]:
+            alternatives = ", ".join(slot['start_time'] for slot in conflict['alternatives'])
+            lines.append(f"  {conflict['date']}: taken" + (f" (free at {alternatives})" if alternatives else
+                                                             " (no free time that day)"))
+        if len(series['conflicts']) > 10:
+            lines.append(f"  ... and {len(series['conflicts']) - 10} more")
+        
+        if series['series_id'] is None:
+            messagebox.showerror("Error", "None of the appointments could be booked:\n" + "\n".join(lines))
+            return False
+        message = f"Booked {len(series['booked'])} of {requested} appointments."
+        if lines:
+            message += "\n\nSkipped because the time is taken:\n" + "\n".join(lines)
+            messagebox.showwarning("Series Scheduled", message)
+        else:
+            messagebox.showinfo("Success", message)
+        return True
+
+    def open_earliest_slot_search(self, on_pick):
+        """Search the first free slots across doctors and dates; on_pick(slot) receives the chosen one"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Find Earliest Slot")
+        dialog.geometry("650x450")
+        dialog.config(bg=self.colors["light"])
+        
+        criteria_frame = tk.Frame(dialog, bg=self.colors["light"])
+        criteria_frame.pack(fill="x", padx=10, pady=10)
+        
+        today = datetime.now()
+        specialization_var = tk.StringVar(value="Any")
+        date_from_var = tk.StringVar(value=today.strftime("%Y-%m-%d"))
+        date_to_var = tk.StringVar(value=(today + timedelta(days=30)).strftime("%Y-%m-%d"))
+        duration_var = tk.StringVar(value="30")
+        
+        specialization_box = ttk.Combobox(criteria_frame, textvariable=specialization_var, state="readonly", width=18)
+        criteria = [
+            ("Specialization:", specialization_box),
+            ("From:", tk.Entry(criteria_frame, textvariable=date_from_var, font=self.font_small, width=11)),
+            ("To:", tk.Entry(criteria_frame, textvariable=date_to_var, font=self.font_small, width=11)),
+            ("Minutes:", ttk.Combobox(criteria_frame, textvariable=duration_var, state="readonly", width=4,
+                                      values=("15", "30", "45", "60"))),
+        ]
+        for i, (label, widget) in enumerate(criteria):
+            tk.Label(
+                criteria_frame,
+                text=label,
+                bg=self.colors["light"],
+                fg=self.colors["dark"],
+                font=self.font_small
+            ).grid(row=i // 2, column=(i % 2) * 2, padx=5, pady=5, sticky="e")
+            widget.grid(row=i // 2, column=(i % 2) * 2 + 1, padx=5, pady=5, sticky="w")
+        
+        self.tasks.submit(get_specializations, owner=dialog,
+                          on_success=lambda names: specialization_box.configure(values=["Any"] + names))
+        
+        # Results
+        result_tree = ttk.Treeview(
+            dialog,
+            columns=("Date", "Time", "Doctor", "Specialization"),
+            show="headings"
+        )
+        for column in ("Date", "Time", "Doctor", "Specialization"):
+            result_tree.heading(column, text=column)
+        result_tree.pack(fill="both", expand=True, padx=10, pady=5)
+        results = {}
+        
+        def show_results(slots):
+            result_tree.delete(*result_tree.get_children())
+            results.clear()
+            for i, slot in enumerate(slots):
+                results[str(i)] = slot
+                result_tree.insert("", "end", iid=str(i), values=(
+                    slot['date'],
+                    f"{slot['start_time']} - {slot['end_time']}",
+                    slot['doctor_name'],
+                    slot['specialization']
+                ))
+            if not slots:
+                messagebox.showinfo("No Slots", "No free slots match these criteria", parent=dialog)
+        
+        def search():
+            specialization = specialization_var.get()
+            options = {
+                'duration_minutes': int(duration_var.get()),
+                'date_from': date_from_var.get().strip(),
+                'date_to': date_to_var.get().strip(),
+                'specialization': None if specialization == "Any" else specialization,
+                'limit': 20,
+            }
+            
+            def show_error(error):
+                result_tree.delete(*result_tree.get_children())
+                messagebox.showerror("Error", str(error), parent=dialog)
+            
+            result_tree.delete(*result_tree.get_children())
+            result_tree.insert("", "end", iid="loading", values=("Searching...",))
+            self.tasks.submit(find_earliest_slots, key=(dialog, "search"), owner=dialog,
+                              on_success=show_results, on_error=show_error, **options)
+        
+        def use_slot():
+            selected = result_tree.selection()
+            if not selected or selected[0] not in results:
+                messagebox.showwarning("Warning", "Please select a slot", parent=dialog)
+                return
+            on_pick(results[selected[0]])
+            dialog.destroy()
+        
+        result_tree.bind("<Double-1>", lambda e: use_slot())
+        
+        button_frame = tk.Frame(dialog, bg=self.colors["light"])
+        button_frame.pack(fill="x", padx=10, pady=10)
+        for text, command, color in (("Search", search, self.colors["accent"]),
+                                     ("Use Slot", use_slot, self.colors["primary"])):
+            tk.Button(
+                button_frame,
+                text=text,
+                command=command,
+                font=self.font_small,
+                bg=color,
+                fg="white",
+                relief="flat"
+            ).pack(side="right", padx=5)
+        
+        search()
 
     def delete_appointment(self, tree):
         """Delete selected appointment"""
@@ -1000,7 +1864,7 @@ class HospitalApp:
         if messagebox.askyesno("Confirm", "Are you sure you want to delete this appointment?"):
             if delete_appointment(appointment_id):
                 messagebox.showinfo("Success", "Appointment deleted successfully")
-                self.show_appointment_scheduling()
+                self.refresh_list(self.appointment_list)
             else:
                 messagebox.showerror("Error", "Failed to delete appointment")
 
@@ -1029,26 +1893,16 @@ class HospitalApp:
         stats_frame = tk.Frame(self.current_frame, bg=self.colors["light"])
         stats_frame.pack(fill="x", pady=20, padx=20)
         
-        # Get counts
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM patients")
-            patient_count = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT COUNT(*) FROM doctors")
-            doctor_count = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT COUNT(*) FROM appointments")
-            appointment_count = cursor.fetchone()[0]
-        
-        # Create stat cards
+        # Create stat cards; counts are filled in once loaded
         stat_cards = [
-            ("Patients", patient_count, self.colors["primary"]),
-            ("Doctors", doctor_count, self.colors["secondary"]),
-            ("Appointments", appointment_count, self.colors["accent"])
+            ("Patients", "patients", self.colors["primary"]),
+            ("Doctors", "doctors", self.colors["secondary"]),
+            ("Appointments", "appointments", self.colors["accent"]),
+            ("Today", "today", self.colors["purple"])
         ]
+        count_labels = {}
         
-        for i, (title, count, color) in enumerate(stat_cards):
+        for i, (title, table, color) in enumerate(stat_cards):
             card = tk.Frame(stats_frame, bg=color, bd=2, relief="groove")
             card.grid(row=0, column=i, padx=10, sticky="nsew")
             
@@ -1060,117 +1914,132 @@ class HospitalApp:
                 fg="white"
             ).pack(pady=(10, 0), padx=20)
             
-            tk.Label(
+            count_labels[table] = tk.Label(
                 card,
-                text=str(count),
+                text="...",
                 font=("Helvetica", 24, "bold"),
                 bg=color,
                 fg="white"
-            ).pack(pady=(0, 10))
+            )
+            count_labels[table].pack(pady=(0, 10))
+        
+        def show_counts(counts):
+            for table, label in count_labels.items():
+                label.config(text=str(counts[table]))
+        
+        def load_counts():
+            counts = get_record_counts()
+            today = datetime.now().strftime("%Y-%m-%d")
+            counts["today"] = get_appointment_counts_by_day(today, today).get(today, 0)
+            return counts
+        
+        self.tasks.submit(load_counts, owner=stats_frame, on_success=show_counts)
         
         # Recent activity
         activity_frame = tk.Frame(self.current_frame, bg=self.colors["light"])
         activity_frame.pack(fill="both", expand=True, padx=20, pady=10)
         
-        # Create notebook for different views
+        # Create notebook for different views; each tab loads the first time it is opened
         notebook = ttk.Notebook(activity_frame)
         notebook.pack(fill="both", expand=True)
+        tab_loaders = {}
         
-        # Patients tab
-        patient_tab = ttk.Frame(notebook)
-        notebook.add(patient_tab, text="Patients")
-        
-        patient_tree = ttk.Treeview(
-            patient_tab,
-            columns=("ID", "Name", "Age", "Gender", "Diagnosis", "Admission Date"),
-            show="headings"
-        )
-        
-        patient_tree.heading("ID", text="ID")
-        patient_tree.heading("Name", text="Name")
-        patient_tree.heading("Age", text="Age")
-        patient_tree.heading("Gender", text="Gender")
-        patient_tree.heading("Diagnosis", text="Diagnosis")
-        patient_tree.heading("Admission Date", text="Admission Date")
-        
-        for patient in get_patients():
-            patient_tree.insert("", "end", values=(
-                patient['id'],
-                patient['name'],
-                patient['age'],
-                patient['gender'],
-                patient['diagnosis'],
-                patient['admission_date']
-            ))
+        def add_tab(title, columns, fetch_page, to_values):
+            tab = ttk.Frame(notebook)
+            notebook.add(tab, text=title)
+            
+            tree = ttk.Treeview(tab, columns=columns, show="headings")
+            for column in columns:
+                tree.heading(column, text=column)
+            
+            scrollbar = ttk.Scrollbar(tab, orient="vertical")
+            scrollbar.pack(side="right", fill="y", pady=10)
+            tree.pack(fill="both", expand=True, padx=10, pady=10)
+            
+            view = VirtualTreeList(tree, scrollbar, to_values, self.tasks)
+            tab_loaders[str(tab)] = lambda: view.load(fetch_page)
         
-        patient_tree.pack(fill="both", expand=True, padx=10, pady=10)
+        # Patients tab
+        add_tab("Patients", ("ID", "Name", "Age", "Gender", "Diagnosis", "Admission Date"),
+                lambda **page: get_patients(**page, row_format='record'),
+                lambda patient: (
+                    patient['id'],
+                    patient['name'],
+                    patient['age'],
+                    patient['gender'],
+                    patient['diagnosis'],
+                    patient['admission_date']
+                ))
         
         # Doctors tab
-        doctor_tab = ttk.Frame(notebook)
-        notebook.add(doctor_tab, text="Doctors")
-        
-        doctor_tree = ttk.Treeview(
-            doctor_tab,
-            columns=("ID", "Name", "Specialization", "Experience", "Gender"),
-            show="headings"
-        )
-        
-        doctor_tree.heading("ID", text="ID")
-        doctor_tree.heading("Name", text="Name")
-        doctor_tree.heading("Specialization", text="Specialization")
-        doctor_tree.heading("Experience", text="Experience")
-        doctor_tree.heading("Gender", text="Gender")
-        
-        for doctor in get_doctors():
-            doctor_tree.insert("", "end", values=(
-                doctor['id'],
-                doctor['name'],
-                doctor['specialization'],
-                doctor['experience'],
-                doctor['gender']
-            ))
-        
-        doctor_tree.pack(fill="both", expand=True, padx=10, pady=10)
+        add_tab("Doctors", ("ID", "Name", "Specialization", "Experience", "Gender"),
+                lambda **page: get_doctors(**page, row_format='record'),
+                lambda doctor: (
+                    doctor['id'],
+                    doctor['name'],
+                    doctor['specialization'],
+                    doctor['experience'],
+                    doctor['gender']
+                ))
         
         # Appointments tab
-        appt_tab = ttk.Frame(notebook)
-        notebook.add(appt_tab, text="Appointments")
-        
-        appt_tree = ttk.Treeview(
-            appt_tab,
-            columns=("ID", "Patient", "Doctor", "Date", "Time", "Notes"),
-            show="headings"
-        )
-        
-        appt_tree.heading("ID", text="ID")
-        appt_tree.heading("Patient", text="Patient")
-        appt_tree.heading("Doctor", text="Doctor")
-        appt_tree.heading("Date", text="Date")
-        appt_tree.heading("Time", text="Time")
-        appt_tree.heading("Notes", text="Notes")
-        
-        for appt in get_appointments():
-            appt_tree.insert("", "end", values=(
-                appt['id'],
-                appt['patient_name'],
-                appt['doctor_name'],
-                appt['appointment_date'],
-                f"{appt['start_time']} - {appt['end_time']}",
-                appt['notes']
-            ))
-        
-        appt_tree.pack(fill="both", expand=True, padx=10, pady=10)
+        add_tab("Appointments", ("ID", "Patient", "Doctor", "Date", "Time", "Notes"),
+                lambda **page: get_appointments(**page, row_format='record'),
+                lambda appt: (
+                    appt['id'],
+                    appt['patient_name'],
+                    appt['doctor_name'],
+                    appt['appointment_date'],
+                    f"{appt['start_time']} - {appt['end_time']}",
+                    appt['notes']
+                ))
+        
+        # Appointments per doctor, read from the statistics table
+        workload_tab = ttk.Frame(notebook)
+        notebook.add(workload_tab, text="Workload")
+        workload_tree = ttk.Treeview(workload_tab, columns=("Doctor", "Appointments"), show="headings")
+        workload_tree.heading("Doctor", text="Doctor")
+        workload_tree.heading("Appointments", text="Appointments")
+        workload_tree.pack(fill="both", expand=True, padx=10, pady=10)
+        
+        def show_workload(rows):
+            for row in rows:
+                workload_tree.insert("", "end", iid=str(row['doctor_id']),
+                                     values=(row['doctor_name'], row['total']))
+        
+        tab_loaders[str(workload_tab)] = lambda: self.tasks.submit(
+            get_appointment_counts_by_doctor, owner=workload_tree, on_success=show_workload)
+        
+        def on_tab_changed(event):
+            load = tab_loaders.pop(notebook.select(), None)
+            if load:
+                load()
+        
+        notebook.bind("<<NotebookTabChanged>>", on_tab_changed)
+        on_tab_changed(None)  # The first tab is selected before the binding exists
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Receipt workers re-launch the frozen executable
+    instrumentation.enable_from_environment()
     root = tk.Tk()
     
-    # First show welcome screen
-    def start_main_app():
-        new_root = tk.Tk()
-        app = HospitalApp(new_root)
-        new_root.mainloop()
-
+    # First show welcome screen while the database is prepared, then reuse its window
+    def start_main_app(preloaded):
+        startup_profile.mark("initialized")
+        HospitalApp(root, recent_activity=preloaded.get("recent_activity"))
+        
+        def first_paint():
+            startup_profile.mark("first_paint")
+            startup_profile.write_report()
+        
+        root.after_idle(first_paint)
     
-    welcome = WelcomeScreen(root, start_main_app)
-    root.mainloop()
\ No newline at end of file
+    welcome = WelcomeScreen(root, start_main_app, startup_steps=[
+        ("database", "Opening database", startup_profile.timed("db_init", initialize_database)),
+        ("caches", "Warming caches", startup_profile.timed("warm_up", warm_up)),
+        ("recent_activity", "Loading recent activity",
+         startup_profile.timed("recent_activity", get_recent_activity)),
+    ])
+    root.after_idle(lambda: startup_profile.mark("welcome_paint"))
+    root.mainloop()
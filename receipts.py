@@ -0,0 +1,286 @@
+"""Patient receipts, one at a time or in batches of thousands.
+
+A batch selects patients by admission date range or by appointment date range
+(the receipt then lists only the appointments in that range) and reads them
+together with their appointments in one query, grouped by patient. Receipts
+are rendered in a process pool and streamed into a directory of .txt files
+or a single zip, so memory stays flat however many patients are selected.
+
+Usage:
+    python receipts.py march.zip --appointments-from 2025-03-01 --appointments-to 2025-03-31
+    python receipts.py receipts/ --admitted-from 2025-01-01 --admitted-to 2025-01-31
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import groupby
+
+import database
+
+_PATIENT_COLUMNS = ('id', 'name', 'age', 'gender', 'diagnosis', 'admission_date')
+_APPOINTMENT_COLUMNS = ('appointment_date', 'start_time', 'end_time', 'notes', 'doctor_name', 'specialization')
+
+def render_receipt(patient, appointments):
+    """Receipt text for a patient and their appointments"""
+    lines = [
+        "HOSPITAL MANAGEMENT SYSTEM",
+        "--------------------------",
+        "PATIENT RECEIPT",
+        "--------------------------",
+        f"Patient ID: {patient['id']}",
+        f"Name: {patient['name']}",
+        f"Age: {patient['age']}",
+        f"Gender: {patient['gender']}",
+        f"Admission Date: {patient['admission_date']}",
+        f"Diagnosis: {patient['diagnosis']}",
+        "",
+        "APPOINTMENTS:",
+    ]
+    for appt in appointments:
+        lines.extend((
+            f"  - Appointment with Dr. {appt['doctor_name']} ({appt['specialization']})",
+            f"    Date: {appt['appointment_date']}",
+            f"    Time: {appt['start_time']} - {appt['end_time']}",
+            f"    Notes: {appt['notes']}",
+        ))
+    if not appointments:
+        lines.append("  (none)")
+    lines.extend((
+        "--------------------------",
+        "Thank you for choosing our hospital!",
+        "",
+    ))
+    return "\n".join(lines)
+
+def receipt_filename(patient):
+    return f"patient_{patient['id']}_receipt.txt"
+
+def _render_batch(batch):
+    """Worker: [(patient, appointments)] -> [(filename, encoded receipt)]"""
+    return [(receipt_filename(patient), render_receipt(patient, appointments).encode('utf-8'))
+            for patient, appointments in batch]
+
+# Selection
+def _selection(admitted_from, admitted_to, appointments_from, appointments_to):
+    """FROM/WHERE clause and parameters selecting the receipt rows"""
+    for value in (admitted_from, admitted_to, appointments_from, appointments_to):
+        if value:
+            datetime.strptime(value, '%Y-%m-%d')  # ValueError on bad dates
+    if bool(admitted_from or admitted_to) == bool(appointments_from or appointments_to):
+        raise ValueError("Select patients by admission dates or by appointment dates")
+
+    if appointments_from or appointments_to:
+        # Only patients with appointments in the range, listing just those
+        conditions, params = [], []
+        if appointments_from:
+            conditions.append("a.appointment_day >= ?")
+            params.append(database.to_day(appointments_from))
+        if appointments_to:
+            conditions.append("a.appointment_day <= ?")
+            params.append(database.to_day(appointments_to))
+        return ('''FROM appointments a
+                   JOIN patients p ON p.id = a.patient_id
+                   JOIN doctors d ON d.id = a.doctor_id
+                   WHERE ''' + " AND ".join(conditions)), params, 'DISTINCT a.patient_id'
+
+    conditions, params = [], []
+    if admitted_from:
+        conditions.append("p.admission_date >= ?")
+        params.append(admitted_from)
+    if admitted_to:
+        conditions.append("p.admission_date <= ?")
+        params.append(admitted_to)
+    return ('''FROM patients p
+               LEFT JOIN appointments a ON a.patient_id = p.id
+               LEFT JOIN doctors d ON d.id = a.doctor_id
+               WHERE ''' + " AND ".join(conditions)), params, 'DISTINCT p.id'
+
+def iter_receipt_data(admitted_from=None, admitted_to=None, appointments_from=None, appointments_to=None,
+                      chunk_size=5000, with_total=False):
+    """Yield (patient, appointments) per selected patient, in patient id order
+
+    One query over a consistent snapshot; rows are fetched in chunks and
+    grouped by patient as they arrive. With with_total the number of patients
+    is yielded first, counted in the same snapshot.
+    """
+    source, params, key = _selection(admitted_from, admitted_to, appointments_from, appointments_to)
+    columns = ", ".join([f"p.{column}" for column in _PATIENT_COLUMNS] +
+                        [f"a.{column}" for column in _APPOINTMENT_COLUMNS[:4]] +
+                        ["d.name AS doctor_name", "d.specialization"])
+    query = f'''SELECT {columns} {source}
+                ORDER BY p.id, a.appointment_day, a.start_minute'''
+
+    with database.get_db_connection() as conn:
+        conn.execute('BEGIN')
+        try:
+            cursor = conn.cursor()
+            if with_total:
+                cursor.execute(f"SELECT COUNT({key}) {source}", params)
+                yield cursor.fetchone()[0]
+            cursor.execute(query, params)
+
+            def rows():
+                while True:
+                    chunk = cursor.fetchmany(chunk_size)
+                    if not chunk:
+                        return
+                    yield from chunk
+
+            for _, group in groupby(rows(), key=lambda row: row['id']):
+                group = list(group)
+                patient = {column: group[0][column] for column in _PATIENT_COLUMNS}
+                appointments = [{column: row[column] for column in _APPOINTMENT_COLUMNS}
+                                for row in group if row['appointment_date'] is not None]
+                yield patient, appointments
+        finally:
+            conn.rollback()
+
+def count_receipts(admitted_from=None, admitted_to=None, appointments_from=None, appointments_to=None):
+    """Number of patients a batch with these filters would produce receipts for"""
+    source, params, key = _selection(admitted_from, admitted_to, appointments_from, appointments_to)
+    with database.get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT COUNT({key}) {source}", params)
+        return cursor.fetchone()[0]
+
+# Output
+class _DirectoryWriter:
+    def __init__(self, path):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+
+    def write(self, filename, data):
+        with open(os.path.join(self.path, filename), 'wb') as f:
+            f.write(data)
+
+    def close(self):
+        pass
+
+class _ZipWriter:
+    def __init__(self, path):
+        if os.path.exists(path):
+            raise FileExistsError(f"{path} already exists; receipts are zipped into a fresh file")
+        self._zip = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED)
+
+    def write(self, filename, data):
+        self._zip.writestr(filename, data)
+
+    def close(self):
+        self._zip.close()
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def generate_receipts(output, admitted_from=None, admitted_to=None, appointments_from=None,
+                      appointments_to=None, workers=None, batch_size=200, progress=None, cancel=None):
+    """Write one receipt per selected patient into a directory or a .zip file
+
+    workers defaults to one less than the CPU count; 0 renders in this
+    process. progress(done, total) is called after every batch; setting the
+    threading.Event `cancel` stops after the current batch. Returns
+    receipts, seconds, receipts_per_sec and whether it was cancelled.
+    """
+    filters = (admitted_from, admitted_to, appointments_from, appointments_to)
+    rows = iter_receipt_data(*filters, with_total=True)
+    total = next(rows)
+    try:
+        writer = _ZipWriter(output) if output.lower().endswith('.zip') else _DirectoryWriter(output)
+    except BaseException:
+        rows.close()
+        raise
+    started = time.perf_counter()
+    done = 0
+    executor = None
+    max_pending = 1
+    if workers is None:
+        # This process queries and writes, so leave it one CPU of its own
+        workers = max((os.cpu_count() or 1) - 1, 0)
+    if workers:
+        # spawn rather than fork: the caller may be a Tk process with threads
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        max_pending = 2 * workers
+    
+    def cancelled():
+        return cancel is not None and cancel.is_set()
+    
+    pending = deque()
+    stopped = False
+    try:
+        if progress:
+            progress(0, total)
+        for batch in _batches(rows, batch_size):
+            if cancelled():
+                stopped = True
+                break
+            pending.append(executor.submit(_render_batch, batch) if executor else _render_batch(batch))
+            # Keep a few batches in flight and write them back in order
+            while len(pending) >= max_pending:
+                done += _write_batch(writer, pending.popleft())
+                if progress:
+                    progress(done, total)
+        while pending:
+            if cancelled():
+                stopped = True
+                break
+            done += _write_batch(writer, pending.popleft())
+            if progress:
+                progress(done, total)
+    finally:
+        rows.close()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        writer.close()
+    seconds = time.perf_counter() - started
+    return {'receipts': done, 'seconds': seconds, 'receipts_per_sec': done / max(seconds, 1e-9),
+            'cancelled': stopped}
+
+def _write_batch(writer, rendered):
+    if not isinstance(rendered, list):
+        rendered = rendered.result()
+    for filename, data in rendered:
+        writer.write(filename, data)
+    return len(rendered)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate patient receipts in bulk")
+    parser.add_argument('output', help="Directory, or a .zip file")
+    parser.add_argument('--admitted-from', help="First admission date (YYYY-MM-DD)")
+    parser.add_argument('--admitted-to', help="Last admission date (YYYY-MM-DD)")
+    parser.add_argument('--appointments-from', help="First appointment date (YYYY-MM-DD)")
+    parser.add_argument('--appointments-to', help="Last appointment date (YYYY-MM-DD)")
+    parser.add_argument('--workers', type=int, help="Render processes (default: CPUs - 1, 0 = none)")
+    parser.add_argument('--database', help="Database file (default: hospital.db)")
+    args = parser.parse_args(argv)
+
+    if args.database:
+        database.configure_pool(database=args.database)
+    database.initialize_database()
+
+    def report(done, total):
+        print(f"\r{done}/{total} receipts", end='', file=sys.stderr, flush=True)
+
+    try:
+        stats = generate_receipts(args.output, args.admitted_from, args.admitted_to, args.appointments_from,
+                                  args.appointments_to, workers=args.workers, progress=report)
+    except (ValueError, FileExistsError) as e:
+        parser.error(str(e))
+    print(file=sys.stderr)
+    print(f"Wrote {stats['receipts']} receipts in {stats['seconds']:.1f}s "
+          f"({stats['receipts_per_sec']:,.0f}/sec) to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""Compact query results.
+
+The list getters in database.py return one dict per row by default. Large
+results can instead be requested as
+
+    'record'   tuple-backed records with no per-row __dict__; row['name'],
+               row.get('name'), keys() and dict(row) work as on a dict
+    'columns'  a Columns object holding one list per column, with integer
+               columns packed into arrays
+
+In both compact formats strings that repeat across rows (dates, times,
+genders, specializations, names of the other party) are interned, so each
+distinct value is stored once.
+"""
+import sys
+from array import array
+from collections import namedtuple
+from functools import lru_cache
+
+ROW_FORMATS = ('dict', 'record', 'columns')
+
+# Columns whose values repeat across many rows
+INTERNED_COLUMNS = frozenset((
+    'gender', 'specialization', 'diagnosis', 'admission_date',
+    'patient_name', 'doctor_name', 'appointment_date', 'start_time', 'end_time',
+    'type', 'action',
+))
+
+class Record:
+    """Mapping-style access for the generated record classes"""
+
+    __slots__ = ()
+    _index = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self._index[key])
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        i = self._index.get(key)
+        return default if i is None else tuple.__getitem__(self, i)
+
+    def keys(self):
+        return self._fields
+
+    def values(self):
+        return tuple(self)
+
+    def items(self):
+        return zip(self._fields, self)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __repr__(self):
+        return "Record(" + ", ".join(f"{name}={value!r}" for name, value in self.items()) + ")"
+
+@lru_cache(maxsize=64)
+def record_type(names):
+    """Record class for a tuple of column names, or None if they are not usable as fields"""
+    try:
+        base = namedtuple('Row', names)
+    except ValueError:
+        return None
+    return type('Record', (Record, base), {'__slots__': (), '_index': {name: i for i, name in enumerate(names)}})
+
+class Columns:
+    """Column-oriented rows: columns['name'] is the list of every row's name"""
+
+    __slots__ = ('names', 'data')
+
+    def __init__(self, names, data):
+        self.names = names
+        self.data = dict(zip(names, data))
+
+    def __len__(self):
+        return len(self.data[self.names[0]]) if self.names else 0
+
+    def __getitem__(self, name):
+        return self.data[name]
+
+    def row(self, i):
+        """Row i as a dict, e.g. row(-1) to pass as the next page's `after`"""
+        return {name: self.data[name][i] for name in self.names}
+
+def _pack(values):
+    """Store a column of plain integers as a 64-bit array"""
+    if values and all(type(value) is int for value in values):
+        try:
+            return array('q', values)
+        except OverflowError:
+            pass
+    return values
+
+def convert(description, rows, row_format='dict'):
+    """Turn fetched rows into a list of dicts, a list of records or Columns
+
+    `description` is the cursor description of the query the rows came from.
+    """
+    if row_format not in ROW_FORMATS:
+        raise ValueError("Row format must be one of: " + ", ".join(ROW_FORMATS))
+    if row_format == 'dict':
+        return [dict(row) for row in rows]
+
+    names = tuple(column[0] for column in description or ())
+    interned = [i for i, name in enumerate(names) if name in INTERNED_COLUMNS]
+    intern = sys.intern
+
+    def compact(row):
+        values = list(row)
+        for i in interned:
+            value = values[i]
+            if type(value) is str:
+                values[i] = intern(value)
+        return values
+
+    if row_format == 'record':
+        record = record_type(names)
+        if record is None:
+            return [dict(row) for row in rows]
+        make = record._make
+        return [make(compact(row)) for row in rows]
+
+    data = [[] for _ in names]
+    for row in rows:
+        for column, value in zip(data, compact(row)):
+            column.append(value)
+    return Columns(names, [_pack(column) for column in data])
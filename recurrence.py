@@ -0,0 +1,121 @@
+"""Recurrence rules for appointment series.
+
+A small subset of iCalendar RRULE is understood, enough for follow-up visits:
+
+    FREQ=WEEKLY;COUNT=52                      every week on the start weekday
+    FREQ=WEEKLY;BYDAY=MO,WE,FR;COUNT=36       three times a week
+    FREQ=WEEKLY;INTERVAL=2;UNTIL=2025-12-31   every other week until a date
+    FREQ=DAILY;COUNT=10
+    FREQ=MONTHLY;COUNT=6                      same day of the month (months without it are skipped)
+
+Every rule must end through COUNT or UNTIL, and never yields more than
+MAX_OCCURRENCES dates.
+"""
+import calendar
+from datetime import date, timedelta
+
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY')
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+MAX_OCCURRENCES = 366
+
+class Recurrence:
+    """A parsed recurrence rule; dates(start) yields the occurrence dates"""
+
+    __slots__ = ('frequency', 'interval', 'weekdays', 'count', 'until')
+
+    def __init__(self, frequency, interval=1, weekdays=(), count=None, until=None):
+        frequency = frequency.upper()
+        if frequency not in FREQUENCIES:
+            raise ValueError("Frequency must be one of: " + ", ".join(FREQUENCIES))
+        if not isinstance(interval, int) or interval < 1:
+            raise ValueError("Interval must be a positive whole number")
+        weekdays = tuple(day.upper() for day in weekdays)
+        if any(day not in WEEKDAYS for day in weekdays):
+            raise ValueError("Weekdays must be among: " + ", ".join(WEEKDAYS))
+        if weekdays and frequency != 'WEEKLY':
+            raise ValueError("Weekdays can only be given for weekly rules")
+        if count is None and until is None:
+            raise ValueError("A recurrence needs a number of occurrences or an end date")
+        if count is not None and not 1 <= count <= MAX_OCCURRENCES:
+            raise ValueError(f"Number of occurrences must be between 1 and {MAX_OCCURRENCES}")
+        self.frequency = frequency
+        self.interval = interval
+        self.weekdays = tuple(sorted(set(weekdays), key=WEEKDAYS.index))
+        self.count = count
+        self.until = until
+
+    @classmethod
+    def parse(cls, rule):
+        """Build a Recurrence from 'FREQ=...;INTERVAL=...;BYDAY=...;COUNT=...;UNTIL=...'"""
+        parts = {}
+        for part in rule.strip().split(';'):
+            if not part:
+                continue
+            key, sep, value = part.partition('=')
+            if not sep:
+                raise ValueError(f"Invalid recurrence rule part: {part}")
+            parts[key.strip().upper()] = value.strip()
+        unknown = set(parts) - {'FREQ', 'INTERVAL', 'BYDAY', 'COUNT', 'UNTIL'}
+        if unknown:
+            raise ValueError("Unsupported recurrence rule parts: " + ", ".join(sorted(unknown)))
+        if 'FREQ' not in parts:
+            raise ValueError("A recurrence rule needs FREQ")
+        try:
+            interval = int(parts.get('INTERVAL', 1))
+            count = int(parts['COUNT']) if 'COUNT' in parts else None
+            until = _parse_date(parts['UNTIL']) if 'UNTIL' in parts else None
+        except ValueError:
+            raise ValueError("INTERVAL and COUNT must be numbers and UNTIL a date")
+        weekdays = [day for day in parts.get('BYDAY', '').split(',') if day]
+        return cls(parts['FREQ'], interval, weekdays, count, until)
+
+    def to_rule(self):
+        parts = [f"FREQ={self.frequency}"]
+        if self.interval != 1:
+            parts.append(f"INTERVAL={self.interval}")
+        if self.weekdays:
+            parts.append("BYDAY=" + ",".join(self.weekdays))
+        if self.count is not None:
+            parts.append(f"COUNT={self.count}")
+        if self.until is not None:
+            parts.append(f"UNTIL={self.until.isoformat()}")
+        return ";".join(parts)
+
+    def dates(self, start):
+        """Occurrence dates from `start` (a date or 'YYYY-MM-DD'), in order"""
+        start = _parse_date(start) if isinstance(start, str) else start
+        produced = 0
+        for day in self._candidates(start):
+            if (self.until is not None and day > self.until) or produced >= (self.count or MAX_OCCURRENCES):
+                return
+            produced += 1
+            yield day
+
+    def _candidates(self, start):
+        if self.frequency == 'DAILY':
+            day = start
+            while True:
+                yield day
+                day += timedelta(days=self.interval)
+        elif self.frequency == 'WEEKLY':
+            weekdays = [WEEKDAYS.index(day) for day in self.weekdays] or [start.weekday()]
+            week = start - timedelta(days=start.weekday())
+            while True:
+                for weekday in weekdays:
+                    day = week + timedelta(days=weekday)
+                    if day >= start:
+                        yield day
+                week += timedelta(weeks=self.interval)
+        else:
+            year, month = start.year, start.month
+            while True:
+                if start.day <= calendar.monthrange(year, month)[1]:
+                    yield date(year, month, start.day)
+                month += self.interval
+                year, month = year + (month - 1) // 12, (month - 1) % 12 + 1
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError("Invalid date format. Use YYYY-MM-DD")
@@ -0,0 +1,94 @@
+"""Interval arithmetic for doctor schedules.
+
+Times are handled as minutes since midnight (and dates as days since
+1970-01-01) so availability checks are plain integer comparisons instead of
+repeated datetime parsing.
+"""
+from bisect import bisect_right
+from datetime import date
+
+# Default working hours (9AM-5PM)
+WORK_START = 9 * 60
+WORK_END = 17 * 60
+
+def to_minutes(value):
+    """Convert 'HH:MM' (or 'HH:MM:SS') to minutes since midnight"""
+    hours, minutes = value.split(':')[:2]
+    return int(hours) * 60 + int(minutes)
+
+def format_minutes(minutes):
+    """Convert minutes since midnight back to 'HH:MM'"""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+_EPOCH = date(1970, 1, 1).toordinal()
+
+def to_day(value):
+    """Convert 'YYYY-MM-DD' to days since 1970-01-01
+
+    Only that exact form is accepted (not '2030-1-3' or '20300103'), since the
+    text column is compared and displayed as stored.
+    """
+    try:
+        day = date.fromisoformat(value)
+    except (TypeError, ValueError):
+        day = None
+    if day is None or day.isoformat() != value:
+        raise ValueError("Invalid date format. Use YYYY-MM-DD")
+    return day.toordinal() - _EPOCH
+
+def format_day(day):
+    """Convert days since 1970-01-01 back to 'YYYY-MM-DD'"""
+    return date.fromordinal(day + _EPOCH).isoformat()
+
+class DaySchedule:
+    """Booked intervals of one doctor on one day, sorted and merged"""
+
+    __slots__ = ('starts', 'ends')
+
+    def __init__(self, intervals=()):
+        self.starts = []
+        self.ends = []
+        for start, end in sorted(intervals):
+            if self.ends and start <= self.ends[-1]:
+                # Overlapping or touching: extend the previous interval
+                if end > self.ends[-1]:
+                    self.ends[-1] = end
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def conflicts(self, start, end):
+        """Whether [start, end) overlaps any booked interval"""
+        # First interval that ends after `start`; it conflicts if it also begins before `end`
+        i = bisect_right(self.ends, start)
+        return i < len(self.starts) and self.starts[i] < end
+
+    def add(self, start, end):
+        """Book [start, end), merging with neighbouring intervals"""
+        i = bisect_right(self.ends, start - 1)
+        j = i
+        while j < len(self.starts) and self.starts[j] <= end:
+            start = min(start, self.starts[j])
+            end = max(end, self.ends[j])
+            j += 1
+        self.starts[i:j] = [start]
+        self.ends[i:j] = [end]
+
+    def free_slots(self, duration, work_start=WORK_START, work_end=WORK_END):
+        """Free slots of `duration` minutes on the working-hours grid, in one pass"""
+        slots = []
+        starts, ends = self.starts, self.ends
+        count = len(starts)
+        i = 0
+        slot_start = work_start
+        while slot_start + duration <= work_end:
+            slot_end = slot_start + duration
+            while i < count and ends[i] <= slot_start:
+                i += 1
+            if i == count or starts[i] >= slot_end:
+                slots.append((slot_start, slot_end))
+            slot_start = slot_end
+        return slots
@@ -0,0 +1,53 @@
+"""Cold-start timing for the application.
+
+main.py imports this module first and records marks as startup progresses.
+Set the HMS_STARTUP_PROFILE environment variable to a file path to append one
+JSON line per launch (handy for comparing packaged builds over time), or to
+"-" to print the report to stderr.
+"""
+import json
+import os
+import sys
+import time
+
+_started = time.perf_counter()
+_marks = {}
+_durations = {}
+
+def mark(name):
+    """Record the time since startup at which `name` happened"""
+    _marks.setdefault(name, time.perf_counter() - _started)
+
+def timed(name, func):
+    """Wrap func so its run time is recorded under `name`"""
+    def wrapper(*args, **kwargs):
+        began = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _durations[name] = time.perf_counter() - began
+    return wrapper
+
+def report():
+    """Marks and durations so far, in milliseconds"""
+    return {
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'frozen': bool(getattr(sys, 'frozen', False)),
+        'marks_ms': {name: round(seconds * 1000, 1) for name, seconds in _marks.items()},
+        'durations_ms': {name: round(seconds * 1000, 1) for name, seconds in _durations.items()},
+    }
+
+def write_report():
+    """Write the report to wherever HMS_STARTUP_PROFILE points, if anywhere"""
+    target = os.environ.get('HMS_STARTUP_PROFILE')
+    if not target:
+        return
+    line = json.dumps(report())
+    if target == '-':
+        print(line, file=sys.stderr)
+        return
+    try:
+        with open(target, 'a', encoding='utf-8') as f:
+            f.write(line + "\n")
+    except OSError as e:
+        print(f"Could not write startup profile: {e}", file=sys.stderr)
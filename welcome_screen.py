@@ -1,12 +1,23 @@
 import tkinter as tk
-from tkinter import ttk
-import time
+from tkinter import ttk, messagebox
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 class WelcomeScreen:
-    
-    def __init__(self, root, main_app_callback):
+    """Splash screen that runs the real startup work behind its progress bar
+
+    startup_steps is a list of (key, label, func). The first step runs on its
+    own (it prepares the database the others need), the rest run in parallel.
+    When everything is done the welcome widgets are removed and
+    main_app_callback(results) is called with {key: return value}, so the
+    main application can take over the same root window.
+    """
+
+    def __init__(self, root, main_app_callback, startup_steps=()):
         self.root = root
         self.main_app_callback = main_app_callback
+        self.startup_steps = list(startup_steps)
         self.root.title("Hospital Management System")
         self.root.geometry("600x400")
         self.root.config(bg="#f4f4f9")
@@ -52,17 +63,62 @@ class WelcomeScreen:
             self.root,
             orient="horizontal",
             length=300,
-            mode="determinate"
+            mode="determinate",
+            maximum=max(len(self.startup_steps), 1)
         )
         self.progress.pack()
         
-        # Simulate loading
-        self.load_progress()
-        
+        # Run startup work off the UI thread and report real progress
+        self.results = {}
+        self._events = queue.SimpleQueue()
+        threading.Thread(target=self._run_steps, name="startup", daemon=True).start()
+        self.root.after(15, self.load_progress)
+
+    def _run_steps(self):
+        steps = self.startup_steps
+        try:
+            if steps:
+                self._run_step(*steps[0])
+            if len(steps) > 1:
+                with ThreadPoolExecutor(max_workers=len(steps) - 1) as executor:
+                    for future in [executor.submit(self._run_step, *step) for step in steps[1:]]:
+                        future.result()
+        except Exception as e:
+            self._events.put(("error", e))
+        else:
+            self._events.put(("done", None))
+
+    def _run_step(self, key, label, func):
+        self._events.put(("started", label))
+        result = func()
+        self._events.put(("finished", (key, result)))
+
     def load_progress(self):
-        for i in range(101):
-            self.progress['value'] = i
-            self.root.update_idletasks()
-            time.sleep(0.03)
-        self.root.destroy()
-        self.main_app_callback()
\ No newline at end of file
+        """Apply progress reported by the startup thread"""
+        while True:
+            try:
+                event, value = self._events.get_nowait()
+            except queue.Empty:
+                break
+        
+            if event == "started":
+                self.loading_label.config(text=f"{value}...")
+            elif event == "finished":
+                key, result = value
+                self.results[key] = result
+                self.progress['value'] = len(self.results)
+            elif event == "error":
+                messagebox.showerror("Error", f"Failed to start the application:\n{value}")
+                self.root.destroy()
+                return
+            elif event == "done":
+                self.finish()
+                return
+        
+        self.root.after(15, self.load_progress)
+
+    def finish(self):
+        """Remove the welcome widgets and hand the window to the main app"""
+        for widget in (self.logo_label, self.welcome_label, self.loading_label, self.progress):
+            widget.destroy()
+        self.main_app_callback(self.results)